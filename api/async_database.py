@@ -0,0 +1,105 @@
+"""asyncpg variant of the ranking queries in `api/database.py`
+
+The queries are the same SQL, translated once from SQLAlchemy's `:name` parameters to
+asyncpg's positional `$n` ones. Each call checks a connection out of a per-worker pool
+sized by the `DB_POOL_*` settings and runs in a read-only transaction.
+"""
+import asyncio
+import collections
+import asyncpg
+from decimal import Decimal
+from config.settings import MAX_NUMBER_OF_ARTICLES
+from config.settings import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE, DB_STATEMENT_TIMEOUT
+from api.database import DB_URL, BIND_PARAM_REG, prepare_candidate
+from api.database import QUERY_SIMILAR_BACKGROUND_TOP_K_STR, QUERY_TARGET_SCHOOL_TOP_K_STR
+
+
+class AsyncQuery:
+    """A `:name` query translated to asyncpg
+
+    psycopg2 inlines the parameters as literals, so a float is a numeric constant, a list is
+    `ARRAY[...]` and an empty list is '{}'. asyncpg binds typed parameters whose types Postgres
+    infers from the query instead, so those parameters are cast explicitly and sent the same way.
+    """
+    casts = {'gpa': 'numeric', 'program_type_arr': 'varchar[]'}
+
+    def __init__(self, query):
+        query = query.replace('ARRAY[:program_type_arr]::varchar[]', ':program_type_arr')
+        self.names = []
+
+        def to_positional(match):
+            name = match.group(1)
+            if name not in self.names:
+                self.names.append(name)
+            param = '$%d' % (self.names.index(name) + 1)
+            return 'CAST(%s AS %s)' % (param, self.casts[name]) if name in self.casts else param
+        self.query = BIND_PARAM_REG.sub(to_positional, query)
+
+    def args(self, params):
+        args = []
+        for name in self.names:
+            value = params[name]
+            if isinstance(value, float):
+                value = Decimal(repr(value))
+            elif isinstance(value, list) and name != 'program_type_arr':
+                value = '{' + ','.join(value) + '}'
+            args.append(value)
+        return args
+
+
+QUERY_SIMILAR_BACKGROUND_TOP_K = AsyncQuery(QUERY_SIMILAR_BACKGROUND_TOP_K_STR)
+QUERY_TARGET_SCHOOL_TOP_K = AsyncQuery(QUERY_TARGET_SCHOOL_TOP_K_STR)
+
+pool = None
+_pool_lock = None
+
+
+async def init_pool():
+    global pool, _pool_lock
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if pool is None:
+            pool = await asyncpg.create_pool(
+                DB_URL,
+                min_size=DB_POOL_SIZE,
+                max_size=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+                # asyncpg has no maximum connection age like DB_POOL_RECYCLE, only an idle timeout
+                max_inactive_connection_lifetime=DB_POOL_MAX_IDLE,
+                server_settings={'statement_timeout': str(DB_STATEMENT_TIMEOUT)})
+    return pool
+
+
+async def close_pool():
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+
+
+_row_types = {}
+
+
+def to_row(record):
+    """asyncpg records only support item access, the API reads the columns as attributes"""
+    keys = tuple(record.keys())
+    if keys not in _row_types:
+        _row_types[keys] = collections.namedtuple('Row', keys)
+    return _row_types[keys](*record.values())
+
+
+async def read_only_query(query, params):
+    if pool is None:
+        await init_pool()
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as connection:
+        async with connection.transaction(readonly=True):
+            records = await connection.fetch(query.query, *query.args(params))
+    return [to_row(record) for record in records]
+
+
+async def query_similar_background_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return await read_only_query(QUERY_SIMILAR_BACKGROUND_TOP_K, prepare_candidate(candidate, limit))
+
+
+async def query_target_school_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return await read_only_query(QUERY_TARGET_SCHOOL_TOP_K, prepare_candidate(candidate, limit))
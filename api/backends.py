@@ -0,0 +1,157 @@
+"""Storage backends that rank the articles for the API
+
+A backend loads the CSV files dumped by the data pipeline (`output/*.csv`) and runs the two
+scoring queries on them. The API and the ingest command only talk to the backend chosen
+by `STORAGE_BACKEND` in `config/settings.py`:
+
+* `postgres`: the SQL queries of `api/database.py`, on asyncpg if `DB_ASYNC` is set
+* `memory`: the in-process engine of `api/scoring.py`, which needs no database at all
+
+Every query method takes the normalized query dict of `parse_request`.
+"""
+import abc
+from config.settings import STORAGE_BACKEND, DB_ASYNC, MAX_NUMBER_OF_ARTICLES
+
+
+class StorageBackend(abc.ABC):
+    name = None
+
+    @abc.abstractmethod
+    def load(self, force=False):
+        """Load the dumped CSV files, `force` reloads them even if they did not change"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def data_version(self):
+        """Identifier of the loaded data, changes whenever new data is loaded"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_similar_background(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_target_school(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_similar_background_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_target_school_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_similar_background_page(self, candidate, limit, after=None, stream=False):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_target_school_page(self, candidate, limit, after=None, stream=False):
+        raise NotImplementedError
+
+    async def startup(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class PostgresBackend(StorageBackend):
+    name = 'postgres'
+
+    def __init__(self):
+        # Imported here so the other backends run without a DB driver or server
+        from api import database
+        self.database = database
+
+    def load(self, force=False):
+        self.database.create_tables_and_dump_data(force=force)
+
+    def data_version(self):
+        return self.database.data_version()
+
+    def query_similar_background(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.database.query_similar_background_api(candidate, limit)
+
+    def query_target_school(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.database.query_target_school_api(candidate, limit)
+
+    def query_similar_background_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.database.query_similar_background_batch_api(candidates, limit)
+
+    def query_target_school_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.database.query_target_school_batch_api(candidates, limit)
+
+    def query_similar_background_page(self, candidate, limit, after=None, stream=False):
+        return self.database.query_similar_background_page_api(candidate, limit, after, stream)
+
+    def query_target_school_page(self, candidate, limit, after=None, stream=False):
+        return self.database.query_target_school_page_api(candidate, limit, after, stream)
+
+
+class AsyncPostgresBackend(PostgresBackend):
+    """Runs the single candidate queries on the asyncpg pool, the others on the SQLAlchemy engine"""
+
+    def __init__(self):
+        super().__init__()
+        from api import async_database
+        self.async_database = async_database
+
+    async def query_similar_background(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return await self.async_database.query_similar_background_api(candidate, limit)
+
+    async def query_target_school(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return await self.async_database.query_target_school_api(candidate, limit)
+
+    async def startup(self):
+        await self.async_database.init_pool()
+
+    async def shutdown(self):
+        await self.async_database.close_pool()
+
+
+class MemoryBackend(StorageBackend):
+    """Ranks the admission rows in-process, they are read from the CSV files on the first query"""
+    name = 'memory'
+
+    def __init__(self):
+        from api import scoring
+        self.scoring = scoring
+
+    def load(self, force=False):
+        # Nothing to load ahead of time, the API workers read the CSV files themselves
+        pass
+
+    def data_version(self):
+        return self.scoring.data_version()
+
+    def query_similar_background(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.scoring.query_similar_background_api(candidate, limit)
+
+    def query_target_school(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.scoring.query_target_school_api(candidate, limit)
+
+    def query_similar_background_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.scoring.query_similar_background_batch_api(candidates, limit)
+
+    def query_target_school_batch(self, candidates, limit=MAX_NUMBER_OF_ARTICLES):
+        return self.scoring.query_target_school_batch_api(candidates, limit)
+
+    def query_similar_background_page(self, candidate, limit, after=None, stream=False):
+        return self.scoring.query_similar_background_page_api(candidate, limit, after, stream)
+
+    def query_target_school_page(self, candidate, limit, after=None, stream=False):
+        return self.scoring.query_target_school_page_api(candidate, limit, after, stream)
+
+
+BACKENDS = {
+    'postgres': AsyncPostgresBackend if DB_ASYNC else PostgresBackend,
+    'memory': MemoryBackend,
+}
+
+
+def get_backend(name=STORAGE_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown storage backend {name!r}, choose one of {sorted(BACKENDS)}')
+    return BACKENDS[name]()
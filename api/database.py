@@ -1,6 +1,13 @@
 import os
+import re
 import csv
-from config.settings import DB_CONFIG, DATABASE_URL
+import time
+import hashlib
+import itertools
+from datetime import datetime
+from config.settings import DB_CONFIG, DATABASE_URL, MAX_NUMBER_OF_ARTICLES, OUTPUT_DIR
+from api.pagination import cursor_params
+from config.settings import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_STATEMENT_TIMEOUT
 import sqlalchemy as sa
 from sqlalchemy.types import DateTime
 from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey
@@ -16,14 +23,21 @@ import pprint
 pp = pprint.PrettyPrinter()
 
 if DATABASE_URL:
-    engine = create_engine(DATABASE_URL)
+    DB_URL = DATABASE_URL
 else:
-    engine = create_engine('postgres://%s:%s@%s:%s/%s' % (
+    DB_URL = 'postgres://%s:%s@%s:%s/%s' % (
         DB_CONFIG['USERNAME'],
         DB_CONFIG['PASSWORD'],
         DB_CONFIG['HOST'],
         DB_CONFIG['PORT'],
-        DB_CONFIG['DB_NAME']))
+        DB_CONFIG['DB_NAME'])
+engine = create_engine(DB_URL,
+                       pool_size=DB_POOL_SIZE,
+                       max_overflow=DB_MAX_OVERFLOW,
+                       pool_timeout=DB_POOL_TIMEOUT,
+                       pool_recycle=DB_POOL_RECYCLE,
+                       pool_pre_ping=True,
+                       connect_args={'options': '-c statement_timeout=%d' % DB_STATEMENT_TIMEOUT})
 
 session = scoped_session(sessionmaker(autocommit=False,
                                       autoflush=False,
@@ -75,6 +89,13 @@ class ADMISSION_UNI_PROGRAMS(Base):
     program_type = Column(String(10))
 
 
+class DATA_LOADS(Base):
+    __tablename__ = 'data_loads'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    checksum = Column(String(64))  # SHA-256 of the loaded CSV files
+    loaded_at = Column(DateTime())
+
+
 # VIEW_COLUMNS (SELECT * for VIEW is not working with sqlalchemy_utils... don't have time to fix it now)
 ARTICLES_COLUMNS = [
     ARTICLES.article_id, ARTICLES.article_title, ARTICLES.author,
@@ -119,116 +140,474 @@ class ARTICLE_UNI_PROGRAM_VIEW(Base):
     )
 
 
-def create_tables_and_dump_data():
+# One row per admission article, with its admitted programs aggregated into arrays in insertion order.
+# It is rebuilt from `articles` and `admission_programs` by `refresh_admission_view` after each data load.
+ARTICLE_ADMISSION_VIEW = 'article_admission_view'
+CREATE_ARTICLE_ADMISSION_VIEW_STR = f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {ARTICLE_ADMISSION_VIEW} AS
+        SELECT articles.article_id, article_title, author, date, url, article_type, uni_id, uni_name, uni_cname,
+                uni_location, uni_cabbr, major_id, major_cname, major_name, major_cabbr, major_type,
+                max_gpa, min_gpa, mean_gpa, gpa_scale,
+                array_agg(admission_programs.university ORDER BY admission_programs.id) as universities,
+                array_agg(admission_programs.program ORDER BY admission_programs.id) as programs,
+                array_agg(admission_programs.program_type ORDER BY admission_programs.id) as program_types,
+                array_agg(admission_programs.program_level ORDER BY admission_programs.id) as program_levels
+        FROM articles JOIN admission_programs ON admission_programs.article_id = articles.article_id
+        GROUP BY articles.article_id
+        WITH NO DATA;
+    """
+
+# Indexes built once the data is loaded
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS ix_articles_article_type ON articles (article_type)',
+    'CREATE INDEX IF NOT EXISTS ix_articles_date ON articles (date)',
+    'CREATE INDEX IF NOT EXISTS ix_admission_universities_article_id ON admission_universities (article_id)',
+    'CREATE INDEX IF NOT EXISTS ix_admission_programs_article_id ON admission_programs (article_id)',
+    f'CREATE UNIQUE INDEX IF NOT EXISTS ix_{ARTICLE_ADMISSION_VIEW}_article_id ON {ARTICLE_ADMISSION_VIEW} (article_id)',
+    f'CREATE INDEX IF NOT EXISTS ix_{ARTICLE_ADMISSION_VIEW}_article_type ON {ARTICLE_ADMISSION_VIEW} (article_type, date)',
+    f'CREATE INDEX IF NOT EXISTS ix_{ARTICLE_ADMISSION_VIEW}_program_types ON {ARTICLE_ADMISSION_VIEW} USING GIN (program_types)',
+]
+
+
+def drop_admission_view():
+    # The materialized view is not part of `Base.metadata`, drop it before the tables it depends on
+    session.execute(f'DROP MATERIALIZED VIEW IF EXISTS {ARTICLE_ADMISSION_VIEW}')
+    session.commit()
+
+
+def refresh_admission_view():
+    """Create the indexes and the pre-aggregated admission view if needed, then refresh the view"""
+    session.execute(CREATE_ARTICLE_ADMISSION_VIEW_STR)
+    for index in INDEXES:
+        session.execute(index)
+    session.execute(f'REFRESH MATERIALIZED VIEW {ARTICLE_ADMISSION_VIEW}')
+    session.execute(f'ANALYZE {ARTICLE_ADMISSION_VIEW}')
+    session.commit()
+
+
+def csv_checksum(csv_paths):
+    """SHA-256 over the CSV files that are loaded into the DB"""
+    sha = hashlib.sha256()
+    for path in csv_paths:
+        sha.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def loaded_checksum():
+    """Checksum of the CSV files of the last completed data load, None if there is none"""
+    if not engine.dialect.has_table(engine, DATA_LOADS.__tablename__):
+        return None
+    row = session.query(DATA_LOADS.checksum).order_by(DATA_LOADS.id.desc()).first()
+    session.commit()
+    return row.checksum if row else None
+
+
+def data_version():
+    """Identifier of the data the queries run on, changes whenever a new data load completes"""
+    return loaded_checksum()
+
+
+def copy_csv_to_table(path, table, batch_size=1000):
+    """Stream a pipe-delimited CSV file into `table` and return the number of loaded rows
+
+    Postgres' `COPY FROM STDIN` is used when the DB driver supports it, otherwise the rows are
+    sent as batched multi-row inserts. Empty fields are loaded as '' for string columns and
+    as NULL for the others.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        header = next(csv.reader([f.readline()], delimiter='|'))
+        string_columns = [col for col in header if isinstance(table.c[col].type, (String, Text))]
+
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if hasattr(cursor, 'copy_expert'):
+                options = "FORMAT csv, DELIMITER '|'"
+                if string_columns:
+                    options += f", FORCE_NOT_NULL ({', '.join(string_columns)})"
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(header)}) FROM STDIN WITH ({options})", f)
+                count = cursor.rowcount
+                connection.commit()
+                return count
+        finally:
+            connection.close()
+
+        count = 0
+        reader = csv.reader(f, delimiter='|')
+        while True:
+            batch = [{k: v if v or k in string_columns else None for k, v in zip(header, row)}
+                     for row in itertools.islice(reader, batch_size)]
+            if not batch:
+                break
+            session.execute(table.insert().values(batch))
+            count += len(batch)
+        session.commit()
+        return count
+
+
+def staging_table(table):
+    """Unlogged copy of `table` to load the new CSV file in, its id column still draws from the table's sequence"""
+    name = f'staging_{table.name}'
+    session.execute(f'DROP TABLE IF EXISTS {name}')
+    session.execute(f'CREATE UNLOGGED TABLE {name} (LIKE {table.name} INCLUDING DEFAULTS)')
+    session.commit()
+    return Table(name, MetaData(), *[Column(column.name, column.type) for column in table.columns])
+
+
+# Articles whose own row or whose list of admitted universities / programs differ between the loaded
+# tables and the staging ones. The child rows are compared as JSON arrays in insertion order.
+CHANGED_CHILD_ROWS_TEMPLATE = """
+        SELECT article_id, json_agg(json_build_array({columns}) ORDER BY id)::text AS rows FROM {table} GROUP BY article_id
+    """
+CHANGED_ARTICLES_TEMPLATE = """
+        CREATE TEMPORARY TABLE changed_articles ON COMMIT DROP AS
+        SELECT article_id FROM (SELECT * FROM staging_articles EXCEPT SELECT * FROM articles) AS a
+        {children}
+    """
+CHANGED_CHILDREN_TEMPLATE = """
+        UNION SELECT article_id FROM (({staging} EXCEPT {loaded}) UNION ({loaded} EXCEPT {staging})) AS {table}
+    """
+
+
+def upsert_changed_rows(csv_paths, table_classes):
+    """Load the CSV files into staging tables and only write the articles that differ into the loaded tables
+
+    The child rows of a changed article are replaced as a whole, removed articles are deleted, and
+    `article_admission_view` is refreshed concurrently so the API keeps answering during the load.
+    Returns the number of upserted and deleted articles.
+    """
+    tables = [table_class.__table__ for table_class in table_classes]
+    staging_tables = []
+    for path, table in zip(csv_paths, tables):
+        staging = staging_table(table)
+        count = copy_csv_to_table(path, staging)
+        print(f'Stage {path}: {count} rows')
+        staging_tables.append(staging)
+
+    articles, children = tables[0], tables[1:]
+    children_str = ''
+    for child in children:
+        columns = ', '.join(c.name for c in child.columns if c.name not in ('id', 'article_id'))
+        children_str += CHANGED_CHILDREN_TEMPLATE.format(
+            table=child.name,
+            staging=CHANGED_CHILD_ROWS_TEMPLATE.format(columns=columns, table=f'staging_{child.name}'),
+            loaded=CHANGED_CHILD_ROWS_TEMPLATE.format(columns=columns, table=child.name))
+    updates = ', '.join(f'{c.name} = EXCLUDED.{c.name}' for c in articles.columns if c.name != 'article_id')
+    removed_str = 'SELECT article_id FROM articles WHERE article_id NOT IN (SELECT article_id FROM staging_articles)'
+
+    try:
+        with engine.begin() as connection:
+            connection.execute(CHANGED_ARTICLES_TEMPLATE.format(children=children_str))
+            removed = [row.article_id for row in connection.execute(removed_str)]
+            # changed_articles also holds the removed articles, their loaded child rows differ from the empty staged ones
+            upserted = connection.execute(
+                'SELECT count(*) FROM changed_articles WHERE article_id IN (SELECT article_id FROM staging_articles)'
+            ).scalar()
+            for child in children:
+                connection.execute(f"""
+                    DELETE FROM {child.name} WHERE article_id IN (SELECT article_id FROM changed_articles)
+                        OR article_id IN ({removed_str})
+                    """)
+            connection.execute(f'DELETE FROM articles WHERE article_id IN ({removed_str})')
+            connection.execute(f"""
+                INSERT INTO articles SELECT * FROM staging_articles
+                WHERE article_id IN (SELECT article_id FROM changed_articles)
+                ON CONFLICT (article_id) DO UPDATE SET {updates}
+                """)
+            for child in children:
+                # The staging ids come from the same sequence, keeping them keeps the programs in CSV order
+                connection.execute(f"""
+                    INSERT INTO {child.name} SELECT * FROM staging_{child.name}
+                    WHERE article_id IN (SELECT article_id FROM changed_articles) ORDER BY id
+                    """)
+            if upserted or removed:
+                connection.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {ARTICLE_ADMISSION_VIEW}')
+        for table in tables + [ARTICLE_ADMISSION_VIEW]:
+            session.execute(f'ANALYZE {getattr(table, "name", table)}')
+        session.commit()
+    finally:
+        for staging in staging_tables:
+            session.execute(f'DROP TABLE IF EXISTS {staging.name}')
+        session.commit()
+    return upserted, len(removed)
+
+
+def create_tables_and_dump_data(force=False):
+    """Load the dumped CSV files into the DB
+
+    Parameters
+    ----------
+    force : bool, optional
+        Drop the tables and reload all the rows even if the CSV files did not change since the
+        last load, by default False. Otherwise only the articles that changed are written
+    """
     # import all modules here that might define models so that
     # they will be registered properly on the metadata.
     try:
+        csv_paths = [os.path.join(OUTPUT_DIR, name) for name in
+                     ('admission_articles.csv', 'admission_universities.csv', 'admission_uni_and_programs.csv')]
+        table_classes = [ARTICLES, ADMISSION_UNIVERSITIES, ADMISSION_UNI_PROGRAMS]
+        checksum = csv_checksum(csv_paths)
+        if not force and loaded_checksum() == checksum:
+            print('CSV files did not change since the last DB dump, skip loading')
+            return
+        if not force and loaded_checksum() is not None:
+            start = time.perf_counter()
+            upserted, deleted = upsert_changed_rows(csv_paths, table_classes)
+            session.add(DATA_LOADS(checksum=checksum, loaded_at=datetime.now()))
+            session.commit()
+            print(f'DB Dump finish! Upserted {upserted} and deleted {deleted} articles in {time.perf_counter() - start:.2f}s')
+            return
+
         # Clean up the DB then create all tables and views
+        drop_admission_view()
         Base.metadata.drop_all(bind=engine)
         Base.metadata.create_all(bind=engine)
 
-        # Copy CSV files
-        csv_paths = ['./output/admission_articles.csv', './output/admission_universities.csv', './output/admission_uni_and_programs.csv']
-        table_classes = [ARTICLES, ADMISSION_UNIVERSITIES, ADMISSION_UNI_PROGRAMS]
-        # col_names = [article_header, ['id', 'article_id', 'university'], ['id',
-        # 'article_id', 'university', 'program_level', 'program', 'program_type']]
-
+        # Copy CSV files, each table is committed individually
         for path, table_class in zip(csv_paths, table_classes):
-            with open(path, 'r') as f:
-                reader = csv.reader(f, delimiter='|')
-                header = next(reader)
-                for row in reader:
-                    d = {k: v for k, v in zip(header, row)}
-                    session.add(table_class(**d))
-            # Commit for each individual table
-            session.commit()
-            print(f'Dump {path}')
+            start = time.perf_counter()
+            count = copy_csv_to_table(path, table_class.__table__)
+            print(f'Dump {path}: {count} rows in {time.perf_counter() - start:.2f}s')
+
+        # Build the indexes and the admission view once all the data is in
+        start = time.perf_counter()
+        refresh_admission_view()
+        print(f'Build indexes and {ARTICLE_ADMISSION_VIEW} in {time.perf_counter() - start:.2f}s')
+
+        session.add(DATA_LOADS(checksum=checksum, loaded_at=datetime.now()))
+        session.commit()
         print('DB Dump finish!')
 
     except Exception as error:
+        session.rollback()
         print(error)
 
 
-QUERY_SIMILAR_BACKGROUND_PROGRAM_STR = """
-        SELECT articles.article_id, article_title, author, date, url, uni_id, uni_cname, uni_cabbr,
+# The score is split into the terms of the author's background, which are constant per article, and
+# the MAX over the terms of each admitted program. Both are read from `article_admission_view`,
+# where the programs of an article are already aggregated into arrays.
+SIMILAR_BACKGROUND_SCORE_STR = """
+        SELECT article_id, article_title, author, date, url, uni_id, uni_cname, uni_cabbr,
                 major_id, major_cname, major_cabbr, major_type, mean_gpa, gpa_scale,
-                universities, programs, program_types, program_levels, score, ABS(mean_gpa - :gpa) AS gpa_diff
-
-        FROM articles JOIN
-            (SELECT article_id, array_agg(sub.university) as universities, array_agg(sub.program) as programs,
-                     array_agg(sub.program_type) as program_types, array_agg(sub.program_level) as program_levels, MAX(score) as score
-            FROM(
-                SELECT *,
-                    6 * (mean_gpa BETWEEN :gpa -0.2 AND :gpa + 0.2)::int +
-                    5 * ((mean_gpa BETWEEN :gpa - 0.3 AND :gpa - 0.21) OR (mean_gpa BETWEEN :gpa + 0.21 AND :gpa + 0.3))::int +
-                    2 * ((mean_gpa BETWEEN :gpa - 0.5 AND :gpa - 0.31) OR (mean_gpa BETWEEN :gpa + 0.31 AND :gpa + 0.5))::int +
-                    4 * (min_gpa <= 3.01 AND (min_gpa BETWEEN :gpa -0.25 AND :gpa + 0.25) )::int +
-                    3.7 * (min_gpa <= 3.01 AND :gpa <= 3.01 AND (min_gpa BETWEEN 0 AND 3.01) )::int +
-                    -0.2 * (mean_gpa = -1)::int +
-                    8 * (length(:uni_id) > 0 AND uni_id = :uni_id)::int +
-                    20 * (length(:uni_id) > 0 AND uni_id = :uni_id AND NOT uni_id ~ '(NTU|NCTU|NTHU)')::int +
-                    3 * (length(:major_type) > 0 AND (major_id = :major_id OR major_type = :major_type))::int +
-                    1 * (length(:major_id) > 0 AND (uni_id <> :uni_id AND major_id = :major_id AND NOT major_type ~ '(CS|EE)'))::int +
-                    5 * (length(:major_id) > 0 AND (uni_id = :uni_id AND major_id = :major_id AND NOT major_type ~ '(CS|EE)'))::int +
-                    2 * (length(:uni_id) > 0 AND length(:major_id) > 0 AND (uni_id = :uni_id AND major_id = :major_id))::int +
+                universities, programs, program_types, program_levels, ABS(mean_gpa - :gpa) AS gpa_diff,
+                6 * (mean_gpa BETWEEN :gpa -0.2 AND :gpa + 0.2)::int +
+                5 * ((mean_gpa BETWEEN :gpa - 0.3 AND :gpa - 0.21) OR (mean_gpa BETWEEN :gpa + 0.21 AND :gpa + 0.3))::int +
+                2 * ((mean_gpa BETWEEN :gpa - 0.5 AND :gpa - 0.31) OR (mean_gpa BETWEEN :gpa + 0.31 AND :gpa + 0.5))::int +
+                4 * (min_gpa <= 3.01 AND (min_gpa BETWEEN :gpa -0.25 AND :gpa + 0.25) )::int +
+                3.7 * (min_gpa <= 3.01 AND :gpa <= 3.01 AND (min_gpa BETWEEN 0 AND 3.01) )::int +
+                -0.2 * (mean_gpa = -1)::int +
+                8 * (length(:uni_id) > 0 AND uni_id = :uni_id)::int +
+                20 * (length(:uni_id) > 0 AND uni_id = :uni_id AND NOT uni_id ~ '(NTU|NCTU|NTHU)')::int +
+                3 * (length(:major_type) > 0 AND (major_id = :major_id OR major_type = :major_type))::int +
+                1 * (length(:major_id) > 0 AND (uni_id <> :uni_id AND major_id = :major_id AND NOT major_type ~ '(CS|EE)'))::int +
+                5 * (length(:major_id) > 0 AND (uni_id = :uni_id AND major_id = :major_id AND NOT major_type ~ '(CS|EE)'))::int +
+                2 * (length(:uni_id) > 0 AND length(:major_id) > 0 AND (uni_id = :uni_id AND major_id = :major_id))::int +
+                program_score as score
+
+        FROM article_admission_view,
+            LATERAL (SELECT MAX(
                     6 * (program ~ :programs)::int +
                     4 * (program ~ :programs AND NOT program ~ '(CS|MSCS|EE|MSEE)')::int +
                     5 * (program_type ~ :program_types)::int +
                     10 * (program_level = :program_level AND :program_level = 'PhD')::int +
-                    15 * (length(:universities) > 2 AND university ~ :universities)::int as score
-                FROM article_program_view
-                WHERE article_type = :article_type
-            ) as sub
-            GROUP BY article_id) as x ON x.article_id = articles.article_id
-            WHERE (length(:program_types) = 2 OR program_types && ARRAY[:program_type_arr]::varchar[])
-        ORDER BY score DESC, date DESC, gpa_diff ASC;
+                    15 * (length(:universities) > 2 AND university ~ :universities)::int) as program_score
+                FROM unnest(universities, programs, program_types, program_levels) AS p(university, program, program_type, program_level)
+            ) as x
+        WHERE article_type = :article_type
+            AND (length(:program_types) = 2 OR program_types && ARRAY[:program_type_arr]::varchar[])
     """
 
-QUERY_TARGET_SCHOOL_STR = """
-        SELECT articles.article_id, article_title, author, date, url, uni_id, uni_cname, uni_cabbr,
+TARGET_SCHOOL_SCORE_STR = """
+        SELECT article_id, article_title, author, date, url, uni_id, uni_cname, uni_cabbr,
                 major_id, major_cname, major_cabbr, major_type, mean_gpa, gpa_scale,
                 universities, programs, program_types, program_levels, score
 
-        FROM articles JOIN
-            (SELECT article_id, array_agg(sub.university) as universities, array_agg(sub.program) as programs,
-                     array_agg(sub.program_type) as program_types, array_agg(sub.program_level) as program_levels, MAX(score) as score
-            FROM(
-                SELECT *,
+        FROM article_admission_view,
+            LATERAL (SELECT MAX(
                     50 * (program ~ :programs)::int +
                     1 * (program_type ~ :program_types)::int +
                     1 * (program_level = :program_level AND :program_level = 'PhD')::int +
-                    48 * (length(:universities) > 2 AND university ~ :universities)::int as score
-                FROM article_program_view
-                WHERE article_type = :article_type
-            ) as sub
-            GROUP BY article_id) as x ON x.article_id = articles.article_id
-            WHERE (length(:program_types) = 2 OR program_types && ARRAY[:program_type_arr]::varchar[])
-       ORDER BY score DESC, date DESC;
+                    48 * (length(:universities) > 2 AND university ~ :universities)::int) as score
+                FROM unnest(universities, programs, program_types, program_levels) AS p(university, program, program_type, program_level)
+            ) as x
+        WHERE article_type = :article_type
+            AND (length(:program_types) = 2 OR program_types && ARRAY[:program_type_arr]::varchar[])
     """
 
+SIMILAR_BACKGROUND_ORDER_BY = 'score DESC, date DESC, gpa_diff ASC'
+TARGET_SCHOOL_ORDER_BY = 'score DESC, date DESC'
+
+# Every scored article, as the API used to fetch them before cutting them down in Python
+QUERY_SIMILAR_BACKGROUND_PROGRAM_STR = SIMILAR_BACKGROUND_SCORE_STR + f'ORDER BY {SIMILAR_BACKGROUND_ORDER_BY};'
+QUERY_TARGET_SCHOOL_STR = TARGET_SCHOOL_SCORE_STR + f'ORDER BY {TARGET_SCHOOL_ORDER_BY};'
+
+# Keep the top `:limit` articles whose score passes the cut-off relative to the best score.
+# `max_score` is the score of the first article, which is NULL when any score is NULL (NULLS FIRST),
+# and broad queries (more than 100 articles) only keep the articles that pass `cutoff`.
+TOP_K_QUERY_TEMPLATE = """
+        SELECT * FROM (
+            SELECT ranked.*, COUNT(*) OVER () AS total_count,
+                FIRST_VALUE(score) OVER (ORDER BY {order_by}) AS max_score
+            FROM ({query}) AS ranked
+        ) AS windowed
+        WHERE max_score IS NOT NULL AND score IS NOT NULL AND (total_count <= 100 OR {cutoff})
+        ORDER BY {order_by}
+        LIMIT :limit;
+    """
+
+# FLOOR like the `max_score // 2` of the Python cut-off, TRUNC differs on a negative max_score
+SIMILAR_BACKGROUND_CUTOFF = 'score >= FLOOR(max_score / 2)'
+TARGET_SCHOOL_CUTOFF = 'score = max_score'
+
+QUERY_SIMILAR_BACKGROUND_TOP_K_STR = TOP_K_QUERY_TEMPLATE.format(
+    query=SIMILAR_BACKGROUND_SCORE_STR, order_by=SIMILAR_BACKGROUND_ORDER_BY, cutoff=SIMILAR_BACKGROUND_CUTOFF)
+QUERY_TARGET_SCHOOL_TOP_K_STR = TOP_K_QUERY_TEMPLATE.format(
+    query=TARGET_SCHOOL_SCORE_STR, order_by=TARGET_SCHOOL_ORDER_BY, cutoff=TARGET_SCHOOL_CUTOFF)
+
+# Keyset pagination (see api/pagination.py): the order gets article_id as the last key so it is total.
+# The first page is the top-K query, the next ones take `max_score` and `total_count` from the cursor
+# and only keep the articles after the last one of the previous page.
+SIMILAR_BACKGROUND_PAGE_ORDER_BY = SIMILAR_BACKGROUND_ORDER_BY + ', article_id ASC'
+TARGET_SCHOOL_PAGE_ORDER_BY = TARGET_SCHOOL_ORDER_BY + ', article_id ASC'
+SIMILAR_BACKGROUND_AFTER = """(score < :after_score OR (score = :after_score AND (
+            COALESCE(date, 'infinity') < :after_date OR (COALESCE(date, 'infinity') = :after_date AND (
+            COALESCE(gpa_diff, 'Infinity') > :after_gpa_diff OR (COALESCE(gpa_diff, 'Infinity') = :after_gpa_diff AND
+            article_id > :after_article_id))))))"""
+TARGET_SCHOOL_AFTER = """(score < :after_score OR (score = :after_score AND (
+            COALESCE(date, 'infinity') < :after_date OR (COALESCE(date, 'infinity') = :after_date AND
+            article_id > :after_article_id))))"""
+
+NEXT_PAGE_QUERY_TEMPLATE = """
+        SELECT * FROM (
+            SELECT ranked.*, :total_count AS total_count, :max_score AS max_score
+            FROM ({query}) AS ranked
+        ) AS windowed
+        WHERE score IS NOT NULL AND (total_count <= 100 OR {cutoff}) AND {after}
+        ORDER BY {order_by}
+        LIMIT :limit;
+    """
+
+QUERY_SIMILAR_BACKGROUND_FIRST_PAGE_STR = TOP_K_QUERY_TEMPLATE.format(
+    query=SIMILAR_BACKGROUND_SCORE_STR, order_by=SIMILAR_BACKGROUND_PAGE_ORDER_BY, cutoff=SIMILAR_BACKGROUND_CUTOFF)
+QUERY_SIMILAR_BACKGROUND_NEXT_PAGE_STR = NEXT_PAGE_QUERY_TEMPLATE.format(
+    query=SIMILAR_BACKGROUND_SCORE_STR, order_by=SIMILAR_BACKGROUND_PAGE_ORDER_BY, cutoff=SIMILAR_BACKGROUND_CUTOFF,
+    after=SIMILAR_BACKGROUND_AFTER)
+QUERY_TARGET_SCHOOL_FIRST_PAGE_STR = TOP_K_QUERY_TEMPLATE.format(
+    query=TARGET_SCHOOL_SCORE_STR, order_by=TARGET_SCHOOL_PAGE_ORDER_BY, cutoff=TARGET_SCHOOL_CUTOFF)
+QUERY_TARGET_SCHOOL_NEXT_PAGE_STR = NEXT_PAGE_QUERY_TEMPLATE.format(
+    query=TARGET_SCHOOL_SCORE_STR, order_by=TARGET_SCHOOL_PAGE_ORDER_BY, cutoff=TARGET_SCHOOL_CUTOFF,
+    after=TARGET_SCHOOL_AFTER)
+
+# Bind parameters of the query strings, same pattern as SQLAlchemy's `text()` which skips `::int` casts
+BIND_PARAM_REG = re.compile(r'(?<![:\w\\]):(\w+)(?!:)')
+
+# Several candidates in one execution: the candidates are a VALUES list and the top-K query
+# runs once per candidate through a LATERAL join, reading its parameters from the `q` row
+BATCH_QUERY_COLUMNS = ['article_type', 'uni_id', 'major_id', 'major_type', 'gpa', 'universities',
+                       'programs', 'program_types', 'program_level', 'program_type_arr']
+BATCH_QUERY_TEMPLATE = """
+        SELECT q.query_id, r.*
+        FROM (VALUES {values}) AS q(query_id, {columns}),
+            LATERAL ({query}) AS r
+        ORDER BY q.query_id, {order_by};
+    """
 
-def query_similar_background_api(candidate):
-    candidate['program_type_arr'] = candidate['program_types']
-    columns = ['universities', 'programs', 'program_types']
-    for col in columns:
-        if candidate[col]:
-            likestring = '(' + '|'.join(candidate[col]) + ')'
-            candidate[col] = likestring
-    articles = session.execute(QUERY_SIMILAR_BACKGROUND_PROGRAM_STR, candidate)
-    session.commit()
-    return list(articles)
 
+def batch_query(query, order_by, size):
+    """Turn a top-K query string into a query over `size` candidates, their parameters get a `_<i>` suffix"""
+    query = query.strip().rstrip(';').replace('ARRAY[:program_type_arr]::varchar[]', ':program_type_arr')
+    query = BIND_PARAM_REG.sub(lambda m: ':' + m.group(1) if m.group(1) == 'limit' else 'q.' + m.group(1), query)
+    values = []
+    for i in range(size):
+        row = [':query_id_%d' % i] + [':%s_%d' % (col, i) for col in BATCH_QUERY_COLUMNS]
+        row[-1] = 'CAST(%s AS varchar[])' % row[-1]
+        values.append('(' + ', '.join(row) + ')')
+    return BATCH_QUERY_TEMPLATE.format(values=', '.join(values), columns=', '.join(BATCH_QUERY_COLUMNS),
+                                       query=query, order_by=order_by)
 
-def query_target_school_api(candidate):
+
+def prepare_candidate(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    """Turn the normalized query lists into the regex strings used by the scoring queries"""
     candidate['program_type_arr'] = candidate['program_types']
+    candidate['limit'] = limit
     columns = ['universities', 'programs', 'program_types']
     for col in columns:
         if candidate[col]:
             likestring = '(' + '|'.join(candidate[col]) + ')'
             candidate[col] = likestring
-    articles = session.execute(QUERY_TARGET_SCHOOL_STR, candidate)
-    session.commit()
-    return list(articles)
+    return candidate
+
+
+def read_only_query(query, params):
+    """Run `query` in a read-only transaction on a connection checked out of the pool for this call only"""
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute('SET TRANSACTION READ ONLY')
+            return list(connection.execute(sa.text(query), params))
+
+
+def stream_query(query, params):
+    """Same as `read_only_query`, but yield the rows as they are fetched from a server-side cursor"""
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute('SET TRANSACTION READ ONLY')
+            for row in connection.execution_options(stream_results=True).execute(sa.text(query), params):
+                yield row
+
+
+def query_similar_background_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return read_only_query(QUERY_SIMILAR_BACKGROUND_TOP_K_STR, prepare_candidate(candidate, limit))
+
+
+def query_target_school_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return read_only_query(QUERY_TARGET_SCHOOL_TOP_K_STR, prepare_candidate(candidate, limit))
+
+
+def page_query(first_page_query, next_page_query, candidate, limit, after=None, stream=False):
+    """Up to `limit` articles after the cursor `after` (the first page if None), an iterator if `stream`"""
+    params = prepare_candidate(candidate, limit)
+    if after is not None:
+        params.update(cursor_params(after))
+    query = first_page_query if after is None else next_page_query
+    return stream_query(query, params) if stream else read_only_query(query, params)
+
+
+def query_similar_background_page_api(candidate, limit, after=None, stream=False):
+    return page_query(QUERY_SIMILAR_BACKGROUND_FIRST_PAGE_STR, QUERY_SIMILAR_BACKGROUND_NEXT_PAGE_STR,
+                      candidate, limit, after, stream)
+
+
+def query_target_school_page_api(candidate, limit, after=None, stream=False):
+    return page_query(QUERY_TARGET_SCHOOL_FIRST_PAGE_STR, QUERY_TARGET_SCHOOL_NEXT_PAGE_STR,
+                      candidate, limit, after, stream)
+
+
+def read_only_batch_query(query, order_by, candidates, limit):
+    """Rank every candidate in one execution, return a list of articles per candidate in order"""
+    if not candidates:
+        return []
+    params = {'limit': limit}
+    for i, candidate in enumerate(candidates):
+        candidate = prepare_candidate(candidate, limit)
+        params['query_id_%d' % i] = i
+        for col in BATCH_QUERY_COLUMNS:
+            params['%s_%d' % (col, i)] = candidate[col]
+    results = [[] for _ in candidates]
+    for row in read_only_query(batch_query(query, order_by, len(candidates)), params):
+        results[row.query_id].append(row)
+    return results
+
+
+def query_similar_background_batch_api(candidates, limit=MAX_NUMBER_OF_ARTICLES):
+    return read_only_batch_query(QUERY_SIMILAR_BACKGROUND_TOP_K_STR, SIMILAR_BACKGROUND_ORDER_BY, candidates, limit)
+
+
+def query_target_school_batch_api(candidates, limit=MAX_NUMBER_OF_ARTICLES):
+    return read_only_batch_query(QUERY_TARGET_SCHOOL_TOP_K_STR, TARGET_SCHOOL_ORDER_BY, candidates, limit)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""Metrics of the API process, served by `/metrics`
+
+    ptt_api_request_seconds   latency of each request, by method and route
+    ptt_api_requests_total    requests by method, route and status code
+    ptt_api_stage_seconds     time spent in `parse_request`, the query and the response rendering, by endpoint
+    ptt_api_errors_total      queries that failed and answered an empty list, by endpoint
+    ptt_api_batch_candidates_total  candidates of the batch requests, by endpoint and how they were answered
+
+The response and normalization cache statistics are read when the metrics are rendered. The
+stages timed by the last `python ingest.py` are appended from `INGEST_METRICS_PATH`. Each
+worker process has its own metrics.
+"""
+import os
+from config.settings import INGEST_METRICS_PATH
+from utils.metrics import Registry
+
+METRICS_MEDIA_TYPE = 'text/plain; version=0.0.4'
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram('ptt_api_request_seconds', 'Latency of the API requests', ('method', 'route'))
+REQUESTS = REGISTRY.counter('ptt_api_requests_total', 'API requests by status code', ('method', 'route', 'status'))
+STAGE_SECONDS = REGISTRY.histogram('ptt_api_stage_seconds', 'Time spent in each stage of the API requests', ('endpoint', 'stage'))
+ERRORS = REGISTRY.counter('ptt_api_errors_total', 'Failed queries answered with an empty list', ('endpoint',))
+BATCH_CANDIDATES = REGISTRY.counter('ptt_api_batch_candidates_total',
+                                    'Candidates of the batch requests that were ranked, cached or a duplicate of another',
+                                    ('endpoint', 'outcome'))
+
+
+def stage(endpoint, name):
+    """Time the `with` block as the stage `name` of `endpoint`"""
+    return STAGE_SECONDS.time((endpoint, name))
+
+
+def cache_collector(name, caches):
+    """Collector of the `LRUCache.stats` of `caches()`, a dict of cache name -> stats"""
+    def collect():
+        stats = caches()
+        for key, metric_type, documentation in (('hits', 'counter', 'lookups answered from the cache'),
+                                                ('misses', 'counter', 'lookups missing from the cache'),
+                                                ('evictions', 'counter', 'entries evicted or expired'),
+                                                ('size', 'gauge', 'entries in the cache')):
+            suffix = '_total' if metric_type == 'counter' else ''
+            yield (f'ptt_{name}_cache_{key}{suffix}', metric_type, f'{name.capitalize()} cache {documentation}',
+                   [({'cache': cache}, s[key]) for cache, s in sorted(stats.items())])
+    return collect
+
+
+def render_metrics(path=INGEST_METRICS_PATH):
+    body = REGISTRY.render()
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            body += f.read()
+    return body
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request until its response is sent
+
+    The route is the path of the matching endpoint, other paths are counted as `other`
+    so unknown URLs do not grow the number of series.
+    """
+
+    def __init__(self, app, routes=None):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        path = scope['path']
+        route = path if self.routes is None or path in self.routes else 'other'
+        labels = (scope['method'], route)
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        with REQUEST_SECONDS.time(labels):
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                REQUESTS.inc(labels + (str(status[0]),))
@@ -54,7 +54,7 @@ class Article(BaseModel):
     article_id: str
     article_title: str
     author: str
-    date: datetime
+    date: datetime = Field(None)
     url: str
     university: str = Field(None)
     university_cname: str = Field(None)
@@ -102,3 +102,36 @@ def init_candidate(article, programs):
         admission_programs=programs,
         score=article.score
     )
+
+
+# Fast path: the rows are already typed by the DB, so build the JSON-ready dicts directly instead of
+# validating `Program`/`Article` models. The output is the same as `jsonable_encoder(init_candidate(...))`.
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def program_dicts(article):
+    return [{'university': uni, 'program': program, 'program_level': program_level, 'program_type': program_type}
+            for uni, program, program_level, program_type in
+            zip(article.universities, article.programs, article.program_levels, article.program_types)]
+
+
+def article_dict(article):
+    return {
+        'article_id': article.article_id,
+        'article_title': article.article_title,
+        'author': article.author,
+        'date': article.date.isoformat() if article.date is not None else None,
+        'url': article.url,
+        'university': article.uni_id,
+        'university_cname': article.uni_cname,
+        'university_cabbr': article.uni_cabbr,
+        'major': article.major_id,
+        'major_cname': article.major_cname,
+        'major_cabbr': article.major_cabbr,
+        'major_type': article.major_type,
+        'gpa': _float(article.mean_gpa),
+        'gpa_scale': _float(article.gpa_scale),
+        'admission_programs': program_dicts(article),
+        'score': float(article.score)
+    }
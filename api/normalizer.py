@@ -0,0 +1,49 @@
+from config.settings import NORMALIZATION_CACHE_SIZE, NORMALIZATION_CACHE_TTL
+from utils.cache import LRUCache
+from utils.reference import get_reference_data
+
+
+class Normalizer:
+    """Reference data that `parse_request` needs to normalize a request
+
+    The parsers are those of the process `ReferenceData` (see `utils/reference.py`), which the
+    API workers load from the snapshot saved by the ingest command. Each normalization step
+    is memoized on the raw input string, the caches belong to the instance and start empty.
+    """
+    steps = ('university', 'major', 'school', 'program')
+
+    def __init__(self, tw_background=None, us_background=None, programs=None,
+                 cache_size=NORMALIZATION_CACHE_SIZE, cache_ttl=NORMALIZATION_CACHE_TTL):
+        reference = get_reference_data() if None in (tw_background, us_background, programs) else None
+        self.tw_background = tw_background if tw_background is not None else reference.tw_background
+        self.us_background = us_background if us_background is not None else reference.us_background
+        self.programs = programs if programs is not None else reference.programs
+        self.init_caches(cache_size, cache_ttl)
+
+    def init_caches(self, cache_size=NORMALIZATION_CACHE_SIZE, cache_ttl=NORMALIZATION_CACHE_TTL):
+        self.caches = {step: LRUCache(cache_size, cache_ttl) for step in self.steps}
+
+    def cache_stats(self):
+        return {step: cache.stats() for step, cache in self.caches.items()}
+
+    def normalize_university(self, university):
+        """Taiwanese university id, e.g. '台大' -> 'NTU'"""
+        return self.caches['university'].get_or_compute(
+            university, lambda x: self.tw_background.sentence2university(x)[0] or '')
+
+    def normalize_major(self, major):
+        """Major id, e.g. '資工' -> 'CS'"""
+        return self.caches['major'].get_or_compute(
+            major, lambda x: self.tw_background.sentence2major(x, from_api=True) or '')
+
+    def normalize_school(self, school):
+        """US university fullname, e.g. 'CMU' -> 'Carnegie Mellon University'"""
+        return self.caches['school'].get_or_compute(
+            school, lambda x: self.us_background.search_single_university_name(self.us_background.normalize_university_name(x)))
+
+    def normalize_program(self, program):
+        """Normalized program name, e.g. 'MS in HCI' -> 'MHCI'"""
+        def helper(program):
+            (program_level, program_name), _ = self.us_background.programs.search_program(program)
+            return self.us_background.programs.normalize_program_name(program_level, program_name)
+        return self.caches['program'].get_or_compute(program, helper)
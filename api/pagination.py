@@ -0,0 +1,127 @@
+"""Keyset pagination of the ranked articles
+
+A page is the next `page_size` articles after the last article of the previous page in
+the order score DESC, date DESC, gpa_diff ASC, article_id ASC, where NULL dates come first
+and NULL gpa differences last, as in the SQL ORDER BY. The cursor carries that sort key,
+plus the best score and the number of scored articles of the first page so the cut-off
+stays the same on every page without ranking the previous pages again. Those values go
+into the next page query, so the cursor is signed with `CURSOR_SECRET`.
+"""
+import hmac
+import json
+import math
+import base64
+import hashlib
+import secrets
+from datetime import datetime
+from config.settings import CURSOR_SECRET, MAX_NUMBER_OF_ARTICLES
+
+# Without CURSOR_SECRET a cursor is only accepted by the worker process that issued it
+_secret = CURSOR_SECRET.encode('utf-8') if CURSOR_SECRET else secrets.token_bytes(32)
+
+
+def query_hash(key):
+    """Ties a cursor to the normalized query it was issued for"""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _signature(payload):
+    return hmac.new(_secret, payload, hashlib.sha256).digest()
+
+
+def _nullable(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return float(value)
+
+
+def encode_cursor(row, key, returned, page_size):
+    """Cursor of the page that starts after `row`"""
+    cursor = {
+        'q': query_hash(key),
+        'score': float(row.score),
+        'date': row.date.isoformat() if row.date is not None else None,
+        'gpa_diff': _nullable(getattr(row, 'gpa_diff', None)),
+        'article_id': row.article_id,
+        'max_score': float(row.max_score),
+        'total_count': int(row.total_count),
+        'returned': returned,
+        'page_size': page_size,
+    }
+    payload = json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+    return _b64encode(payload) + '.' + _b64encode(_signature(payload))
+
+
+def _is_int(value, low, high):
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def decode_cursor(cursor, key):
+    """Parse a cursor issued for `key`, raise ValueError if it is malformed, tampered with or belongs to another query"""
+    try:
+        payload, signature = cursor.split('.')
+        payload = _b64decode(payload)
+        signed = hmac.compare_digest(_b64decode(signature), _signature(payload))
+        after = json.loads(payload) if signed else None
+    except (ValueError, UnicodeDecodeError, base64.binascii.Error) as error:
+        raise ValueError('Invalid cursor') from error
+    if not signed:
+        raise ValueError('Invalid cursor signature')
+    if not isinstance(after, dict) or after.get('q') != query_hash(key):
+        raise ValueError('Cursor does not belong to this query')
+    try:
+        valid = (
+            (after['date'] is None or datetime.fromisoformat(after['date']) is not None)
+            and isinstance(after['article_id'], str)
+            and _is_number(after['score']) and _is_number(after['max_score'])
+            and (after['gpa_diff'] is None or _is_number(after['gpa_diff']))
+            and _is_int(after['total_count'], 0, math.inf)
+            and _is_int(after['returned'], 1, MAX_NUMBER_OF_ARTICLES)
+            and _is_int(after['page_size'], 1, MAX_NUMBER_OF_ARTICLES)
+        )
+    except (KeyError, TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError('Invalid cursor')
+    return after
+
+
+def cursor_params(after):
+    """Bind parameters of the keyset condition, NULL keys are replaced by the value they sort like"""
+    return {
+        'after_score': after['score'],
+        'after_date': after['date'] if after['date'] is not None else 'infinity',
+        'after_gpa_diff': after['gpa_diff'] if after['gpa_diff'] is not None else float('inf'),
+        'after_article_id': after['article_id'],
+        'max_score': after['max_score'],
+        'total_count': after['total_count'],
+    }
+
+
+def is_after(row, after):
+    """Whether `row` comes after the cursor position, same as the SQL keyset condition"""
+    score = float(row.score)
+    if score != after['score']:
+        return score < after['score']
+    date = row.date if row.date is not None else datetime.max
+    after_date = datetime.fromisoformat(after['date']) if after['date'] is not None else datetime.max
+    if date != after_date:
+        return date < after_date
+    gpa_diff = _nullable(getattr(row, 'gpa_diff', None))
+    gpa_diff = gpa_diff if gpa_diff is not None else math.inf
+    after_gpa_diff = after['gpa_diff'] if after['gpa_diff'] is not None else math.inf
+    if gpa_diff != after_gpa_diff:
+        return gpa_diff > after_gpa_diff
+    return row.article_id > after['article_id']
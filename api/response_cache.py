@@ -0,0 +1,126 @@
+import json
+import time
+import hashlib
+import threading
+from starlette.responses import Response
+try:
+    import orjson
+except ImportError:
+    orjson = None
+from api.models import article_dict
+from config.settings import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_CHECK_INTERVAL
+from utils.cache import LRUCache
+
+
+def cache_key(endpoint, query_dict):
+    """Key of a normalized query, the list fields are sorted since their order does not change the ranking"""
+    canonical = {k: sorted(v) if isinstance(v, list) else v for k, v in query_dict.items()}
+    return endpoint + ':' + json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+
+
+def dumps(value):
+    """JSON bytes of plain dicts and lists, the same bytes as FastAPI's default JSONResponse, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode('utf-8')
+
+
+def render_articles(articles):
+    """Serialize the ranked rows as a List[Article] response without building the pydantic models"""
+    return dumps([article_dict(article) for article in articles])
+
+
+def render_line(value):
+    """One NDJSON line"""
+    return dumps(value) + b'\n'
+
+
+class ResponseCache:
+    """Serialized responses of /admission and /school, keyed on the normalized query
+
+    Each entry holds the JSON body and its ETag. The entries belong to one version of the
+    loaded data, `data_version` is polled at most every `check_interval` seconds and the
+    cache is dropped as soon as a new data load shows up.
+
+    Parameters
+    ----------
+    data_version : callable
+        Returns an identifier of the currently loaded data
+    maxsize : int
+        Maximum number of cached responses, 0 disables the cache
+    ttl : float, optional
+        Seconds before a response expires, by default None (never)
+    check_interval : float
+        Seconds between two `data_version` checks
+    """
+
+    def __init__(self, data_version, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL,
+                 check_interval=RESPONSE_CACHE_CHECK_INTERVAL):
+        self.data_version = data_version
+        self.check_interval = check_interval
+        self.cache = LRUCache(maxsize, ttl)
+        self.version = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh_due(self, now=None):
+        """Whether `refresh` is due to check `data_version`, which may query the database"""
+        now = time.monotonic() if now is None else now
+        return self.checked_at is None or now - self.checked_at >= self.check_interval
+
+    def refresh(self):
+        """Drop every response if the data changed since the last check"""
+        now = time.monotonic()
+        if not self.refresh_due(now):
+            return
+        with self._lock:
+            if not self.refresh_due(now):
+                return
+            version = self.data_version()
+            if version != self.version:
+                self.cache.clear()
+                self.version = version
+            self.checked_at = now
+
+    def get(self, key):
+        """Return the cached (body, etag) of `key`, None on a miss, and the data version it was checked against
+
+        Pass the version on to `set` so a response ranked on older data is never stored.
+        """
+        self.refresh()
+        return self.lookup(key)
+
+    def lookup(self, key):
+        """`get` without the `data_version` check, a pure in-memory lookup"""
+        version = self.version
+        return self.cache.get(key), version
+
+    def set(self, key, body, version):
+        """Store the response of `key` unless the data changed since `get` returned `version`"""
+        etag = make_etag(body)
+        with self._lock:
+            if version == self.version:
+                self.cache.set(key, (body, etag))
+        return body, etag
+
+    def stats(self):
+        return dict(self.cache.stats(), version=self.version)
+
+
+def make_etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    """Whether the `If-None-Match` request header covers `etag`"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+def make_response(body, etag, if_none_match=None):
+    """200 with the cached body, or an empty 304 when the client already has this version"""
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
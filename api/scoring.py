@@ -0,0 +1,323 @@
+"""In-process scoring engine for the /admission and /school endpoints
+
+The admission rows dumped by the data pipeline are loaded once into NumPy
+column arrays, with every string column encoded as integer codes. The score of
+`QUERY_SIMILAR_BACKGROUND_PROGRAM_STR` and `QUERY_TARGET_SCHOOL_STR` is then
+evaluated with vectorized operations and reduced per article with MAX, so the
+hot endpoints can be served without a database round trip.
+"""
+import csv
+import os
+import hashlib
+import re
+import threading
+import collections
+import dateutil.parser
+import numpy as np
+from decimal import Decimal
+from config.settings import OUTPUT_DIR, MAX_NUMBER_OF_ARTICLES
+from api.pagination import is_after
+
+ArticleRow = collections.namedtuple('ArticleRow', [
+    'article_id', 'article_title', 'author', 'date', 'url', 'uni_id', 'uni_cname', 'uni_cabbr',
+    'major_id', 'major_cname', 'major_cabbr', 'major_type', 'mean_gpa', 'gpa_scale',
+    'universities', 'programs', 'program_types', 'program_levels', 'score', 'gpa_diff', 'total_count', 'max_score'
+])
+
+
+def _bound(gpa, delta):
+    """Mimic Postgres, which evaluates `:gpa + delta` as an exact numeric before comparing it to a float"""
+    return float(Decimal(repr(float(gpa))) + Decimal(delta))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _to_datetime64(value):
+    if not value:
+        return np.datetime64('NaT')
+    return np.datetime64(dateutil.parser.parse(value), 'us')
+
+
+def _pattern(values):
+    """Same alternation regex `query_similar_background_api` builds, None if there is nothing to match"""
+    return '(' + '|'.join(values) + ')' if values else None
+
+
+class Vocabulary:
+    """Integer codes for a string column"""
+
+    def __init__(self):
+        self.values = []
+        self.value2code = {}
+
+    def encode(self, value):
+        if value not in self.value2code:
+            self.value2code[value] = len(self.values)
+            self.values.append(value)
+        return self.value2code[value]
+
+    def code(self, value):
+        return self.value2code.get(value, -1)
+
+    def match(self, pattern):
+        """Boolean array over the codes whose value contains `pattern`, like Postgres' `~` operator"""
+        if pattern is None:
+            return np.zeros(len(self.values), dtype=bool)
+        reg = re.compile(pattern)
+        return np.array([reg.search(v) is not None for v in self.values], dtype=bool)
+
+
+class ScoringEngine:
+    def __init__(self, articles, programs):
+        """Build the column arrays
+
+        Parameters
+        ----------
+        articles : list of dict
+            Rows of `admission_articles.csv`
+        programs : list of dict
+            Rows of `admission_uni_and_programs.csv`
+        """
+        self.version = None
+        self.stat = None
+        self.vocab = collections.defaultdict(Vocabulary)
+        article_index = {}
+        for article in articles:
+            article_index.setdefault(article['article_id'], len(article_index))
+        articles = [a for idx, a in enumerate(articles) if article_index[a['article_id']] == idx]
+
+        # Program rows, grouped by article in file order (the order of `array_agg`)
+        programs = [p for p in programs if p['article_id'] in article_index]
+        programs.sort(key=lambda p: article_index[p['article_id']])
+        self.program_article = np.array([article_index[p['article_id']] for p in programs], dtype=np.int64)
+        for col in ('university', 'program', 'program_type', 'program_level'):
+            setattr(self, col, np.array([self.vocab[col].encode(p[col]) for p in programs], dtype=np.int64))
+
+        # Article columns
+        for col in ('article_type', 'uni_id', 'major_id', 'major_type'):
+            setattr(self, col, np.array([self.vocab[col].encode(a[col]) for a in articles], dtype=np.int64))
+        self.mean_gpa = np.array([_to_float(a['mean_gpa']) for a in articles], dtype=np.float64)
+        self.min_gpa = np.array([_to_float(a['min_gpa']) for a in articles], dtype=np.float64)
+        self.date = np.array([_to_datetime64(a['date']) for a in articles], dtype='datetime64[us]')
+
+        # Article rows returned to the API, the aggregated arrays are filled per article
+        self.rows = []
+        for a in articles:
+            self.rows.append({
+                'article_id': a['article_id'], 'article_title': a['article_title'], 'author': a['author'],
+                'date': self.date[len(self.rows)].item(), 'url': a['url'], 'uni_id': a['uni_id'],
+                'uni_cname': a['uni_cname'], 'uni_cabbr': a['uni_cabbr'], 'major_id': a['major_id'],
+                'major_cname': a['major_cname'], 'major_cabbr': a['major_cabbr'], 'major_type': a['major_type'],
+                'mean_gpa': self.mean_gpa[len(self.rows)], 'gpa_scale': _to_float(a['gpa_scale']),
+                'universities': [], 'programs': [], 'program_types': [], 'program_levels': []
+            })
+        for p in programs:
+            row = self.rows[article_index[p['article_id']]]
+            row['universities'].append(p['university'])
+            row['programs'].append(p['program'])
+            row['program_types'].append(p['program_type'])
+            row['program_levels'].append(p['program_level'])
+
+        # Position of each article in article_id order, the last sort key of the paginated order
+        self.article_id_rank = np.argsort(np.argsort(np.array([a['article_id'] for a in articles], dtype=object), kind='stable'))
+
+        # Articles that show up in `article_program_view`, and where each of them starts in the program rows
+        self.scored_articles, self.program_offsets = np.unique(self.program_article, return_index=True)
+
+        # Constant regex terms of the scoring queries
+        self.uni_is_big3 = self.vocab['uni_id'].match('(NTU|NCTU|NTHU)')[self.uni_id]
+        self.major_is_cs_ee = self.vocab['major_type'].match('(CS|EE)')[self.major_type]
+        self.program_is_cs_ee = self.vocab['program'].match('(CS|MSCS|EE|MSEE)')[self.program]
+
+    csv_names = ('admission_articles.csv', 'admission_uni_and_programs.csv')
+
+    @classmethod
+    def csv_stat(cls, output_dir=OUTPUT_DIR):
+        """Size and modification time of the CSV files, to notice a new data dump without reading it"""
+        return tuple((st.st_size, st.st_mtime_ns) for st in (os.stat(os.path.join(output_dir, name)) for name in cls.csv_names))
+
+    @classmethod
+    def from_csv(cls, output_dir=OUTPUT_DIR):
+        tables = []
+        sha = hashlib.sha256()
+        stat = cls.csv_stat(output_dir)
+        for name in cls.csv_names:
+            with open(os.path.join(output_dir, name), 'rb') as f:
+                sha.update(f.read())
+            with open(os.path.join(output_dir, name), 'r', encoding='utf-8') as f:
+                tables.append(list(csv.DictReader(f, delimiter='|')))
+        engine = cls(*tables)
+        engine.version = sha.hexdigest()
+        engine.stat = stat
+        return engine
+
+    def _program_terms(self, candidate):
+        """Regex matches of the program rows against the candidate's target programs, types and universities"""
+        universities = _pattern(candidate['universities'])
+        return (
+            self.vocab['program'].match(_pattern(candidate['programs']))[self.program],
+            self.vocab['program_type'].match(_pattern(candidate['program_types']))[self.program_type],
+            np.full(len(self.program), candidate['program_level'] == 'PhD') & (
+                self.program_level == self.vocab['program_level'].code(candidate['program_level'])),
+            # `length(:universities) > 2` is false for an empty list as well as for ['']
+            self.vocab['university'].match(universities)[self.university] if universities and len(universities) > 2
+            else np.zeros(len(self.program), dtype=bool)
+        )
+
+    def _article_terms(self, candidate):
+        """Score terms that only depend on the article, i.e. the author's background"""
+        gpa = candidate['gpa']
+        mean_gpa, min_gpa = self.mean_gpa, self.min_gpa
+
+        def between(col, lo, hi):
+            return (col >= _bound(gpa, lo)) & (col <= _bound(gpa, hi))
+
+        uni = self.uni_id == self.vocab['uni_id'].code(candidate['uni_id'])
+        major = self.major_id == self.vocab['major_id'].code(candidate['major_id'])
+        major_type = self.major_type == self.vocab['major_type'].code(candidate['major_type'])
+        has_uni, has_major, has_major_type = len(candidate['uni_id']) > 0, len(candidate['major_id']) > 0, len(candidate['major_type']) > 0
+        low_min_gpa = min_gpa <= 3.01
+
+        score = 6 * between(mean_gpa, '-0.2', '0.2') + \
+            5 * (between(mean_gpa, '-0.3', '-0.21') | between(mean_gpa, '0.21', '0.3')) + \
+            2 * (between(mean_gpa, '-0.5', '-0.31') | between(mean_gpa, '0.31', '0.5')) + \
+            4 * (low_min_gpa & between(min_gpa, '-0.25', '0.25')) + \
+            3.7 * (low_min_gpa & (Decimal(repr(float(gpa))) <= Decimal('3.01')) & (min_gpa >= 0) & (min_gpa <= 3.01)) + \
+            -0.2 * (mean_gpa == -1) + \
+            8 * (has_uni & uni) + \
+            20 * (has_uni & uni & ~self.uni_is_big3) + \
+            3 * (has_major_type & (major | major_type)) + \
+            1 * (has_major & ~uni & major & ~self.major_is_cs_ee) + \
+            5 * (has_major & uni & major & ~self.major_is_cs_ee) + \
+            2 * (has_uni & has_major & uni & major)
+        # NULL GPAs make the whole SQL score NULL
+        score[np.isnan(mean_gpa) | np.isnan(min_gpa)] = np.nan
+        return score
+
+    def _rank(self, candidate, limit, cutoff, program_score, article_score=None, gpa_diff=None):
+        """Group the program scores per article with MAX, then filter, sort and cut them like the SQL queries"""
+        score = program_score if article_score is None else program_score + article_score[self.program_article]
+        # Rows of `article_program_view` that satisfy `article_type = :article_type`
+        article_type = self.vocab['article_type'].code(candidate['article_type'])
+        in_view = self.article_type[self.program_article] == article_type
+        score = np.where(in_view, score, -np.inf)
+        article_score = np.fmax.reduceat(score, self.program_offsets)
+        selected = self.article_type[self.scored_articles] == article_type
+
+        # `program_types && ARRAY[:program_type_arr]`
+        if candidate['program_types']:
+            codes = [self.vocab['program_type'].code(t) for t in candidate['program_types']]
+            overlap = np.logical_or.reduceat(np.isin(self.program_type, codes) & in_view, self.program_offsets)
+            selected &= overlap
+        articles, article_score = self.scored_articles[selected], np.round(article_score[selected], 1)
+
+        # ORDER BY score DESC, date DESC, gpa_diff ASC (Postgres puts NULLs first for DESC),
+        # ties are broken by article_id like the paginated order
+        keys = [np.where(np.isnan(article_score), -np.inf, -article_score),
+                np.where(np.isnat(self.date[articles]), np.iinfo(np.int64).min, -self.date[articles].astype(np.int64))]
+        if gpa_diff is not None:
+            gpa_diff = gpa_diff[articles]
+            keys.append(gpa_diff)
+        keys.append(self.article_id_rank[articles])
+        order = np.lexsort(keys[::-1])
+
+        # Same cut-off as `TOP_K_QUERY_TEMPLATE`
+        total_count = len(order)
+        max_score = article_score[order[0]] if total_count else np.nan
+        if np.isnan(max_score):
+            return []
+        scores = article_score[order]
+        keep = ~np.isnan(scores)
+        if total_count > 100:
+            keep &= cutoff(scores, max_score)
+        order = order[keep][:limit]
+
+        result = []
+        for idx in order:
+            row = dict(self.rows[articles[idx]])
+            row['score'] = float(article_score[idx])
+            row['gpa_diff'] = float(gpa_diff[idx]) if gpa_diff is not None else None
+            row['total_count'] = total_count
+            row['max_score'] = float(max_score)
+            result.append(ArticleRow(**row))
+        return result
+
+    def query_similar_background(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        prog, prog_type, phd, uni = self._program_terms(candidate)
+        program_score = 6 * prog + 4 * (prog & ~self.program_is_cs_ee) + 5 * prog_type + 10 * phd + 15 * uni
+        gpa_diff = np.abs(self.mean_gpa - float(candidate['gpa']))
+        return self._rank(candidate, limit, lambda score, max_score: score >= np.floor(max_score / 2),
+                          program_score.astype(np.float64), self._article_terms(candidate), gpa_diff)
+
+    def query_target_school(self, candidate, limit=MAX_NUMBER_OF_ARTICLES):
+        prog, prog_type, phd, uni = self._program_terms(candidate)
+        program_score = 50 * prog + 1 * prog_type + 1 * phd + 48 * uni
+        return self._rank(candidate, limit, lambda score, max_score: score == max_score, program_score.astype(np.float64))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_scoring_engine():
+    """Load the scoring engine from the dumped CSV files on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ScoringEngine.from_csv()
+    return _engine
+
+
+def reload_if_changed():
+    """Load the CSV files again if the data pipeline dumped new ones since the engine was built"""
+    global _engine
+    engine = get_scoring_engine()
+    if engine.stat != ScoringEngine.csv_stat():
+        with _engine_lock:
+            if _engine is engine:
+                _engine = ScoringEngine.from_csv()
+    return _engine
+
+
+def data_version():
+    return reload_if_changed().version
+
+
+def query_similar_background_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return get_scoring_engine().query_similar_background(candidate, limit)
+
+
+def query_target_school_api(candidate, limit=MAX_NUMBER_OF_ARTICLES):
+    return get_scoring_engine().query_target_school(candidate, limit)
+
+
+def page(rows, limit, after=None):
+    """Keyset page of fully ranked rows, see api/pagination.py"""
+    if after is not None:
+        rows = [row for row in rows if is_after(row, after)]
+    return rows[:limit]
+
+
+def query_similar_background_page_api(candidate, limit, after=None, stream=False):
+    return page(get_scoring_engine().query_similar_background(candidate), limit, after)
+
+
+def query_target_school_page_api(candidate, limit, after=None, stream=False):
+    return page(get_scoring_engine().query_target_school(candidate), limit, after)
+
+
+def query_similar_background_batch_api(candidates, limit=MAX_NUMBER_OF_ARTICLES):
+    engine = get_scoring_engine()
+    return [engine.query_similar_background(candidate, limit) for candidate in candidates]
+
+
+def query_target_school_batch_api(candidates, limit=MAX_NUMBER_OF_ARTICLES):
+    engine = get_scoring_engine()
+    return [engine.query_target_school(candidate, limit) for candidate in candidates]
+
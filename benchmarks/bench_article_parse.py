@@ -0,0 +1,53 @@
+"""Per-article parse time of the admission articles on a synthetic corpus
+
+Each article goes through the same calls as the ingest: the university, major and GPA of the
+author from `TWBackground`, then the admission section and its universities and programs
+from `USBackground`. The times are per article, in microseconds.
+
+Usage: python -m benchmarks.bench_article_parse [number_of_articles]
+"""
+import io
+import sys
+import time
+import contextlib
+import numpy as np
+from utils.background import TWBackground, USBackground
+from benchmarks.synthetic_corpus import generate_articles
+
+
+def parse_tw(tw_background, article):
+    tw_background.find_university_major_gpa(article['content'], aid=article['article_id'])
+
+
+def parse_admission(us_background, article):
+    us_background.parse_admission_section([article])
+
+
+def parse_us(us_background, article):
+    articles = [article]
+    us_background.find_university(article['raw_admission'], articles=articles)
+
+
+def time_per_article(fn, background, articles):
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for article in articles:
+            start = time.perf_counter()
+            fn(background, article)
+            timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e6
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    articles = generate_articles(n)
+    tw_background, us_background = TWBackground(), USBackground()
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_admissions = [us_background.parse_admission_section([article]) for article in articles]
+    print(f'{n} articles')
+    print(f'{"stage":>6} {"mean us":>8} {"p50 us":>8} {"p95 us":>8} {"total s":>8}')
+    stages = [('tw', parse_tw, tw_background, articles), ('ad', parse_admission, us_background, articles),
+              ('us', parse_us, us_background, [dict(article, raw_admission=raw) for article, raw in zip(articles, raw_admissions)])]
+    for stage, fn, background, stage_articles in stages:
+        t = time_per_article(fn, background, stage_articles)
+        print(f'{stage:>6} {t.mean():8.1f} {np.percentile(t, 50):8.1f} {np.percentile(t, 95):8.1f} {t.sum() / 1e6:8.2f}')
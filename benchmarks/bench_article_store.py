@@ -0,0 +1,111 @@
+"""Memory and time of the article storage of `DataModel`: NumPy object array of dicts vs `ArticleStore`
+
+The parsed `output/all_articles.json` is repeated `scale` times (with new article ids). Each
+storage is loaded from the file, then goes through the steps of the pipeline that read the
+whole board: classification, the admission article loops and the JSON/CSV dumps, which must
+write identical files. The array runs the former loading and JSON dumping code.
+
+Usage: python -m benchmarks.bench_article_store [scale]
+"""
+import io
+import gc
+import os
+import sys
+import json
+import time
+import filecmp
+import tempfile
+import contextlib
+import tracemalloc
+import numpy as np
+from config.settings import OUTPUT_DIR
+from utils import data
+from utils.data import DataModel
+from utils.article_store import ArticleStore
+from utils.article_stream import iter_articles
+
+OUTPUT_FILES = ['all_articles.json', 'admission_articles.json', 'ask_articles.json', 'admission_articles.csv',
+                'admission_universities.csv', 'admission_uni_and_programs.csv']
+
+
+def load_array(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return np.array(json.load(f)['articles'])
+
+
+def save_array(dm):
+    for name, indices in (('cs', dm.cs_article_indices), ('admission', dm.admission_article_indices),
+                          ('ask', dm.ask_article_indices), ('all', slice(None))):
+        with open(os.path.join(data.OUTPUT_DIR, f'{name}_articles.json'), 'w', encoding='utf-8') as f:
+            json.dump({'articles': list(dm.all_articles[indices])}, f, ensure_ascii=False, indent=2)
+
+
+def load_store(path):
+    return ArticleStore(iter_articles(path))
+
+
+STORAGES = {
+    'array': (load_array, save_array),
+    'store': (load_store, DataModel.save_classified_articles),
+}
+
+
+def admission_loops(dm):
+    """The access pattern of `parse_university_major_gpa` and `save_university_major_gpa`"""
+    count = 0
+    for _ in range(3):
+        for article in dm.all_articles[dm.admission_article_indices]:
+            count += len(article['article_title'])
+    for idx, article in enumerate(dm.all_articles[dm.admission_article_indices]):
+        if 'university_info' in article:
+            article['university_info'] = article['university_info']
+    return count
+
+
+def run(load, save, path, output_dir):
+    # Memory of the loaded board, then the timings without tracing the allocations
+    gc.collect()
+    tracemalloc.start()
+    articles = load(path)
+    gc.collect()
+    memory_mb = tracemalloc.get_traced_memory()[0] / (1 << 20)
+    tracemalloc.stop()
+    del articles
+    gc.collect()
+
+    timings = {}
+    start = time.perf_counter()
+    dm = DataModel()
+    dm.all_articles = load(path)
+    timings['load'] = time.perf_counter() - start
+    data.OUTPUT_DIR = output_dir
+    steps = [('classify', dm.classify_articles), ('loops', lambda: admission_loops(dm)),
+             ('json', lambda: save(dm)), ('csv', dm.dump_articles_to_csv)]
+    for step, fn in steps:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings[step] = time.perf_counter() - start
+    return memory_mb, timings
+
+
+if __name__ == "__main__":
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        articles = load_array(os.path.join(OUTPUT_DIR, 'all_articles.json')).tolist()
+        path = os.path.join(tmp, 'all_articles.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'articles': [dict(article, article_id=f"{article['article_id']}.{copy}") for copy in range(scale)
+                                    for article in articles]}, f, ensure_ascii=False)
+        print(f'{len(articles) * scale} articles')
+        del articles
+
+        print(f'{"storage":>8} {"MB":>7} {"load s":>7} {"classify s":>10} {"loops s":>8} {"json s":>7} {"csv s":>6}')
+        for name, (load, save) in STORAGES.items():
+            output_dir = os.path.join(tmp, name)
+            os.makedirs(output_dir)
+            memory_mb, t = run(load, save, path, output_dir)
+            print(f'{name:>8} {memory_mb:7.1f} {t["load"]:7.2f} {t["classify"]:10.3f} {t["loops"]:8.3f} {t["json"]:7.2f} {t["csv"]:6.2f}')
+        _, mismatch, errors = filecmp.cmpfiles(os.path.join(tmp, 'array'), os.path.join(tmp, 'store'), OUTPUT_FILES, shallow=False)
+        assert not mismatch and not errors, f'Output differs: {mismatch + errors}'
+    print('Identical output files')
@@ -0,0 +1,43 @@
+"""Compare N single /admission (or /school) requests with one batch request of the same N candidates
+
+The response cache is disabled so every candidate is ranked, and both ways are checked to
+return the same results.
+
+Usage: RESPONSE_CACHE_SIZE=0 python -m benchmarks.bench_batch_endpoint [batch sizes...]
+"""
+import sys
+import time
+import random
+from starlette.testclient import TestClient
+from benchmarks.load_test_api import random_request
+import main
+
+
+def run_single(client, endpoint, requests):
+    start = time.perf_counter()
+    results = [client.post(endpoint, json=request).json() for request in requests]
+    return time.perf_counter() - start, results
+
+
+def run_batch(client, endpoint, requests):
+    start = time.perf_counter()
+    results = client.post(endpoint + '/batch', json=requests).json()
+    return time.perf_counter() - start, results
+
+
+if __name__ == "__main__":
+    assert main.response_cache.cache.maxsize == 0, 'Run with RESPONSE_CACHE_SIZE=0'
+    sizes = [int(n) for n in sys.argv[1:]] or [1, 10, 50, 100]
+    client = TestClient(main.app)
+    rng = random.Random(0)
+    # Warm up the normalization caches and the connection pool
+    run_batch(client, '/admission', [random_request(rng) for _ in range(20)])
+
+    print(f'{"endpoint":10} {"N":>4} {"single s":>9} {"batch s":>8} {"single req/s":>13} {"batch req/s":>12} {"speedup":>8}')
+    for endpoint in ('/admission', '/school'):
+        for n in sizes:
+            requests = [random_request(rng) for _ in range(n)]
+            single, single_results = run_single(client, endpoint, requests)
+            batch, batch_results = run_batch(client, endpoint, requests)
+            assert single_results == batch_results, (endpoint, n)
+            print(f'{endpoint:10} {n:4d} {single:9.3f} {batch:8.3f} {n / single:13.1f} {n / batch:12.1f} {single / batch:7.2f}x')
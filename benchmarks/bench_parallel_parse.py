@@ -0,0 +1,49 @@
+"""Scaling of the from-scratch article parsing over 1/2/4/8 worker processes
+
+Every run parses the admission articles of `data/studyabroad.json` (repeated `scale` times to
+get a bigger board) and must give the same per-article results as the serial run.
+
+Usage: python -m benchmarks.bench_parallel_parse [scale] [workers...]
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+import multiprocessing
+from config.settings import DATA_DIR
+from utils.data import DataModel
+
+PARSED_KEYS = ('university_info', 'major_info', 'gpa_info', 'admission_info')
+
+
+def parse(articles, workers):
+    dm = DataModel(all_articles=articles, workers=workers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        dm.classify_articles()
+        start = time.perf_counter()
+        dm.parse_university_major_gpa()
+        dm.parse_admission_programs()
+        elapsed = time.perf_counter() - start
+    parsed = [{k: article.get(k) for k in PARSED_KEYS} for article in dm.all_articles[dm.admission_article_indices]]
+    return elapsed, len(dm.admission_article_indices), json.dumps(parsed, ensure_ascii=False, sort_keys=False)
+
+
+if __name__ == "__main__":
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    worker_counts = [int(n) for n in sys.argv[2:]] or [1, 2, 4, 8]
+    with open(os.path.join(DATA_DIR, 'studyabroad.json'), 'r', encoding='utf-8') as f:
+        articles = json.load(f)['articles'] * scale
+
+    print(f'{multiprocessing.cpu_count()} CPUs')
+    serial_time, count, expected = parse(json.loads(json.dumps(articles)), 1)
+    print(f'{"workers":>7} {"articles":>9} {"seconds":>8} {"speedup":>8}')
+    print(f'{1:7d} {count:9d} {serial_time:8.2f} {1:7.2f}x')
+    for workers in worker_counts:
+        if workers == 1:
+            continue
+        elapsed, count, parsed = parse(json.loads(json.dumps(articles)), workers)
+        assert parsed == expected, f'{workers} workers differ from the serial parse'
+        print(f'{workers:7d} {count:9d} {elapsed:8.2f} {serial_time / elapsed:7.2f}x')
+    print('Parallel results identical to the serial parse')
@@ -0,0 +1,68 @@
+"""Latency of `parse_request` with and without the memoized normalization steps
+
+Requests are drawn from a Zipf distribution over realistic inputs, so a few hundred
+popular universities, majors, schools and programs make up most of the traffic.
+
+Usage: python -m benchmarks.bench_parse_request [number_of_requests]
+"""
+import io
+import sys
+import time
+import random
+import contextlib
+import numpy as np
+import api.parser
+from api.models import Candidate
+from api.normalizer import Normalizer
+
+
+def zipf_sampler(rng, values, s=1.1):
+    weights = [1 / (rank + 1) ** s for rank in range(len(values))]
+    return lambda k: rng.choices(values, weights=weights, k=k)
+
+
+def generate_requests(normalizer, n, seed=0):
+    rng = random.Random(seed)
+    tw, us = normalizer.tw_background, normalizer.us_background
+    universities = [x for x in list(tw.uid2cname) + list(tw.cabbr2uid) + list(tw.cname2uid) if x]
+    majors = list(tw.mid2name) + list(tw.cabbr2mid) + list(tw.name2mid)
+    schools = us.us_universities['top_100_names'] + list(us.us_universities['top_100_uid'])
+    programs = normalizer.programs.programs
+    for values in (universities, majors, schools, programs):
+        rng.shuffle(values)
+    university, major, school, program = [zipf_sampler(rng, v) for v in (universities, majors, schools, programs)]
+
+    return [Candidate(
+        university=university(1)[0],
+        major=major(1)[0],
+        gpa=round(rng.uniform(2.5, 4.3), 2),
+        target_schools=school(rng.randint(0, 5)),
+        target_programs=program(rng.randint(0, 3)),
+        program_level=rng.choice(['MS', 'PhD'])
+    ) for _ in range(n)]
+
+
+def bench(normalizer, requests):
+    api.parser.normalizer = normalizer
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for request in requests:
+            start = time.perf_counter()
+            api.parser.parse_request(request)
+            latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    reference = api.parser.normalizer
+    requests = generate_requests(reference, n)
+
+    uncached = Normalizer(reference.tw_background, reference.us_background, reference.programs, cache_size=0)
+    cached = Normalizer(reference.tw_background, reference.us_background, reference.programs)
+    for name, normalizer in (('uncached', uncached), ('cached', cached)):
+        ms = bench(normalizer, requests)
+        print(f'{name:9} mean {ms.mean():7.3f} ms  p50 {np.percentile(ms, 50):7.3f} ms  '
+              f'p99 {np.percentile(ms, 99):7.3f} ms  total {ms.sum() / 1000:6.2f} s')
+    for step, stats in cached.cache_stats().items():
+        print(f'{step:10} {stats}')
@@ -0,0 +1,68 @@
+"""Compare fetching every scored article and cutting them in Python with the top-K ranking queries
+
+Usage: python -m benchmarks.bench_ranking_query [repeat]
+"""
+import sys
+import time
+import copy
+import numpy as np
+from config.settings import MAX_NUMBER_OF_ARTICLES
+from api.database import session, prepare_candidate
+from api.database import QUERY_SIMILAR_BACKGROUND_PROGRAM_STR, QUERY_TARGET_SCHOOL_STR
+from api.database import QUERY_SIMILAR_BACKGROUND_TOP_K_STR, QUERY_TARGET_SCHOOL_TOP_K_STR
+
+CANDIDATES = [
+    # Broad queries, which used to pull most of the table
+    {'uni_id': 'NTU', 'major_id': 'EE', 'major_type': 'EE', 'gpa': 3.7, 'program_level': 'MS',
+     'universities': [], 'programs': [], 'program_types': []},
+    {'uni_id': '', 'major_id': '', 'major_type': '', 'gpa': 3.5, 'program_level': 'MS',
+     'universities': [], 'programs': [], 'program_types': []},
+    # Narrow queries
+    {'uni_id': 'NCTU', 'major_id': 'CS', 'major_type': 'CS', 'gpa': 3.9, 'program_level': 'PhD',
+     'universities': ['Carnegie Mellon University', 'Stanford University'], 'programs': ['CS'], 'program_types': ['CS']},
+    {'uni_id': 'NTU', 'major_id': 'IM', 'major_type': 'IM', 'gpa': 3.6, 'program_level': 'MS',
+     'universities': ['Carnegie Mellon University'], 'programs': ['MHCI'], 'program_types': ['HCI']},
+]
+
+
+def cut_in_python(articles, cutoff):
+    """The former `list_programs` / `list_target_school_info` loop"""
+    result = []
+    max_score = articles[0].score if articles and articles[0].score else 0
+    for article in articles[:MAX_NUMBER_OF_ARTICLES]:
+        if article.score is None or (len(articles) > 100 and cutoff(article.score, max_score)):
+            break
+        result.append(article)
+    return result
+
+
+def run(query, candidate, cutoff=None):
+    start = time.perf_counter()
+    rows = list(session.execute(query, prepare_candidate(copy.deepcopy(candidate))))
+    session.commit()
+    transferred = len(rows)
+    if cutoff is not None:
+        rows = cut_in_python(rows, cutoff)
+    return time.perf_counter() - start, transferred, [row.article_id for row in rows]
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    queries = [
+        ('admission', QUERY_SIMILAR_BACKGROUND_PROGRAM_STR, QUERY_SIMILAR_BACKGROUND_TOP_K_STR, lambda score, max_score: score < max_score // 2),
+        ('school', QUERY_TARGET_SCHOOL_STR, QUERY_TARGET_SCHOOL_TOP_K_STR, lambda score, max_score: score != max_score),
+    ]
+    print(f'{"endpoint":10} {"query":4} {"rows before":>12} {"rows after":>11} {"ms before":>10} {"ms after":>9} {"returned":>9}')
+    for name, full_query, top_k_query, cutoff in queries:
+        for idx, candidate in enumerate(CANDIDATES):
+            candidate = dict(candidate, article_type='ADMISSION')
+            before, after = [], []
+            for _ in range(repeat):
+                elapsed, rows_before, ids_before = run(full_query, candidate, cutoff)
+                before.append(elapsed)
+                elapsed, rows_after, ids_after = run(top_k_query, candidate)
+                after.append(elapsed)
+            # Articles tied on every sort key may be returned in a different order
+            assert len(ids_before) == len(ids_after), (name, idx)
+            print(f'{name:10} {idx:4} {rows_before:12} {rows_after:11} {np.median(before) * 1000:10.2f} '
+                  f'{np.median(after) * 1000:9.2f} {len(ids_after):9}')
@@ -0,0 +1,60 @@
+"""Import-to-ready time of the parsers' reference data in a fresh process
+
+    per-class  each parser reads its own files, like `DataModel` used to (majors.csv three times)
+    files      `ReferenceData` reads each file once
+    snapshot   `ReferenceData.load` from an up-to-date snapshot
+
+Each run is a new interpreter that imports the modules and builds the parsers. The times are
+the medians over the runs, with the number of CSV files pandas parsed.
+
+Usage: python -m benchmarks.bench_reference_startup [runs]
+"""
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import numpy as np
+from config.settings import PROJECT_ROOT
+
+MODES = ('per-class', 'files', 'snapshot')
+
+
+def run_child(mode, snapshot_path):
+    import time
+    start = time.perf_counter()
+    import pandas as pd
+    read_csv, csv_reads = pd.read_csv, []
+    pd.read_csv = lambda *args, **kwargs: csv_reads.append(args[0]) or read_csv(*args, **kwargs)
+    from utils.background import TWBackground, USBackground
+    from utils.programs import Programs
+    from utils.reference import ReferenceData
+    imported = time.perf_counter()
+    if mode == 'per-class':
+        TWBackground(), USBackground(), Programs()
+    elif mode == 'files':
+        ReferenceData()
+    else:
+        ReferenceData.load(snapshot_path)
+    ready = time.perf_counter()
+    print(json.dumps({'import': imported - start, 'build': ready - imported, 'total': ready - start, 'csv_reads': len(csv_reads)}))
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--child']:
+        run_child(*sys.argv[2:4])
+        sys.exit()
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, 'reference.pkl')
+        from utils.reference import ReferenceData
+        ReferenceData().save(snapshot_path)
+
+        print(f'{"mode":>10} {"import ms":>10} {"build ms":>9} {"total ms":>9} {"CSV reads":>10}')
+        for mode in MODES:
+            results = [json.loads(subprocess.run([sys.executable, '-m', 'benchmarks.bench_reference_startup', '--child', mode, snapshot_path],
+                                                 cwd=PROJECT_ROOT, check=True, capture_output=True, text=True).stdout.splitlines()[-1])
+                       for _ in range(runs)]
+            median = {k: np.median([r[k] for r in results]) * 1000 for k in ('import', 'build', 'total')}
+            print(f'{mode:>10} {median["import"]:10.1f} {median["build"]:9.1f} {median["total"]:9.1f} {results[0]["csv_reads"]:10d}')
@@ -0,0 +1,65 @@
+"""Serialize ranked articles with the pydantic models and with the validation-free fast path
+
+Both paths must produce the same bytes, with orjson and with the json fallback. The rows come
+from the in-process scoring engine so the benchmark does not need the DB.
+
+Usage: python -m benchmarks.bench_serialization [repeat]
+"""
+import sys
+import time
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from api import response_cache
+from api.models import init_candidate, init_programs
+from api.response_cache import render_articles
+from api.scoring import ScoringEngine
+from config.settings import MAX_NUMBER_OF_ARTICLES
+
+CANDIDATES = [
+    {'uni_id': 'NTU', 'major_id': 'EE', 'major_type': 'EE', 'gpa': 3.7, 'program_level': 'MS',
+     'universities': [], 'programs': [], 'program_types': []},
+    {'uni_id': '', 'major_id': '', 'major_type': '', 'gpa': 3.5, 'program_level': 'MS',
+     'universities': [], 'programs': [], 'program_types': []},
+    {'uni_id': 'NCTU', 'major_id': 'CS', 'major_type': 'CS', 'gpa': 3.9, 'program_level': 'PhD',
+     'universities': ['Carnegie Mellon University', 'Stanford University'], 'programs': ['CS'], 'program_types': ['CS']},
+]
+
+
+def render(result):
+    """Serialize the response models exactly like FastAPI's default JSONResponse"""
+    return JSONResponse(content=jsonable_encoder(result)).body
+
+
+def render_models(articles):
+    """The former path: build and validate the models, then let FastAPI encode them"""
+    return render([init_candidate(article, init_programs(article)) for article in articles])
+
+
+def timed(fn, articles, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn(articles)
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    engine = ScoringEngine.from_csv()
+    results = []
+    for candidate in CANDIDATES:
+        candidate = dict(candidate, article_type='ADMISSION')
+        results.append(engine.query_similar_background(dict(candidate), MAX_NUMBER_OF_ARTICLES))
+        results.append(engine.query_target_school(dict(candidate), MAX_NUMBER_OF_ARTICLES))
+    orjson = response_cache.orjson
+
+    print(f'{"articles":>8} {"models ms":>10} {"fast json ms":>13} {"fast orjson ms":>15} {"speedup":>8}')
+    for articles in results:
+        models_ms, expected = timed(render_models, articles, repeat)
+        response_cache.orjson = None
+        json_ms, json_body = timed(render_articles, articles, repeat)
+        response_cache.orjson = orjson
+        orjson_ms, orjson_body = timed(render_articles, articles, repeat) if orjson else (float('nan'), json_body)
+        assert expected == json_body == orjson_body, len(articles)
+        best = orjson_ms if orjson else json_ms
+        print(f'{len(articles):8d} {models_ms:10.2f} {json_ms:13.2f} {orjson_ms:15.2f} {models_ms / best:7.1f}x')
+    print('Identical JSON output on every result')
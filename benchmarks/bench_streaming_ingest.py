@@ -0,0 +1,89 @@
+"""Peak memory of the ingest pipeline, with the whole board in memory and streamed article by article
+
+`data/studyabroad.json` is repeated `scale` times (with new article ids) to get a bigger board.
+Each pipeline runs in its own process and output directory with the in-process storage backend,
+first parsing the raw articles from scratch, then dumping the parsed `all_articles.json` again.
+Both pipelines must write byte-identical files.
+
+Usage: python -m benchmarks.bench_streaming_ingest [scale...]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import filecmp
+import tempfile
+import subprocess
+from config.settings import DATA_DIR, PROJECT_ROOT
+
+PIPELINES = ('in-memory', 'stream')
+OUTPUT_FILES = ['admission_articles.csv', 'admission_universities.csv', 'admission_uni_and_programs.csv',
+                'cs_articles.json', 'admission_articles.json', 'ask_articles.json', 'all_articles.json']
+
+
+def write_corpus(path, scale):
+    with open(os.path.join(DATA_DIR, 'studyabroad.json'), 'r', encoding='utf-8') as f:
+        articles = json.load(f)['articles']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'articles': [dict(article, article_id=f"{article['article_id']}.{copy}", url=f"{article['url']}?{copy}")
+                                for copy in range(scale) for article in articles]}, f, ensure_ascii=False)
+    return len(articles) * scale
+
+
+def run_pipeline(pipeline, stage, corpus_path):
+    """Run in the child process, the settings are read from the environment set by `measure`"""
+    from utils.data import DataModel
+    dm = DataModel()
+    parse = stage == 'parse'
+    if pipeline == 'stream':
+        dm.stream_data_pipeline(corpus_path, clean=parse, parse_admissions=parse, force_reload=True)
+    else:
+        if parse:
+            dm.load_and_clean_ptt_data(corpus_path, save_path=corpus_path)
+        else:
+            dm = DataModel.from_processed_data(corpus_path)
+        dm.run_data_pipeline(parse_admissions=parse, force_reload=True)
+
+
+def measure(pipeline, stage, corpus_path, output_dir):
+    env = dict(os.environ, OUTPUT_DIR=output_dir, STORAGE_BACKEND='memory', PYTHONHASHSEED='0', PYTHONPATH=PROJECT_ROOT)
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_streaming_ingest', '--child', pipeline, stage, corpus_path],
+                             cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this child only
+    _, status, rusage = os.wait4(child.pid, 0)
+    child.returncode = status
+    if status:
+        raise RuntimeError(f'{pipeline} {stage} failed')
+    peak_mb = rusage.ru_maxrss / (1 << 20) if sys.platform == 'darwin' else rusage.ru_maxrss / (1 << 10)
+    return time.perf_counter() - start, peak_mb
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--child']:
+        run_pipeline(*sys.argv[2:5])
+        sys.exit()
+
+    scales = [int(n) for n in sys.argv[1:]] or [1, 4, 16]
+    print(f'{"scale":>5} {"articles":>9} {"stage":>6} {"pipeline":>10} {"seconds":>8} {"peak MB":>8}')
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            count = write_corpus(os.path.join(tmp, 'raw.json'), scale)
+            for stage in ('parse', 'dump'):
+                for pipeline in PIPELINES:
+                    output_dir = os.path.join(tmp, pipeline, stage)
+                    os.makedirs(output_dir)
+                    corpus_path = os.path.join(output_dir, 'studyabroad.json')
+                    if stage == 'parse':
+                        shutil.copy(os.path.join(tmp, 'raw.json'), corpus_path)
+                    else:
+                        # Dump the articles parsed by the same pipeline
+                        corpus_path = os.path.join(tmp, pipeline, 'parse', 'studyabroad.json')
+                        shutil.copy(os.path.join(tmp, pipeline, 'parse', 'all_articles.json'), output_dir)
+                    seconds, peak_mb = measure(pipeline, stage, corpus_path, output_dir)
+                    print(f'{scale:5d} {count:9d} {stage:>6} {pipeline:>10} {seconds:8.2f} {peak_mb:8.1f}')
+                names = OUTPUT_FILES[:3] if stage == 'dump' else OUTPUT_FILES + ['studyabroad.json']
+                _, mismatch, errors = filecmp.cmpfiles(*[os.path.join(tmp, pipeline, stage) for pipeline in PIPELINES], names, shallow=False)
+                assert not mismatch and not errors, f'{stage} output differs: {mismatch + errors}'
+    print('Both pipelines wrote identical files')
@@ -0,0 +1,195 @@
+"""Time every stage of the parsers and the API on a synthetic corpus, without the real board or a DB
+
+A corpus of `--articles` synthetic articles (see `benchmarks/synthetic_corpus.py`) goes through
+the ingest stages, then `--requests` requests drawn like `bench_parse_request` go through the
+API stages, ranked by the in-process scoring engine on the dumped CSV files:
+
+    clean                 DataModel.load_and_clean_ptt_data, per article
+    classify_articles     DataModel.classify_articles, per article
+    tw_document           TWBackground.document, per admission article
+    tw_find_university    TWBackground.find_university, per admission article
+    tw_find_major         TWBackground.find_major, per admission article
+    tw_find_gpa           TWBackground.find_gpa, per admission article
+    us_parse_admission    USBackground.parse_admission_section, per admission article
+    us_find_university    USBackground.find_university, per admission article
+    dump_articles_to_csv  DataModel.dump_articles_to_csv, per admission article
+    parse_request         api.parser.parse_request, per request
+    query                 ScoringEngine.query_similar_background and query_target_school, per query
+    render_response       api.response_cache.render_articles, per response
+
+The results are saved as JSON. Pass an earlier result with `--compare` to print the change of
+each stage and exit with status 1 when a stage is slower than `--threshold`.
+
+Usage: python -m benchmarks.bench_suite [--articles N] [--messiness M] [--requests N] [--seed N]
+                                        [--output PATH] [--compare PATH] [--threshold RATIO]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+import contextlib
+from config.settings import OUTPUT_DIR, PROJECT_ROOT
+from utils import data
+from utils.data import DataModel
+from api import parser
+from api.scoring import ScoringEngine
+from api.response_cache import render_articles
+from benchmarks.synthetic_corpus import write_corpus
+from benchmarks.bench_parse_request import generate_requests
+
+RESULTS_DIR = os.path.join(OUTPUT_DIR, 'benchmarks')
+
+
+class StageTimer:
+    """Total time and number of items of each stage, in the order the stages first ran"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def time(self, stage, items=1):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        total = self.stages.setdefault(stage, {'seconds': 0.0, 'items': 0})
+        total['seconds'] += seconds
+        total['items'] += items
+
+    def results(self):
+        return {stage: dict(total, us_per_item=total['seconds'] / total['items'] * 1e6 if total['items'] else 0.0)
+                for stage, total in self.stages.items()}
+
+
+def run_ingest_stages(timer, corpus_path, output_dir):
+    dm = DataModel(workers=1)
+    with timer.time('clean'):
+        dm.load_and_clean_ptt_data(corpus_path)
+    timer.stages['clean']['items'] = len(dm.all_articles)
+    with timer.time('classify_articles', len(dm.all_articles)):
+        dm.classify_articles()
+
+    indices = dm.admission_article_indices
+    articles = dm.all_articles[indices]
+    tw = dm.tw_background
+    dm.universities, dm.majors, dm.gpas = [], [], []
+    for article in articles:
+        content, aid = article['content'], article['article_id']
+        with timer.time('tw_document'):
+            document = tw.document(content)
+        with timer.time('tw_find_university'):
+            university = tw.find_university(document, aid=aid)
+        with timer.time('tw_find_major'):
+            major = tw.find_major(document, university, aid=aid)
+        with timer.time('tw_find_gpa'):
+            gpa = tw.find_gpa(document, university, aid=aid)
+        dm.universities.append(university)
+        dm.majors.append(major)
+        dm.gpas.append(gpa)
+    dm.save_university_major_gpa(indices)
+
+    us = dm.us_background
+    with timer.time('us_parse_admission', len(articles)):
+        raw_ad_results = us.parse_admission_section(articles)
+    with timer.time('us_find_university', len(articles)):
+        result = us.find_university(raw_ad_results, articles=articles)
+    for article, admission_info in zip(articles, result):
+        article['admission_info'] = admission_info
+    dm.clean_up_articles()
+
+    data.OUTPUT_DIR = output_dir
+    try:
+        with timer.time('dump_articles_to_csv', len(articles)):
+            dm.dump_articles_to_csv()
+    finally:
+        data.OUTPUT_DIR = OUTPUT_DIR
+    return len(dm.all_articles), len(articles)
+
+
+def run_api_stages(timer, output_dir, n_requests, seed):
+    engine = ScoringEngine.from_csv(output_dir)
+    for request in generate_requests(parser.normalizer, n_requests, seed=seed):
+        with timer.time('parse_request'):
+            query_dict = parser.parse_request(request)
+        for query in (engine.query_similar_background, engine.query_target_school):
+            with timer.time('query'):
+                articles = query(query_dict)
+            with timer.time('render_response'):
+                render_articles(articles)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each stage against `baseline`, return the stages slower than `threshold`"""
+    if results['config'] != baseline['config']:
+        print(f'The baseline ran with {baseline["config"]}, not {results["config"]}')
+    regressions = []
+    print(f'{"stage":>22} {"baseline us":>12} {"us":>10} {"change":>8}')
+    for stage, result in results['stages'].items():
+        before = baseline['stages'].get(stage)
+        if before is None or not before['us_per_item']:
+            print(f'{stage:>22} {"-":>12} {result["us_per_item"]:10.1f}')
+            continue
+        ratio = result['us_per_item'] / before['us_per_item']
+        slower = ratio > 1 + threshold
+        if slower:
+            regressions.append(stage)
+        print(f'{stage:>22} {before["us_per_item"]:12.1f} {result["us_per_item"]:10.1f} {ratio - 1:+8.1%}{"  REGRESSION" if slower else ""}')
+    return regressions
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--articles', type=int, default=2000, help='Number of synthetic articles')
+    arg_parser.add_argument('--messiness', type=float, default=0.2, help='Share of sloppily typed rows, 0 to 1')
+    arg_parser.add_argument('--requests', type=int, default=500, help='Number of API requests')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--output', help='Path of the JSON results, by default under output/benchmarks')
+    arg_parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown that counts as a regression')
+    args = arg_parser.parse_args()
+
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = os.path.join(tmp, 'studyabroad.json')
+        write_corpus(corpus_path, args.articles, seed=args.seed, messiness=args.messiness)
+        with contextlib.redirect_stdout(io.StringIO()):
+            n_articles, n_admissions = run_ingest_stages(timer, corpus_path, tmp)
+            run_api_stages(timer, tmp, args.requests, args.seed)
+
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'articles': args.articles, 'messiness': args.messiness, 'requests': args.requests, 'seed': args.seed},
+        'counts': {'articles': n_articles, 'admission_articles': n_admissions},
+        'stages': timer.results(),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'bench_suite_{results["created"].replace(":", "")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(f'{n_articles} articles, {n_admissions} admission articles, {args.requests} requests')
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    else:
+        print(f'{"stage":>22} {"items":>7} {"total s":>8} {"us/item":>9}')
+        for stage, result in results['stages'].items():
+            print(f'{stage:>22} {result["items"]:7d} {result["seconds"]:8.3f} {result["us_per_item"]:9.1f}')
+        regressions = []
+    print(f'Saved the results to {output}')
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,115 @@
+"""Load test the storage backends: Postgres through the SQLAlchemy threadpool (sync) or
+asyncpg (async), and the in-process backend (memory)
+
+Each mode starts its own uvicorn server with the response cache disabled, then a fixed
+number of client threads post a mix of /admission and /school requests for a while.
+Reports throughput and latency percentiles per mode.
+
+Usage: python -m benchmarks.load_test_api [concurrency] [seconds] [modes...]
+"""
+import os
+import sys
+import json
+import time
+import random
+import threading
+import subprocess
+import http.client
+import numpy as np
+from config.settings import PROJECT_ROOT
+
+PORT = 5099
+UNIVERSITIES = ['NTU', 'NCTU', 'NTHU', 'NCKU', '台大', '交大', '清大', '成大', '政大', '']
+MAJORS = ['CS', 'EE', 'IM', 'ME', '資工', '電機', '資管', '數學', '']
+SCHOOLS = ['Stanford', 'CMU', 'UIUC', 'MIT', 'University of California, Berkeley', 'Georgia Tech', 'UCLA', 'Columbia']
+PROGRAMS = ['MHCI', 'CS', 'MSCS', 'LTI', 'MCDS', 'MSEE', 'Robotics', 'MSIN']
+
+
+def random_request(rng):
+    return {
+        'university': rng.choice(UNIVERSITIES),
+        'major': rng.choice(MAJORS),
+        'gpa': round(rng.uniform(2.8, 4.2), 2),
+        'target_schools': rng.sample(SCHOOLS, rng.randint(0, 3)),
+        'target_programs': rng.sample(PROGRAMS, rng.randint(0, 2)),
+        'program_level': rng.choice(['MS', 'MS', 'PhD']),
+    }
+
+
+MODES = {
+    'sync': {'STORAGE_BACKEND': 'postgres', 'DB_ASYNC': '0'},
+    'async': {'STORAGE_BACKEND': 'postgres', 'DB_ASYNC': '1'},
+    'memory': {'STORAGE_BACKEND': 'memory'},
+}
+
+
+def start_server(mode, concurrency):
+    env = dict(os.environ, **MODES[mode], RESPONSE_CACHE_SIZE='0',
+               DB_POOL_SIZE=str(concurrency), DB_MAX_OVERFLOW='0', PYTHONPATH=PROJECT_ROOT)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(PORT), '--log-level', 'warning'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(600):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            connection.request('GET', '/')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('uvicorn did not start')
+
+
+def client(seed, deadline, latencies, errors):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+    while time.monotonic() < deadline:
+        body = json.dumps(random_request(rng))
+        path = rng.choice(['/admission', '/school'])
+        start = time.perf_counter()
+        try:
+            connection.request('POST', path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(error)
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def run(mode, concurrency, seconds):
+    server = start_server(mode, concurrency)
+    try:
+        # Warm up the normalization caches and the pool
+        client(0, time.monotonic() + 2, [], [])
+        latencies, errors = [], []
+        deadline = time.monotonic() + seconds
+        threads = [threading.Thread(target=client, args=(seed + 1, deadline, latencies, errors))
+                   for seed in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    ms = np.array(latencies) * 1000
+    return {'requests': len(latencies), 'errors': len(errors), 'rps': len(latencies) / elapsed,
+            'p50': np.percentile(ms, 50), 'p90': np.percentile(ms, 90), 'p99': np.percentile(ms, 99)}
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    modes = sys.argv[3:] or list(MODES)
+    print(f'{concurrency} clients, {seconds:.0f}s per mode')
+    print(f'{"mode":6} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8}')
+    for name in modes:
+        r = run(name, concurrency, seconds)
+        print(f'{name:6} {r["requests"]:9d} {r["errors"]:7d} {r["rps"]:8.1f} {r["p50"]:8.1f} {r["p90"]:8.1f} {r["p99"]:8.1f}')
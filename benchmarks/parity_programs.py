@@ -0,0 +1,107 @@
+"""Check the indexed program lookups of `Programs` against the former linear scans
+
+`search_program` is run on every known level, program, major name, abbreviation and id, alone,
+with each level and in the Texas A&M corner case, then on every admission row and title
+fragment of the corpus and of a synthetic corpus. `normalize_program_name` is checked on every
+known program at each level and on unknown names.
+
+Usage: python -m benchmarks.parity_programs [path/to/studyabroad.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+from config.settings import DATA_DIR
+from utils.programs import PROGRAM_LEVELS
+from utils.background import USBackground
+from benchmarks.synthetic_corpus import generate_articles
+
+
+def search_program_scan(programs, row):
+    row = ' ' + row + ' '
+    program_level = None
+    program_name = None
+    if ' MS ' in row and ' PhD ' in row:
+        program_level = 'MS'
+    else:
+        for level in programs.levels:
+            if ' ' + level + ' ' in row:
+                program_level = level
+                break
+    for program in programs.programs:
+        if ' ' + program + ' ' in row:
+            program_name = program
+            break
+    row_upper = row.upper()
+    if not program_name:
+        for _, mrow in programs.majors.iterrows():
+            if ' ' + mrow['major_name_upper'] + ' ' in row_upper or ' ' + mrow['major_cabbr'] + ' ' in row_upper:
+                program_name = mrow['major_name']
+                break
+    if not program_name:
+        for _, mrow in programs.majors.iterrows():
+            if ' ' + mrow.name + ' ' in row_upper:
+                if mrow.name == 'AM' and 'TEXAS AM' in row_upper:
+                    continue
+                program_name = mrow['major_name']
+                break
+    if program_level is not None:
+        row = row.replace(' ' + program_level + ' ', ' ')
+    if program_name is not None:
+        row = row.replace(' ' + program_name + ' ', ' ')
+    if program_level is not None:
+        program_level = 'PhD' if program_level.startswith('P') else 'MS'
+    if program_name is not None and program_level is None and program_name in programs.masters:
+        program_level = 'MS'
+    return (program_level, program_name), row.strip()
+
+
+def known_rows(programs):
+    names = programs.levels + programs.programs + programs.majors['major_name'].tolist() + \
+        programs.majors['major_name_upper'].tolist() + programs.majors['major_cabbr'].tolist() + programs.majors.index.tolist()
+    rows = list(names)
+    rows.extend(f'{level} {name}' for level in programs.levels for name in names)
+    rows.extend(f'Texas {name} in {level}' for level in ('MS', 'PhD') for name in ('AM', 'A&M', 'AM CS', 'AM EE'))
+    rows.extend(['MS PhD CS', 'PhD MS', 'ms cs', '  MS  CS  ', '', ' ', 'Texas AM AM', 'TEXAS AM ECE'])
+    return rows
+
+
+def corpus_rows(us_background, articles):
+    """Admission rows and title fragments in the form `find_university` searches them"""
+    rows = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ad in us_background.parse_admission_section(articles):
+            rows.extend(us_background.normalize_university_name(row) for row in ad['admission'])
+            rows.extend(ad['admission_title'])
+    return [row for row in rows if row]
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, 'studyabroad.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        articles = json.load(f)['articles']
+    us_background = USBackground()
+    programs = us_background.programs
+    rows = known_rows(programs) + corpus_rows(us_background, articles + generate_articles(2000))
+
+    start = time.perf_counter()
+    expected = [search_program_scan(programs, row) for row in rows]
+    scan_time = time.perf_counter() - start
+    start = time.perf_counter()
+    got = [programs.search_program(row) for row in rows]
+    index_time = time.perf_counter() - start
+    mismatches = [(row, e, g) for row, e, g in zip(rows, expected, got) if e != g]
+    for mismatch in mismatches[:10]:
+        print('MISMATCH', mismatch)
+    print(f'search_program: {len(rows) - len(mismatches)}/{len(rows)} identical, '
+          f'scan {scan_time:.2f}s, indexed {index_time:.3f}s')
+    assert not mismatches
+
+    pairs = [(level, name) for name in list(programs.program2type) + ['Unknown Program', 'MS CS ', ''] for level in PROGRAM_LEVELS]
+    pairs += [(level, name) for (level, name), _ in got]
+    mismatches = [(level, name) for level, name in pairs
+                  if programs.normalize_program_name(level, name) != programs.build_program_name(level, name)]
+    print(f'normalize_program_name: {len(pairs) - len(mismatches)}/{len(pairs)} identical')
+    assert not mismatches, mismatches[:10]
@@ -0,0 +1,106 @@
+"""Check the indexed US university matchers against the former linear scans on the corpus
+
+Every admission row and title fragment that `USBackground.find_university` searches is run through
+`search_single_university_name` / `search_all_university_names` and through the reference scans below.
+
+Usage: python -m benchmarks.parity_us_universities [path/to/studyabroad.json]
+"""
+import os
+import re
+import sys
+import json
+import time
+import textdistance
+from config.settings import DATA_DIR
+from utils.background import USBackground
+
+
+def search_single_university_name_scan(us_background, ad_row):
+    us_universities = us_background.us_universities
+    for uname in us_universities['top_100_names']:
+        if re.search(uname, ad_row, flags=re.IGNORECASE):
+            return uname
+    ad_row = ' ' + ad_row + ' '
+    ad_row_upper = ad_row.upper()
+    for uid in us_universities['top_100_uid']:
+        uid_token = ' ' + uid + ' '
+        if uid_token in (ad_row_upper, ad_row):
+            return us_universities['top_100_uid'][uid]
+    ad_row = ad_row.strip()
+    for uname in us_universities['other_uni_names']:
+        if re.search(uname, ad_row, flags=re.IGNORECASE):
+            return uname
+    if len(ad_row) >= 10:
+        td_names = []
+        for uname in us_universities['top_100_names']:
+            td = textdistance.lcsseq.similarity(uname, ad_row) / min(len(ad_row), len(uname))
+            if td > 0.75:
+                td_names.append((td, uname))
+        if td_names:
+            return max(td_names)[1]
+    for uid in us_universities['other_uni_uid']:
+        if re.search(r'(?:^|(?<= ))(' + uid + ')(?:(?= )|$)', ad_row):
+            return us_universities['other_uni_uid'][uid]
+    return None
+
+
+def search_all_university_names_scan(us_background, article_title):
+    us_universities = us_background.us_universities
+    result = []
+    for uname in us_universities['top_100_names']:
+        if re.search(uname, article_title, flags=re.IGNORECASE):
+            result.append(uname)
+    article_title = ' ' + article_title + ' '
+    for uid in us_universities['top_100_uid']:
+        if ' ' + uid + ' ' in article_title:
+            result.append(us_universities['top_100_uid'][uid])
+    for uname in us_universities['other_uni_names']:
+        if re.search(uname, article_title, flags=re.IGNORECASE):
+            result.append(uname)
+    for uid in us_universities['other_uni_uid']:
+        if ' ' + uid + ' ' in article_title:
+            result.append(us_universities['other_uni_uid'][uid])
+    if 'Cornell Tech' in result and 'Cornell University' in result:
+        result.remove('Cornell University')
+    return result
+
+
+def collect_queries(us_background, articles):
+    """Rows and titles in the form `find_university` searches them"""
+    articles = [a for a in articles if '[錄取]' in a.get('article_title', '') and 'Re: ' not in a['article_title']]
+    rows, titles = [], []
+    for ad in us_background.parse_admission_section(articles):
+        for row in ad['admission']:
+            row = us_background.normalize_university_name(row)
+            if row:
+                row_new = us_background.programs.search_program(row)[1]
+                rows.extend([row, row_new] if row_new else [row])
+        for title in ad['admission_title']:
+            title = us_background.normalize_university_name(us_background.programs.search_program(title)[1])
+            if title:
+                titles.append(title)
+    return rows, titles
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(DATA_DIR, 'studyabroad.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        articles = json.load(f)['articles']
+    us_background = USBackground()
+    rows, titles = collect_queries(us_background, articles)
+
+    for name, queries, indexed, scan in (
+            ('search_single_university_name', rows, us_background.search_single_university_name, search_single_university_name_scan),
+            ('search_all_university_names', titles, us_background.search_all_university_names, search_all_university_names_scan)):
+        start = time.perf_counter()
+        expected = [scan(us_background, q) for q in queries]
+        scan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        got = [indexed(q) for q in queries]
+        index_time = time.perf_counter() - start
+        mismatches = [(q, e, g) for q, e, g in zip(queries, expected, got) if e != g]
+        for mismatch in mismatches[:10]:
+            print('MISMATCH', mismatch)
+        print(f'{name}: {len(queries) - len(mismatches)}/{len(queries)} identical, '
+              f'scan {scan_time:.2f}s, indexed {index_time:.2f}s')
+        assert not mismatches
@@ -0,0 +1,147 @@
+"""Synthetic PTT studyabroad articles built from the reference data
+
+The articles follow the layout of the admission articles of the board: a background section
+with the Taiwanese university, major, GPA and test scores, the admission, reject and pending
+sections naming US universities and programs, and a signature. The names are drawn from
+`data/tw` and `data/us` with their different spellings (ids, abbreviations, full names), so
+every branch of the parsers gets exercised. A share of the articles are school selection
+questions and experience posts without an admission section. The same seed gives the same corpus.
+
+`messiness` (0 to 1) is the share of rows typed sloppily: case changes, full-width colons,
+extra spaces, bullets, typos and comments, with the schools of a section sometimes on one line
+and the background header sometimes missing. At 0 the rows keep the layout above.
+
+Usage: python -m benchmarks.synthetic_corpus number_of_articles output_path [seed] [messiness]
+"""
+import os
+import sys
+import json
+import random
+import pandas as pd
+from config.settings import DATA_DIR
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+FILLER_ROWS = ['謝謝版上大家的分享，回饋一下這個版', '有任何問題歡迎站內信', '推薦信: 2 教授 1 主管',
+               'Work Experience: 2 years software engineer', 'Research: 1 paper in workshop', '',
+               'SOP 請學長姐幫忙看過', 'https://www.ptt.cc/bbs/studyabroad/index.html']
+FUNDING = ['', ' w/ funding', ' w/o funding', ' (TA)', ' with fellowship', ' 3/15', ' email 2/28']
+BULLETS = ['- ', '* ', '• ', '1. ', '→ ']
+COMMENTS = [' (超開心)', ' ^^', ' QQ', ' (還沒回)', ' orz', ' (waitlist 轉正)']
+
+
+class ReferenceNames:
+    """Spellings of the universities, majors and programs the parsers know"""
+
+    def __init__(self):
+        universities = pd.read_csv(os.path.join(DATA_DIR, 'tw/tw_universities.csv'), sep='|', index_col='uni_id')
+        majors = pd.read_csv(os.path.join(DATA_DIR, 'tw/majors.csv'), sep=',', index_col='major_id')
+        self.tw_universities = [[uid, row['uni_cname'], row['uni_name']] + ([row['uni_cabbr']] if isinstance(row['uni_cabbr'], str) else [])
+                                for uid, row in universities.iterrows()]
+        self.majors = [[mid, row['major_cname'], row['major_name'], row['major_cabbr']] for mid, row in majors.iterrows()]
+        with open(os.path.join(DATA_DIR, 'us/us_universities_top.json'), 'r') as f:
+            us_universities = json.load(f)
+        self.top_schools = us_universities['top_100_names'] + list(us_universities['top_100_uid'])
+        self.other_schools = us_universities['other_uni_names'] + list(us_universities['other_uni_uid'])
+        with open(os.path.join(DATA_DIR, 'us/programs.json'), 'r') as f:
+            programs = json.load(f)
+        self.programs = programs['programs']
+        self.levels = programs['levels']
+
+
+def school_row(rng, names):
+    school = rng.choice(names.top_schools if rng.random() < 0.85 else names.other_schools)
+    parts = [school, rng.choice(names.levels) if rng.random() < 0.6 else '', rng.choice(names.programs)]
+    if rng.random() < 0.2:
+        rng.shuffle(parts)
+    return ' '.join(p for p in parts if p) + rng.choice(FUNDING)
+
+
+def background_rows(rng, names):
+    university = rng.choice(names.tw_universities[:40] if rng.random() < 0.8 else names.tw_universities)
+    major = rng.choice(names.majors)
+    gpa, scale = round(rng.uniform(2.8, 4.3), 2), rng.choice(['4.3', '4.0'])
+    rows = [rng.choice(['Background:', 'Education:', '學歷:', '[Background]']),
+            f'{rng.choice(university)} {rng.choice(major[:3])}',
+            rng.choice([f'GPA: {gpa}/{scale}', f'GPA {gpa} / {scale}, Rank: {rng.randint(1, 60)}/120', f'Overall GPA: {gpa}']),
+            f'GRE: V{rng.randint(145, 170)} Q{rng.randint(155, 170)} AW {rng.choice(["3.0", "3.5", "4.0", "4.5"])}',
+            f'TOEFL: {rng.randint(90, 118)} (R{rng.randint(22, 30)} L{rng.randint(22, 30)})']
+    if rng.random() < 0.3:
+        rows.insert(2, f'{rng.randint(2010, 2020)} 畢業')
+    return rows
+
+
+def messy_row(rng, row):
+    """`row` typed sloppily in one of a few ways"""
+    kind = rng.randrange(7)
+    if kind == 0:
+        return row.upper()
+    if kind == 1:
+        return row.lower()
+    if kind == 2:
+        return row.replace(':', '：')
+    if kind == 3:
+        return '  ' + row.replace(' ', '  ') + ' \t'
+    if kind == 4:
+        return rng.choice(BULLETS) + row
+    if kind == 5:
+        return row + rng.choice(COMMENTS)
+    # Swap two letters
+    if len(row) < 4:
+        return row
+    idx = rng.randrange(len(row) - 1)
+    return row[:idx] + row[idx + 1] + row[idx] + row[idx + 2:]
+
+
+def messy_section(rng, rows, messiness):
+    if rows and rng.random() < messiness / 2:
+        rows = [rng.choice([' / ', ', ', '; ']).join(rows)]
+    return [messy_row(rng, row) if rng.random() < messiness else row for row in rows]
+
+
+def generate_article(rng, names, idx, messiness=0.0, mess_rng=None):
+    def messy(rows):
+        return messy_section(mess_rng, rows, messiness) if messiness else rows
+
+    kind = rng.random()
+    admits = [school_row(rng, names) for _ in range(rng.randint(1, 6))]
+    rejects = [school_row(rng, names) for _ in range(rng.randint(0, 5))]
+    if kind < 0.7:
+        title = '[錄取] ' + ' / '.join(admit.split(' ')[0] for admit in admits[:2]) + ' ' + rng.choice(names.programs)
+        background = background_rows(rng, names)
+        if messiness and mess_rng.random() < messiness / 2:
+            background = background[1:]
+        rows = messy(background) + rng.sample(FILLER_ROWS, 2) + \
+            ['', rng.choice(['Admission:', 'Admit:', 'AD:', 'Offer:', '[錄取]'])] + messy(admits) + \
+            ['', rng.choice(['Reject:', 'Rej:', 'Rejection:', '拒絕:'])] + messy(rejects) + \
+            ['', rng.choice(['Pending:', 'Waitlist:', 'Pending: 無聲卡'])] + rng.sample(FILLER_ROWS, 3)
+    elif kind < 0.85:
+        title = '[選校] ' + rng.choice(names.top_schools) + ' vs ' + rng.choice(names.top_schools)
+        rows = messy(background_rows(rng, names)) + ['', '想請問大家這兩間學校怎麼選'] + messy(admits) + rng.sample(FILLER_ROWS, 3)
+    else:
+        title = rng.choice(['[心得] ', '[請益] ', '[資訊] ']) + rng.choice(names.programs) + ' 申請'
+        rows = rng.sample(FILLER_ROWS, 5)
+    article_id = f'M.{1400000000 + idx}.A.{idx % 4096:03X}'
+    date = f'{rng.choice(WEEKDAYS)} {rng.choice(MONTHS)} {rng.randint(1, 28)} {idx % 24:02d}:{idx % 60:02d}:00 {rng.randint(2012, 2020)}'
+    return {'article_id': article_id, 'article_title': title, 'author': f'user{idx % 997} (nick)', 'board': 'studyabroad',
+            'content': '\n'.join(['作者 user', ''] + rows + ['', '--']), 'date': date, 'ip': '140.112.0.1',
+            'message_count': {'all': 0, 'boo': 0, 'count': 0, 'neutral': 0, 'push': 0}, 'messages': [],
+            'url': f'https://www.ptt.cc/bbs/studyabroad/{article_id}.html'}
+
+
+def generate_articles(n, seed=0, messiness=0.0):
+    rng = random.Random(seed)
+    # The sloppy typing draws from its own generator, so the articles are the same at every messiness
+    mess_rng = random.Random(f'{seed}-messiness')
+    names = ReferenceNames()
+    return [generate_article(rng, names, idx, messiness, mess_rng) for idx in range(n)]
+
+
+def write_corpus(path, n, seed=0, messiness=0.0):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'articles': generate_articles(n, seed, messiness)}, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    write_corpus(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else 0,
+                 float(sys.argv[4]) if len(sys.argv) > 4 else 0.0)
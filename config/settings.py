@@ -5,7 +5,10 @@ PROJECT_ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), '..'))
 
 # Path settings
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
-OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'output')
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', os.path.join(PROJECT_ROOT, 'output'))
+REFERENCE_SNAPSHOT_PATH = os.path.join(OUTPUT_DIR, 'reference.pkl')  # parsers built on data/, see utils/reference.py
+PARSE_CACHE_PATH = os.path.join(OUTPUT_DIR, 'parse_cache.pkl')  # parsed admission articles, see utils/parse_cache.py
+INGEST_METRICS_PATH = os.path.join(OUTPUT_DIR, 'ingest_metrics.prom')  # stage timings of the last ingest, served by /metrics
 
 DB_CONFIG = {
     'USERNAME': os.environ.get('POSTGRES_USER', 'test_user'),
@@ -17,6 +20,20 @@ DB_CONFIG = {
 
 DATABASE_URL = os.environ.get('DATABASE_URL', None)
 
+# Connection pool of the API queries, per worker process
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # connections kept open
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))  # extra connections opened under load
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced (SQLAlchemy only)
+DB_POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', 300))  # seconds before an idle connection is closed (asyncpg only)
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 10000))  # milliseconds, 0 for no limit
+# Run the SQL ranking queries on asyncpg from async endpoints instead of the SQLAlchemy threadpool path
+DB_ASYNC = os.environ.get('DB_ASYNC', '').lower() in ('1', 'true', 'yes')
+
+# Storage backend that loads the dumped CSV files and ranks the articles for /admission and /school (see api/backends.py)
+# 'postgres': run the scoring queries in Postgres, 'memory': score the admission rows in-process without a DB
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'postgres')
+
 
 # TYPES
 class ARTICLE_TYPE(Enum):
@@ -27,6 +44,24 @@ class ARTICLE_TYPE(Enum):
 
 
 BUILD_FROM_SCRATCH = False
+# Processes that parse the articles when building from scratch, 1 parses them serially in the main process
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 1))
+PARSE_CHUNK_SIZE = 32  # articles per task sent to a worker
+# Stream the articles through the ingest pipeline instead of loading the whole board in memory
+STREAM_ARTICLES = True
+STREAM_BATCH_SIZE = 256  # admission articles parsed at a time when streaming
 BACKEND_CORS_ORIGINS = ["*"]
 
 MAX_NUMBER_OF_ARTICLES = 500
+MAX_BATCH_SIZE = 100  # candidates per /admission/batch or /school/batch request
+# Key that signs the pagination cursors, set it so every API worker accepts the cursors of the others
+CURSOR_SECRET = os.environ.get('CURSOR_SECRET', None)
+
+# Memoization of the request normalization steps in `parse_request`
+NORMALIZATION_CACHE_SIZE = 2048  # entries per step
+NORMALIZATION_CACHE_TTL = None  # seconds, None to keep entries until they are evicted
+
+# Serialized /admission and /school responses, keyed on the normalized query
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))  # responses, 0 to disable the cache
+RESPONSE_CACHE_TTL = None  # seconds, None to keep responses until they are evicted or the data changes
+RESPONSE_CACHE_CHECK_INTERVAL = 10  # seconds between two checks for a new data load
@@ -0,0 +1,55 @@
+"""Build the database and the reference data snapshot used by the API
+
+Run this once before starting the API workers, which only load the snapshot:
+
+    python ingest.py [--from-scratch] [--workers N] [--force] [--in-memory]
+"""
+import os
+import argparse
+from config.settings import DATA_DIR, BUILD_FROM_SCRATCH, REFERENCE_SNAPSHOT_PATH, PARSE_WORKERS, STREAM_ARTICLES, INGEST_METRICS_PATH
+from utils.data import DataModel, INGEST_METRICS, INGEST_STAGE_SECONDS
+from utils.article_stream import peak_rss_mb
+from utils.reference import get_reference_data
+
+
+def ingest(build_from_scratch=BUILD_FROM_SCRATCH, force=False, workers=PARSE_WORKERS, stream=STREAM_ARTICLES):
+    ptt_data_path = os.path.join(DATA_DIR, 'studyabroad.json')
+    if stream:
+        # The articles are read by the pipeline itself
+        dm = DataModel(workers=workers)
+    elif build_from_scratch:
+        dm = DataModel(workers=workers)
+        with INGEST_STAGE_SECONDS.time('clean'):
+            dm.load_and_clean_ptt_data(ptt_data_path, save_path=ptt_data_path)
+    else:
+        with INGEST_STAGE_SECONDS.time('load_raw_articles'):
+            dm = DataModel.from_processed_data(ptt_data_path, workers=workers)
+
+    # The API workers build their normalizer on this snapshot
+    with INGEST_STAGE_SECONDS.time('save_snapshot'):
+        get_reference_data().save(REFERENCE_SNAPSHOT_PATH)
+        print(f'Saved reference data snapshot to {REFERENCE_SNAPSHOT_PATH}')
+
+    if stream:
+        dm.stream_data_pipeline(ptt_data_path, clean=build_from_scratch, parse_admissions=build_from_scratch, force_reload=force)
+    else:
+        dm.run_data_pipeline(parse_admissions=build_from_scratch, force_reload=force)
+        print(f'Peak RSS: {peak_rss_mb():.1f} MB')
+
+    for (stage,) in INGEST_STAGE_SECONDS.label_values():
+        print(f'{stage:>18}: {INGEST_STAGE_SECONDS.total(stage):.2f}s')
+    INGEST_METRICS.write(INGEST_METRICS_PATH)
+    print(f'Saved the stage timings to {INGEST_METRICS_PATH}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from-scratch', action='store_true', default=BUILD_FROM_SCRATCH,
+                        help='Clean and parse all the articles again instead of loading output/all_articles.json')
+    parser.add_argument('--workers', type=int, default=PARSE_WORKERS,
+                        help='Processes that parse the articles with --from-scratch, by default PARSE_WORKERS')
+    parser.add_argument('--force', action='store_true', help='Rebuild the DB (and re-parse every article with --from-scratch) instead of only the changed articles')
+    parser.add_argument('--in-memory', dest='stream', action='store_false', default=STREAM_ARTICLES,
+                        help='Load all the articles in memory instead of streaming them through the pipeline')
+    args = parser.parse_args()
+    ingest(build_from_scratch=args.from_scratch, force=args.force, workers=args.workers, stream=args.stream)
@@ -1,27 +1,116 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Request, HTTPException, Query
 from starlette.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from typing import List
 import os
+import asyncio
+import functools
 import collections
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
 from api.models import Candidate, Article, Program
-from api.models import init_programs, init_candidate
-from api.database import query_similar_background_api, query_target_school_api
+from api.models import article_dict
+from api import parser
 from api.parser import parse_request
+from api.response_cache import ResponseCache, cache_key, render_articles, render_line, make_etag, make_response
+from api.pagination import encode_cursor, decode_cursor
 from config import settings
+from api.backends import get_backend
+from api.metrics import REGISTRY, ERRORS, BATCH_CANDIDATES, METRICS_MEDIA_TYPE, MetricsMiddleware, cache_collector, render_metrics, stage
 
 app = FastAPI()
+# Paths of the endpoints, filled once they are all declared
+ROUTES = set()
+app.add_middleware(MetricsMiddleware, routes=ROUTES)
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[str(origin) for origin in settings.BACKEND_CORS_ORIGINS],
     )
 
+backend = get_backend()
+# Responses are keyed on the normalized query, so e.g. NTU/台大/臺灣大學 share one entry
+response_cache = ResponseCache(backend.data_version)
+REGISTRY.add_collector(cache_collector('response', lambda: {'response': response_cache.stats()}))
+REGISTRY.add_collector(cache_collector('normalization', lambda: parser.normalizer.cache_stats()))
+
 
 @app.on_event("startup")
-def start_up_fn():
-    # Run something on startup
-    pass
+async def start_up_fn():
+    await backend.startup()
+
+
+@app.on_event("shutdown")
+async def shut_down_fn():
+    await backend.shutdown()
+
+
+async def run_query(query_fn, query_dict):
+    """Await the async queries, run the blocking ones in the threadpool"""
+    if asyncio.iscoroutinefunction(query_fn):
+        return await query_fn(query_dict)
+    return await run_in_threadpool(query_fn, query_dict)
+
+
+async def cached_response(key):
+    """`response_cache.get` with the data version check in the threadpool when it is due
+
+    The check reads the load checksum from the database, or rebuilds the in-process
+    engine after a new data load, neither of which may block the event loop.
+    """
+    if response_cache.refresh_due():
+        await run_in_threadpool(response_cache.refresh)
+    return response_cache.lookup(key)
+
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(request):
+    return NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def ndjson_lines(articles, key, returned, page_size, limit):
+    """Yield the articles as they come off the cursor, then the next cursor if the page is full"""
+    count = 0
+    last = None
+    for article in articles:
+        yield render_line(article_dict(article))
+        last = article
+        count += 1
+    if count and count == limit and returned + count < settings.MAX_NUMBER_OF_ARTICLES:
+        yield render_line({'next_cursor': encode_cursor(last, key, returned + count, page_size)})
+
+
+async def ranked_page(endpoint, query_dict, query_fn, page_size, cursor, stream):
+    """A page of the ranked articles, or all of them without `page_size` and `cursor`
+
+    The next cursor is sent in the `X-Next-Cursor` header, or as the last NDJSON line when streaming.
+    """
+    key = cache_key(endpoint, query_dict)
+    try:
+        after = decode_cursor(cursor, key) if cursor else None
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    returned = after['returned'] if after else 0
+    if page_size is None:
+        page_size = after['page_size'] if after else settings.MAX_NUMBER_OF_ARTICLES
+    limit = max(0, min(page_size, settings.MAX_NUMBER_OF_ARTICLES - returned))
+
+    if stream:
+        # Run the query in the threadpool too, the memory backend ranks the whole board before the first row
+        articles = await run_query(functools.partial(query_fn, limit=limit, after=after, stream=True),
+                                   query_dict) if limit else []
+        return StreamingResponse(ndjson_lines(articles, key, returned, page_size, limit), media_type=NDJSON_MEDIA_TYPE)
+
+    with stage(endpoint, 'query'):
+        articles = await run_query(functools.partial(query_fn, limit=limit, after=after), query_dict) if limit else []
+    headers = {}
+    if articles and len(articles) == limit and returned + limit < settings.MAX_NUMBER_OF_ARTICLES:
+        headers['X-Next-Cursor'] = encode_cursor(articles[-1], key, returned + limit, page_size)
+    with stage(endpoint, 'render'):
+        body = render_articles(articles)
+    return Response(content=body, media_type='application/json', headers=headers)
 
 
 @app.get("/")
@@ -30,40 +119,120 @@ def read_root():
 
 
 @app.post("/admission", response_model=List[Article], tags=['admission'])
-def list_programs(student: Candidate) -> List[Article]:
-    result = []
+async def list_programs(student: Candidate, request: Request,
+                        page_size: int = Query(None, ge=1, le=settings.MAX_NUMBER_OF_ARTICLES),
+                        cursor: str = Query(None)) -> List[Article]:
     try:
-        query_dict = parse_request(student, article_type="ADMISSION")
-        articles = query_similar_background_api(query_dict)
-        print('Query:', query_dict)
-        max_score = articles[0].score if articles and articles[0].score else 0
-        for idx, article in enumerate(articles[:settings.MAX_NUMBER_OF_ARTICLES]):
-            if article.score is None or (len(articles) > 100 and article.score < max_score // 2):
-                break
-            programs = init_programs(article)
-            result.append(init_candidate(article, programs))
-        print('Results:', len(articles), len(result))
+        with stage('admission', 'parse_request'):
+            query_dict = parse_request(student, article_type="ADMISSION")
+        if page_size or cursor or wants_ndjson(request):
+            return await ranked_page('admission', query_dict, backend.query_similar_background_page,
+                                     page_size, cursor, wants_ndjson(request))
+        key = cache_key('admission', query_dict)
+        cached, version = await cached_response(key)
+        if cached is None:
+            # The query already applies the score cut-off and MAX_NUMBER_OF_ARTICLES
+            with stage('admission', 'query'):
+                articles = await run_query(backend.query_similar_background, query_dict)
+            print('Query:', query_dict)
+            print('Results:', articles[0].total_count if articles else 0, len(articles))
+            with stage('admission', 'render'):
+                cached = response_cache.set(key, render_articles(articles), version)
+        return make_response(*cached, request.headers.get('if-none-match'))
+    except HTTPException:
+        raise
     except Exception as error:
+        ERRORS.inc('admission')
         print(error)
-    return result
+    return []
 
 
 @app.post("/school", response_model=List[Article], tags=['school'])
-def list_target_school_info(student: Candidate) -> List[Article]:
-    result = []
+async def list_target_school_info(student: Candidate, request: Request,
+                                  page_size: int = Query(None, ge=1, le=settings.MAX_NUMBER_OF_ARTICLES),
+                                  cursor: str = Query(None)) -> List[Article]:
+    try:
+        with stage('school', 'parse_request'):
+            query_dict = parse_request(student, article_type="ADMISSION")
+        if page_size or cursor or wants_ndjson(request):
+            return await ranked_page('school', query_dict, backend.query_target_school_page,
+                                     page_size, cursor, wants_ndjson(request))
+        key = cache_key('school', query_dict)
+        cached, version = await cached_response(key)
+        if cached is None:
+            with stage('school', 'query'):
+                articles = await run_query(backend.query_target_school, query_dict)
+            print(query_dict, articles[0].total_count if articles else 0, len(articles))
+            with stage('school', 'render'):
+                cached = response_cache.set(key, render_articles(articles), version)
+        return make_response(*cached, request.headers.get('if-none-match'))
+    except HTTPException:
+        raise
+    except Exception as error:
+        ERRORS.inc('school')
+        print(error)
+    return []
+
+
+async def batch_response(endpoint, students, query_fn, if_none_match=None):
+    """Rank a list of candidates with one query execution
+
+    Identical normalized queries are ranked once, and share the response cache with the
+    single candidate endpoints. The body is the list of responses in request order. Like
+    the single candidate endpoints, a failed query answers an empty list for every candidate.
+    """
+    if len(students) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f'At most {settings.MAX_BATCH_SIZE} candidates per request')
+    name = f'{endpoint}_batch'
     try:
-        query_dict = parse_request(student, article_type="ADMISSION")
-        articles = query_target_school_api(query_dict)
-        max_score = articles[0].score if articles and articles[0].score else 0
-        for idx, article in enumerate(articles[:settings.MAX_NUMBER_OF_ARTICLES]):
-            if article.score is None or (len(articles) > 100 and article.score != max_score):
-                break
-            programs = init_programs(article)
-            result.append(init_candidate(article, programs))
-        print(query_dict, len(articles), len(result))
+        keys, queries = [], {}
+        with stage(name, 'parse_request'):
+            for student in students:
+                query_dict = parse_request(student, article_type="ADMISSION")
+                key = cache_key(endpoint, query_dict)
+                keys.append(key)
+                queries.setdefault(key, query_dict)
+
+        bodies, missing, versions = {}, [], {}
+        for key in queries:
+            cached, versions[key] = await cached_response(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                bodies[key] = cached[0]
+        if missing:
+            with stage(name, 'query'):
+                results = await run_query(query_fn, [queries[key] for key in missing])
+            with stage(name, 'render'):
+                for key, articles in zip(missing, results):
+                    bodies[key] = response_cache.set(key, render_articles(articles), versions[key])[0]
+        BATCH_CANDIDATES.inc((name, 'ranked'), len(missing))
+        BATCH_CANDIDATES.inc((name, 'cached'), len(queries) - len(missing))
+        BATCH_CANDIDATES.inc((name, 'duplicate'), len(students) - len(queries))
+        body = b'[' + b','.join(bodies[key] for key in keys) + b']'
+        return make_response(body, make_etag(body), if_none_match)
     except Exception as error:
+        ERRORS.inc(name)
         print(error)
-    return result
+    return [[] for _ in students]
+
+
+@app.post("/admission/batch", response_model=List[List[Article]], tags=['admission'])
+async def list_programs_batch(students: List[Candidate], request: Request) -> List[List[Article]]:
+    return await batch_response('admission', students, backend.query_similar_background_batch,
+                                request.headers.get('if-none-match'))
+
+
+@app.post("/school/batch", response_model=List[List[Article]], tags=['school'])
+async def list_target_school_info_batch(students: List[Candidate], request: Request) -> List[List[Article]]:
+    return await batch_response('school', students, backend.query_target_school_batch,
+                                request.headers.get('if-none-match'))
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request latencies, stage timings and cache statistics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=METRICS_MEDIA_TYPE)
 
 
 def custom_openapi():
@@ -85,3 +254,4 @@ def custom_openapi():
 
 
 app.openapi = custom_openapi
+ROUTES.update(route.path for route in app.routes)
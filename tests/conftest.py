@@ -0,0 +1,47 @@
+import pytest
+from api.scoring import ScoringEngine
+
+
+def article_row(article_id, date='2020-03-01 10:00:00', uni_id='NTU', major_id='CS', major_type='CS',
+                mean_gpa='3.7', min_gpa='3.7', article_type='ADMISSION'):
+    """A row of `admission_articles.csv`, as read by `ScoringEngine.from_csv`"""
+    return {
+        'article_id': article_id, 'article_title': f'[錄取] {article_id}', 'author': 'author (A)', 'date': date,
+        'url': f'https://www.ptt.cc/bbs/studyabroad/{article_id}.html', 'article_type': article_type,
+        'uni_id': uni_id, 'uni_cname': '臺灣大學', 'uni_cabbr': '台大',
+        'major_id': major_id, 'major_cname': '資訊工程學系', 'major_cabbr': '資工', 'major_type': major_type,
+        'mean_gpa': mean_gpa, 'min_gpa': min_gpa, 'gpa_scale': '4.3',
+    }
+
+
+def program_row(article_id, university='Carnegie Mellon University', program='MSCS', program_type='CS',
+                program_level='MS'):
+    """A row of `admission_uni_and_programs.csv`"""
+    return {'article_id': article_id, 'university': university, 'program': program,
+            'program_type': program_type, 'program_level': program_level}
+
+
+def candidate(**kwargs):
+    """A normalized query, as returned by `parse_request`"""
+    query = {'uni_id': 'NTU', 'major_id': 'CS', 'major_type': 'CS', 'gpa': 3.7, 'program_level': 'MS',
+             'universities': [], 'programs': [], 'program_types': [], 'article_type': 'ADMISSION'}
+    query.update(kwargs)
+    return query
+
+
+@pytest.fixture
+def engine():
+    articles = [
+        article_row('M.1.A.001'),
+        article_row('M.2.A.002', date='2019-01-05 08:30:00', uni_id='NCTU', mean_gpa='3.2', min_gpa='3.0'),
+        article_row('M.3.A.003', date='', major_id='EE', major_type='EE', mean_gpa='3.9', min_gpa='3.8'),
+        article_row('M.4.A.004', article_type='ASK'),
+    ]
+    programs = [
+        program_row('M.1.A.001'),
+        program_row('M.1.A.001', university='Stanford University', program='MSEE', program_type='EE'),
+        program_row('M.2.A.002', university='Cornell University', program='MEng', program_type='MEng'),
+        program_row('M.3.A.003', program='MHCI', program_type='HCI', program_level='PhD'),
+        program_row('M.4.A.004'),
+    ]
+    return ScoringEngine(articles, programs)
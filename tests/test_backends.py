@@ -0,0 +1,14 @@
+import pytest
+from api.backends import BACKENDS, StorageBackend, MemoryBackend
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class NoPages(MemoryBackend):
+        query_similar_background_page = StorageBackend.query_similar_background_page
+
+    with pytest.raises(TypeError, match='query_similar_background_page'):
+        NoPages()
+
+
+def test_memory_backend_is_registered():
+    assert isinstance(BACKENDS['memory'](), MemoryBackend)
@@ -0,0 +1,62 @@
+import json
+import pytest
+from api import pagination
+from api.pagination import encode_cursor, decode_cursor, is_after
+from tests.conftest import candidate
+
+KEY = 'admission:{}'
+
+
+def resign(cursor, **changes):
+    """The cursor with some fields changed, signed again like the server would"""
+    after = json.loads(pagination._b64decode(cursor.split('.')[0]))
+    after.update(changes)
+    payload = json.dumps(after).encode('utf-8')
+    return pagination._b64encode(payload) + '.' + pagination._b64encode(pagination._signature(payload))
+
+
+@pytest.fixture
+def rows(engine):
+    return engine.query_similar_background(candidate())
+
+
+def test_round_trip(rows):
+    after = decode_cursor(encode_cursor(rows[0], KEY, 1, 1), KEY)
+    assert after['article_id'] == rows[0].article_id
+    assert [row.article_id for row in rows if is_after(row, after)] == [row.article_id for row in rows[1:]]
+
+
+def test_round_trip_without_date(rows):
+    row = next(row for row in rows if row.date is None)
+    assert decode_cursor(encode_cursor(row, KEY, 1, 1), KEY)['date'] is None
+
+
+def test_rejects_another_query(rows):
+    with pytest.raises(ValueError, match='this query'):
+        decode_cursor(encode_cursor(rows[0], KEY, 1, 1), 'school:{}')
+
+
+@pytest.mark.parametrize('cursor', ['', 'garbage', 'a.b.c', '!!!.???'])
+def test_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, KEY)
+
+
+def test_rejects_tampered(rows):
+    cursor = encode_cursor(rows[0], KEY, 1, 1)
+    payload, signature = cursor.split('.')
+    after = json.loads(pagination._b64decode(payload))
+    after['max_score'] = -1000.0
+    tampered = pagination._b64encode(json.dumps(after).encode('utf-8')) + '.' + signature
+    with pytest.raises(ValueError, match='signature'):
+        decode_cursor(tampered, KEY)
+
+
+@pytest.mark.parametrize('changes', [
+    {'returned': -100}, {'returned': 0}, {'returned': 10 ** 6}, {'returned': 1.5}, {'returned': True},
+    {'page_size': 0}, {'page_size': '10'}, {'total_count': -1},
+    {'gpa_diff': 'x'}, {'score': None}, {'max_score': 'NaN'}, {'article_id': 1}, {'date': 'yesterday'},
+])
+def test_rejects_invalid_fields(rows, changes):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(resign(encode_cursor(rows[0], KEY, 1, 1), **changes), KEY)
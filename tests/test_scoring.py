@@ -0,0 +1,86 @@
+import os
+import copy
+import pytest
+from config.settings import OUTPUT_DIR
+from api.scoring import ScoringEngine
+from tests.conftest import article_row, program_row, candidate
+
+CANDIDATES = [
+    candidate(uni_id='NTU', major_id='IM', major_type='IM', gpa=3.7,
+              universities=['Carnegie Mellon University', 'Stanford University'], programs=['MHCI', 'MSIN'],
+              program_types=['HCI', 'CS']),
+    candidate(uni_id='NCTU', major_id='CS', major_type='CS', gpa=3.5),
+    candidate(uni_id='', major_id='', major_type='', gpa=3.01, program_level='PhD', programs=['CS'], program_types=['CS']),
+    candidate(uni_id='NCKU', major_id='ME', major_type='ME', gpa=2.9,
+              universities=['Georgia Institute of Technology'], programs=['Robotics'], program_types=['EE']),
+]
+
+
+def test_similar_background_order(engine):
+    articles = engine.query_similar_background(candidate())
+    assert [a.article_id for a in articles] == ['M.1.A.001', 'M.3.A.003', 'M.2.A.002']
+    assert [a.score for a in articles] == sorted((a.score for a in articles), reverse=True)
+    # Every program of the article is aggregated, in file order
+    assert articles[0].programs == ['MSCS', 'MSEE']
+    assert {a.total_count for a in articles} == {3}
+
+
+def test_target_school_ranks_target_first(engine):
+    articles = engine.query_target_school(candidate(universities=['Cornell University'] * 3))
+    assert articles[0].article_id == 'M.2.A.002'
+    assert articles[0].score == articles[0].max_score > articles[1].score
+
+
+def test_program_types_filter(engine):
+    articles = engine.query_similar_background(candidate(program_types=['MEng']))
+    assert [a.article_id for a in articles] == ['M.2.A.002']
+
+
+def test_cutoff_rounds_down_a_negative_max_score():
+    # 101 articles scored -0.2 (no GPA): floor(-0.2 / 2) = -1 keeps them, a truncation to 0 would not
+    ids = ['M.%d.A.%03d' % (i, i) for i in range(101)]
+    engine = ScoringEngine([article_row(i, uni_id='NTHU', major_id='EE', major_type='EE', mean_gpa='-1', min_gpa='-1')
+                            for i in ids], [program_row(i, program='MSIN', program_type='IS') for i in ids])
+    articles = engine.query_similar_background(candidate(), limit=1000)
+    assert articles[0].max_score == -0.2
+    assert len(articles) == 101
+
+
+def test_limit(engine):
+    assert len(engine.query_similar_background(candidate(), limit=2)) == 2
+
+
+@pytest.fixture(scope='module')
+def database():
+    """The DB, if it holds the CSV files of OUTPUT_DIR"""
+    database = pytest.importorskip('api.database')
+    csv_paths = [os.path.join(OUTPUT_DIR, name) for name in
+                 ('admission_articles.csv', 'admission_universities.csv', 'admission_uni_and_programs.csv')]
+    if not all(os.path.exists(path) for path in csv_paths):
+        pytest.skip('No dumped CSV files')
+    try:
+        loaded = database.loaded_checksum()
+    except Exception as error:
+        pytest.skip(f'No database: {error}')
+    if loaded != database.csv_checksum(csv_paths):
+        pytest.skip('The database does not hold the dumped CSV files, run ingest.py')
+    return database
+
+
+@pytest.mark.parametrize('query', CANDIDATES)
+@pytest.mark.parametrize('endpoint', ['admission', 'school'])
+def test_matches_sql(database, query, endpoint):
+    engine = ScoringEngine.from_csv()
+    fn, sql_fn = {
+        'admission': (engine.query_similar_background, database.query_similar_background_api),
+        'school': (engine.query_target_school, database.query_target_school_api),
+    }[endpoint]
+    expected = [(a.article_id, float(a.score) if a.score is not None else None,
+                 sorted(zip(a.universities, a.programs, a.program_types, a.program_levels)))
+                for a in sql_fn(copy.deepcopy(query), limit=10 ** 6)]
+    got = [(a.article_id, a.score, sorted(zip(a.universities, a.programs, a.program_types, a.program_levels)))
+           for a in fn(copy.deepcopy(query), limit=10 ** 6)]
+    # Articles with equal sort keys may come back in any order from Postgres, so the
+    # limit is lifted to compare whole result sets
+    assert sorted(expected, key=str) == sorted(got, key=str)
+    assert [x[1] for x in expected] == [x[1] for x in got]
@@ -0,0 +1,32 @@
+import json
+import pytest
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+from api import response_cache
+from api.models import article_dict, init_candidate, init_programs
+from api.response_cache import render_articles
+from tests.conftest import candidate
+
+
+def render_models(articles):
+    """The pydantic path the endpoints used before `render_articles`"""
+    return JSONResponse(content=jsonable_encoder([init_candidate(a, init_programs(a)) for a in articles])).body
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_render_articles_matches_models(engine, monkeypatch, use_orjson):
+    if use_orjson and response_cache.orjson is None:
+        pytest.skip('orjson is not installed')
+    if not use_orjson:
+        monkeypatch.setattr(response_cache, 'orjson', None)
+    articles = [a for a in engine.query_similar_background(candidate()) if a.date is not None]
+    articles += engine.query_target_school(candidate(universities=['Carnegie Mellon University'] * 3))
+    assert articles
+    assert render_articles(articles) == render_models(articles)
+
+
+def test_article_dict_without_date(engine):
+    article = next(a for a in engine.query_similar_background(candidate()) if a.article_id == 'M.3.A.003')
+    assert article.date is None
+    assert article_dict(article)['date'] is None
+    assert json.loads(render_articles([article]))[0]['date'] is None
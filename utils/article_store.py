@@ -0,0 +1,167 @@
+"""Compact in-memory store of the articles, kept column by column
+
+`DataModel` used to keep the board as a NumPy object array of dicts: every article carried its
+own dict with the same keys, its own copy of the university and major info, and every
+`all_articles[indices]` allocated a new array. `ArticleStore` keeps one list per key instead,
+shares the values of the categorical columns between the articles and returns views for the
+index lists, while each article still reads and writes like a dict.
+"""
+import sys
+import operator
+from collections.abc import MutableMapping, Sequence
+
+# Placeholder of the articles that do not have a key
+MISSING = type('Missing', (), {'__repr__': lambda self: 'MISSING', '__slots__': ()})()
+
+# Columns whose values repeat between the articles: their strings are interned and their dicts
+# of plain values stored once. The shared dicts must not be modified in place, assign a new one.
+SHARED_COLUMNS = ('article_type', 'author', 'university_info', 'major_info', 'gpa_info', 'admission_info')
+
+
+def is_index(key):
+    """Whether `key` is a single integer index, including NumPy integers"""
+    try:
+        operator.index(key)
+        return True
+    except TypeError:
+        return False
+
+
+class Article(MutableMapping):
+    """One article of an `ArticleStore`, used like the dict it was built from"""
+    __slots__ = ('store', 'idx')
+
+    def __init__(self, store, idx):
+        self.store = store
+        self.idx = idx
+
+    def __getitem__(self, key):
+        value = self.store.columns[key][self.idx]
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.idx, key, value)
+
+    def __delitem__(self, key):
+        self[key]
+        self.store.columns[key][self.idx] = MISSING
+
+    def __iter__(self):
+        idx = self.idx
+        return (key for key, column in self.store.columns.items() if column[idx] is not MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        idx = self.idx
+        return {key: column[idx] for key, column in self.store.columns.items() if column[idx] is not MISSING}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class ArticleView(Sequence):
+    """The articles of a store at `indices`, the indices are not copied"""
+    __slots__ = ('store', 'indices')
+
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = indices
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ArticleView(self.store, self.indices[key])
+        if not is_index(key):
+            return ArticleView(self.store, [self.indices[idx] for idx in key])
+        return Article(self.store, self.indices[key])
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        store = self.store
+        return (Article(store, idx) for idx in self.indices)
+
+
+class ArticleStore(Sequence):
+    def __init__(self, articles=()):
+        self.columns = {}
+        self.size = 0
+        self.shared = {}
+        for article in articles:
+            self.append(article)
+
+    def append(self, article):
+        idx = self.size
+        self.size += 1
+        count = 0
+        for key, column in self.columns.items():
+            value = article.get(key, MISSING)
+            if value is not MISSING:
+                count += 1
+                if key in SHARED_COLUMNS:
+                    value = self.share(value)
+            column.append(value)
+        if count < len(article):
+            for key, value in article.items():
+                if key not in self.columns:
+                    self.columns[key] = [MISSING] * (idx + 1)
+                    self.set(idx, key, value)
+
+    def set(self, idx, key, value):
+        if key not in self.columns:
+            self.columns[key] = [MISSING] * self.size
+        if key in SHARED_COLUMNS:
+            value = self.share(value)
+        self.columns[key][idx] = value
+
+    def share(self, value):
+        """A copy of `value` made of the strings and the dicts already stored, when they are equal"""
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, list):
+            return [self.share(v) for v in value]
+        if isinstance(value, dict):
+            value = {sys.intern(k): self.share(v) for k, v in value.items()}
+            try:
+                # The types are part of the key, so 4 and 4.0 are still dumped as they were
+                return self.shared.setdefault(tuple((k, type(v), v) for k, v in value.items()), value)
+            except TypeError:
+                # Holds a list, keep its own copy
+                return value
+        return value
+
+    def reserve(self, keys):
+        """Add empty columns for the `keys` that are not stored yet
+
+        The keys of an article are listed in the order of the columns, so the columns of keys that
+        are set later on have to be added in the order a dict would have them.
+        """
+        for key in keys:
+            self.columns.setdefault(key, [MISSING] * self.size)
+
+    def drop(self, key):
+        """Remove `key` from all the articles"""
+        self.columns.pop(key, None)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return ArticleView(self, range(self.size)[key])
+        if not is_index(key):
+            # A list or an array of indices
+            return ArticleView(self, key)
+        key = operator.index(key)
+        if key < 0:
+            key += self.size
+        if not 0 <= key < self.size:
+            raise IndexError('article index out of range')
+        return Article(self, key)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return (Article(self, idx) for idx in range(self.size))
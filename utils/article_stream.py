@@ -0,0 +1,137 @@
+"""Read and write `{"articles": [...]}` JSON files one article at a time
+
+Used by `DataModel.stream_data_pipeline` so the memory of the ingest does not grow with the
+size of the board: only the article being processed (and a batch of admission articles waiting
+to be parsed) is kept in memory.
+"""
+import os
+import re
+import json
+import resource
+import sys
+from json.encoder import encode_basestring
+from utils.json_stream import iter_array_items
+
+ARRAY_START_REG = re.compile(r'\{\s*"(\w+)"\s*:\s*\[')
+
+
+def iter_articles(path, key='articles', chunk_size=1 << 16):
+    """Yield the objects of the `key` array of a JSON file, reading it `chunk_size` characters at a time
+
+    The array has to be the only member of the top level object, which is how the PTT crawler
+    and `DataModel.save_classified_articles` write the files. `ArticleWriter` only writes that
+    array back, so a file with other top level members raises a ValueError once the array is read.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        match = ARRAY_START_REG.match(buffer)
+        if match is None or match.group(1) != key:
+            raise ValueError(f'{path} does not start with a "{key}" array')
+        rest = yield from iter_array_items(f, buffer, match.end(), chunk_size)
+        if (rest + f.read()).strip() != '}':
+            raise ValueError(f'{path} has other top level members than the "{key}" array')
+
+
+def encode_float(value):
+    # Same as the json module
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return 'Infinity' if value > 0 else '-Infinity'
+    return float.__repr__(value)
+
+
+def encode_indented(value, indent, newline='\n'):
+    """`json.dumps(value, ensure_ascii=False, indent=len(indent))` of the plain JSON values of an article
+
+    The indented output of the json module is built by its pure Python encoder, this builds the
+    same text with string joins and the C string escaper. `newline` is the line break and the
+    indentation before `value`. Raises TypeError on values it does not handle (like non-string keys).
+    """
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if isinstance(value, float):
+        return encode_float(value)
+    inner = newline + indent
+    if isinstance(value, dict):
+        if not value:
+            return '{}'
+        items = []
+        for k, v in value.items():
+            if not isinstance(k, str):
+                raise TypeError(f'Key {k!r} is not a string')
+            items.append(encode_basestring(k) + ': ' + encode_indented(v, indent, inner))
+        return '{' + inner + (',' + inner).join(items) + newline + '}'
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return '[]'
+        return '[' + inner + (',' + inner).join([encode_indented(v, indent, inner) for v in value]) + newline + ']'
+    raise TypeError(f'Object of type {type(value).__name__} is not handled')
+
+
+class ArticleWriter:
+    """Write articles to a `{"articles": [...]}` JSON file one at a time
+
+    The files it rewrites are read with `iter_articles`, which checks they have no other top level members.
+
+    The file is identical to `json.dump({'articles': articles}, f, ensure_ascii=False, indent=indent)`.
+    It is written next to `path` and only replaces it on `close`, so `path` can be the file being read.
+    """
+
+    def __init__(self, path, indent=None):
+        self.path = path
+        self.indent = indent
+        self.count = 0
+        self.encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+        self.f = open(path + '.tmp', 'w', encoding='utf-8')
+        if indent is None:
+            self.f.write('{"articles": [')
+            self.separator, self.item_indent, self.end, self.empty_end = ', ', '', ']}', ']}'
+        else:
+            self.f.write('{\n' + ' ' * indent + '"articles": [')
+            self.item_indent = '\n' + ' ' * indent * 2
+            self.separator = ',' + self.item_indent
+            self.end = '\n' + ' ' * indent + ']\n}'
+            self.empty_end = ']\n}'
+
+    def write(self, article):
+        if self.indent is None:
+            text = self.encoder.encode(article)
+        else:
+            try:
+                text = encode_indented(article, ' ' * self.indent, self.item_indent)
+            except TypeError:
+                # Strings are escaped by the encoder, so every newline belongs to the layout
+                text = self.encoder.encode(article).replace('\n', self.item_indent)
+        self.f.write((self.separator if self.count else self.item_indent) + text)
+        self.count += 1
+
+    def close(self):
+        self.f.write(self.end if self.count else self.empty_end)
+        self.f.close()
+        os.replace(self.path + '.tmp', self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            os.remove(self.path + '.tmp')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
@@ -1,5 +1,4 @@
 from config.settings import DATA_DIR, ARTICLE_TYPE
-import copy
 import re
 import numpy as np
 import pandas as pd
@@ -8,19 +7,70 @@ import textdistance
 import os
 import json
 import collections
-from utils.programs import Programs
+from utils.programs import Programs, read_majors
+from utils.matcher import AhoCorasick, PatternIndex, WORD_REG
 pp = pprint.PrettyPrinter()
 
+# Regular expressions of the parsers, compiled once here instead of for every row of every article
+BACKGROUND_KEYWORDS = ('background', 'education', '經歷', '學歷', 'academic record')
+GPA_KEYWORDS = ('GPA', 'Rank', ' Education', 'Background')
+BACKGROUND_REG = re.compile(r'(' + '|'.join(BACKGROUND_KEYWORDS) + ')', re.IGNORECASE)
+GPA_KEYWORD_REG = re.compile(r'(' + '|'.join(GPA_KEYWORDS) + ')', re.IGNORECASE)
+GRE_REG = re.compile(r'(GRE|G:|G |AW|V1|Q1|V 1|Q 1|V:|Q:)', re.IGNORECASE)
+YEAR_REG = re.compile(r'[2][0-9]{3}')
+FLOAT_REG = re.compile(r'\d+\.\d+')
+MAJOR_NOISE_REG = re.compile(r'(student|TOEFL|GRE)', re.IGNORECASE)
+MAJOR_PUNCTUATION_REG = re.compile(r'[.,:;/()]')
+ENT_REG = re.compile(r' ENT')
+
+AD_REG = re.compile(r'(admit|admission|admision|accept|appected|ad |ad:|offer|錄取)', re.IGNORECASE)
+REJ_REG = re.compile(r'(reject|rejection|rejection:|rej|rej:|拒絕|打槍)', re.IGNORECASE)
+PENDING_REG = re.compile(r'(pending|waitlist|wl |wl:|無聲|無消息)', re.IGNORECASE)
+USELESS_REG = re.compile(r'w\/|w\/o|funding|without|with|stipend|tuition|waived|waive|waiver|fellowship| RA|email|e-mail|year|month|date|interviewed|\
+                                decision|semester|first|for | per| technical|nomination| by | out|\(|\)|Research|Interest|Area|Field|Politics', re.IGNORECASE)
+NON_ASCII_REG = re.compile(r'[^\x00-\x7F]+')
+DATE_REG = re.compile(r'\d+\/\d+')
+TITLE_SPLIT_REG = re.compile(r'[:;/(),\[\]]')
+ROW_SPLIT_REG = re.compile(r'[:;,/\[\]]')
+STATE_UNIVERSITY_REG = re.compile(r'\w*State U\b')
+UNIV_ABBR_REG = re.compile(r'\w*Univ.\b', re.IGNORECASE)
+NOISE_WORD_REG = re.compile(r'no|yr|ta|ra|ms', re.IGNORECASE)
+
+
+def read_tw_universities():
+    return pd.read_csv(os.path.join(DATA_DIR, 'tw/tw_universities.csv'), sep='|', index_col='uni_id')
+
+
+def read_us_universities():
+    with open(os.path.join(DATA_DIR, 'us/us_universities_top.json'), 'r') as f:
+        return json.load(f)
+
 
 class Background:
     def find_university(self): raise NotImplementedError("Override me")
     def find_major(self): raise NotImplementedError("Override me")
 
 
+class ArticleDocument:
+    """Content of an article split into rows once and shared by the `TWBackground` extractors
+
+    `background_row_idx` is the first row with a background keyword and `search_order` the row
+    indices starting from it and wrapping around, in the order `find_university` searches them.
+    """
+    __slots__ = ('rows', 'background_row_idx', 'search_order')
+
+    def __init__(self, content):
+        self.rows = content.split('\n')
+        self.background_row_idx = next((idx for idx, row in enumerate(self.rows) if BACKGROUND_REG.search(row)), None)
+        start = self.background_row_idx or 0
+        self.search_order = list(range(start, len(self.rows))) + list(range(start))
+
+
 class TWBackground(Background):
-    def __init__(self):
+    def __init__(self, universities=None, majors=None):
+        """`universities` and `majors` are the tables of `data/tw`, read from the CSV files when not given"""
         # TW universities
-        self.universities = pd.read_csv(os.path.join(DATA_DIR, 'tw/tw_universities.csv'), sep='|', index_col='uni_id')
+        self.universities = read_tw_universities() if universities is None else universities.copy()
         self.universities['ip'] = self.universities['ip'].map(lambda x: str(int(x)) if not pd.isnull(x) else None)
         self.universities = self.universities.where(self.universities.notnull(), None)
         self.uid2cname = self.universities.to_dict()['uni_cname']
@@ -30,49 +80,77 @@ class TWBackground(Background):
         self.ip2uid = {str(int(ip)): uid for ip, uid in zip(self.universities['ip'], self.universities.index) if ip is not None}
 
         # Majors
-        self.majors = pd.read_csv(os.path.join(DATA_DIR, 'tw/majors.csv'), sep=',', index_col='major_id', na_values=None)
+        self.majors = read_majors() if majors is None else majors
         self.mid2name = self.majors.to_dict()['major_cname']
         self.cabbr2mid = {cabbr: mid for cabbr, mid in zip(self.majors['major_cabbr'], self.majors.index)}
         self.cname2mid = {cname: mid for cname, mid in zip(self.majors['major_cname'], self.majors.index)}
         self.name2mid = {name.upper(): mid for name, mid in zip(self.majors['major_name'], self.majors.index)}
         self.mid2mtype = {mid: mtype for mtype, mid in zip(self.majors['major_type'], self.majors.index)}
 
+        # Alias indexes for `sentence2university` and `sentence2major`, each alias keeps its priority,
+        # which is its position in the dict the former alternation regexes were built from.
+        # Chinese names and IPs are only matched as whole words, through the dicts above.
+        self.university_index = AhoCorasick(
+            [(uid, ('uid', p, uid)) for p, uid in enumerate(self.uid2cname)] +
+            [(cabbr, ('cabbr', p, uid)) for p, (cabbr, uid) in enumerate(self.cabbr2uid.items())] +
+            [(name, ('name', p, uid)) for p, (name, uid) in enumerate(self.name2uid.items())])
+        self.major_index = AhoCorasick(
+            [(mid, ('mid', p, mid)) for p, mid in enumerate(self.mid2name)] +
+            [(cabbr, ('cabbr', p, mid)) for p, (cabbr, mid) in enumerate(self.cabbr2mid.items())] +
+            [(name, ('name', p, mid)) for p, (name, mid) in enumerate(self.name2mid.items())])
+
         # Background keywords
-        self.background_keywords = ('background', 'education', '經歷', '學歷', 'academic record')
-        self.gpa_keywords = ('GPA', 'Rank', ' Education', 'Background')
+        self.background_keywords = BACKGROUND_KEYWORDS
+        self.gpa_keywords = GPA_KEYWORDS
         self.debug_id = None
 
+    def document(self, content):
+        """The `ArticleDocument` of `content`, pass it to the three `find_*` methods to split the content only once"""
+        return content if isinstance(content, ArticleDocument) else ArticleDocument(content)
+
+    def find_university_major_gpa(self, content, aid=None):
+        """University, major and GPA of the author of an article, the content is split into rows once"""
+        document = self.document(content)
+        university = self.find_university(document, aid=aid)
+        return university, self.find_major(document, university, aid=aid), self.find_gpa(document, university, aid=aid)
+
     def find_university(self, content, aid=None):
         def helper(matched_word=None, university_row_index=None, uni_id=None, background_row_idx=None):
             """Helper function to return the result as a json object"""
             return locals()
-        content = copy.deepcopy(content)
-        rows = content.split('\n')
-
-        # We try to find the "Background" keywords to identify the university
-        background_row_idx = None
-        for idx, row in enumerate(rows):
-            s = re.search(r'(' + '|'.join(self.background_keywords) + ')', row, flags=re.IGNORECASE)
-            if s is not None:
-                background_row_idx = idx
-                break
-        search_range = [i for i in range(0, len(rows))]
-
-        # Rotate the array so we start the search from the background section
-        if background_row_idx is not None:
-            search_range = search_range[background_row_idx:] + search_range[:background_row_idx]
+        # We start the search from the row with the "Background" keywords to identify the university
+        document = self.document(content)
 
         # Search row by row in search range
-        for ridx in search_range:
-            row = rows[ridx]
+        for ridx in document.search_order:
+            row = document.rows[ridx]
             uni, word = self.sentence2university(row)
             if uni:
-                return helper(word, ridx, uni, background_row_idx)
+                return helper(word, ridx, uni, document.background_row_idx)
         return None
 
+    @staticmethod
+    def match_in_word(matches, kind, start, end, suffix=False):
+        """Target of the first `kind` alias inside the word [start, end), like `re.findall(...)[0]` did
+
+        The leftmost alias wins and ties go to the alias with the highest priority. With `suffix`,
+        only aliases that end the word count, i.e. the former `(...)(?!.)` pattern.
+        """
+        found = [(s, p, target) for s, e, (k, p, target) in matches
+                 if k == kind and s >= start and (e == end if suffix else e <= end)]
+        return min(found)[2] if found else None
+
+    @staticmethod
+    def match_in_sentence(matches, kind):
+        """Target of the `kind` alias with the highest priority anywhere in the sentence"""
+        found = [(p, target) for s, e, (k, p, target) in matches if k == kind]
+        return min(found)[1] if found else None
+
     def sentence2university(self, sentence):
         ntu_siblings = ('NTUT', 'NTUST')
-        for word in sentence.strip().split():
+        matches = self.university_index.find_all(sentence)
+        for m in WORD_REG.finditer(sentence):
+            word = m.group()
             # Exact match of university chinese name
             if word in self.cname2uid:
                 return self.cname2uid[word], word
@@ -88,26 +166,25 @@ class TWBackground(Background):
             elif word in self.ip2uid:
                 return self.ip2uid[word], word
             else:
-                # uid in word (e.g. 'NTU' in 'NTUEE')
-                ruid = re.findall(r'(' + '|'.join(self.uid2cname.keys()) + ')(?!.)', word)
+                # uid at the end of word (e.g. 'NTU' in 'NTUEE')
+                ruid = self.match_in_word(matches, 'uid', m.start(), m.end(), suffix=True)
                 # Filter False positive Hsinchu -> NCHU
                 if ruid and word != 'Hsinchu':
-                    return ruid[0].upper(), word
+                    return ruid.upper(), word
                 # Chinese abbr. in word (e.g. '台大' in '台大電機')
-                rabbr = re.findall(r'(' + '|'.join(self.cabbr2uid.keys()) + ')', word)
+                rabbr = self.match_in_word(matches, 'cabbr', m.start(), m.end())
                 if rabbr:
-                    return self.cabbr2uid[rabbr[0]], word
+                    return rabbr, word
         # Check if university English name in row
-        for name in self.name2uid:
-            if name in sentence:
-                return self.name2uid[name], word
+        uid = self.match_in_sentence(matches, 'name')
+        if uid:
+            return uid, word
         return None, None
 
     def find_major(self, content, university, aid=None):
         if aid == self.debug_id:
             print(aid)
-        content = copy.deepcopy(content)
-        rows = content.split('\n')
+        rows = self.document(content).rows
 
         # Define the range of rows we are going to search,  where we usually start from the the "background_row_idx"
         start_row_index = university['background_row_idx'] if university is not None and university['background_row_idx'] is not None else 0
@@ -126,29 +203,31 @@ class TWBackground(Background):
         return None
 
     def sentence2major(self, sentence, university=None, from_api=False):
-        sentence = re.sub(r'(student|TOEFL|GRE)', ' ', sentence, flags=re.IGNORECASE)
+        sentence = MAJOR_NOISE_REG.sub(' ', sentence)
         # We now determine the start idx we parse from the row!
         # 1) Major is often listed after/before university, check if we are at the same row
         start_idx = 0
         if university is not None and university['matched_word'] in sentence:
             start_idx = max(sentence.index(university['matched_word']) - 10, 0)
         # 2) Major is often listed after the background keywords, check if the keyword exists
-        s = re.search(r'(' + '|'.join(self.background_keywords) + ')', sentence, re.IGNORECASE)
+        s = BACKGROUND_REG.search(sentence)
         # 3) Set the start index
         if s is not None:
             start_idx = min(start_idx, s.end())
 
         # Search after the start_idx (e.g. After university or background)
         sentence = sentence[start_idx:]
-        sentence = re.sub(r'[.,:;/()]', ' ', sentence)
+        sentence = MAJOR_PUNCTUATION_REG.sub(' ', sentence)
         sentence = sentence.upper()
 
         # Check if major English name in row
-        for name in self.name2mid:
-            if name in sentence:
-                return self.name2mid[name]
+        matches = self.major_index.find_all(sentence)
+        mid = self.match_in_sentence(matches, 'name')
+        if mid:
+            return mid
 
-        for word in sentence.strip().split():
+        for m in WORD_REG.finditer(sentence):
+            word = m.group()
 
             # Exact match of major chinese name
             if word in self.cname2mid:
@@ -160,36 +239,35 @@ class TWBackground(Background):
             elif word.upper() in self.mid2name and word.upper() != 'BA':
                 return word.upper()
             else:
-                # mid in word (e.g. 'EE' in 'NTUEE')
-                rmid = re.findall(r'(' + '|'.join(self.mid2name.keys()) + ')(?!.)', word)
+                # mid at the end of word (e.g. 'EE' in 'NTUEE')
+                rmid = self.match_in_word(matches, 'mid', m.start(), m.end(), suffix=True)
                 # Filter False positive ENT (Entomology) and word != 'BA' (Bachelor's of Art)
-                if rmid and (rmid[0] != 'ENT' or re.match(r' ENT', word)) and rmid[0] != 'BA'\
-                        and (rmid[0] != 'ARCH' or 'RESEARCH' not in word.upper()):
-                    return rmid[0].upper()
-                # cabbr in word (e.g. '電機' in '台大電機系')
-                rabbr = re.findall(r'(' + '|'.join(self.cabbr2mid.keys()) + ')', word, re.IGNORECASE)
+                if rmid and (rmid != 'ENT' or ENT_REG.match(word)) and rmid != 'BA'\
+                        and (rmid != 'ARCH' or 'RESEARCH' not in word.upper()):
+                    return rmid.upper()
+                # cabbr in word (e.g. '電機' in '台大電機系'), the sentence is already upper case
+                rabbr = self.match_in_word(matches, 'cabbr', m.start(), m.end())
                 if rabbr and '中文大學' not in word:
-                    return self.cabbr2mid[rabbr[0]]
+                    return rabbr
         # Another corner case where the major id is BA from the API request
         if from_api and sentence == 'BA':
             return 'BA'
         return None
 
     def find_gpa(self, content, university, aid=None):
-        content = copy.deepcopy(content)
-        rows = content.split('\n')
+        rows = self.document(content).rows
         gpa_scale = -1
         gpa_keyword_in_row_idx = None
         background_row_idx = university['background_row_idx'] if university is not None else None
         candidates = []
         for idx, row in enumerate(rows):
             # Check if GPA and GRE keyword in row
-            gpa_keyword_in_row = re.search(r'(' + '|'.join(self.gpa_keywords) + ')', row, re.IGNORECASE)
+            gpa_keyword_in_row = GPA_KEYWORD_REG.search(row)
             if gpa_keyword_in_row:
                 gpa_keyword_in_row_idx = idx
 
             # See if GRE is in row
-            gre_in_row = re.search(r'(GRE|G:|G |AW|V1|Q1|V 1|Q 1|V:|Q:)', row, re.IGNORECASE)
+            gre_in_row = GRE_REG.search(row)
 
             # If GRE and GPA co-occur in the same row, remove the GRE part
             if gre_in_row and gpa_keyword_in_row:
@@ -202,10 +280,9 @@ class TWBackground(Background):
             # aw_idx = row.index('AW') if 'AW' in row else aw_idx
 
             # Parse the float numbers in the current row through regex
-            year_regex = r'[2][0-9]{3}'
-            row = re.sub(year_regex, ' ', row)
+            row = YEAR_REG.sub(' ', row)
 
-            float_numbers = re.finditer(r'\d+\.\d+', row)
+            float_numbers = FLOAT_REG.finditer(row)
             # Only search rows that are "GPA_keyword" rows
             if gpa_keyword_in_row is not None or (gpa_keyword_in_row_idx is not None and idx - gpa_keyword_in_row_idx <= 1):
                 for m in float_numbers:
@@ -243,18 +320,17 @@ class TWBackground(Background):
 
 
 class USBackground(Background):
-    def __init__(self):
-        self.ad_reg = r'(admit|admission|admision|accept|appected|ad |ad:|offer|錄取)'
-        self.rej_reg = r'(reject|rejection|rejection:|rej|rej:|拒絕|打槍)'
-        self.pending_reg = r'(pending|waitlist|wl |wl:|無聲|無消息)'
-        self.useless_reg = r'w\/|w\/o|funding|without|with|stipend|tuition|waived|waive|waiver|fellowship| RA|email|e-mail|year|month|date|interviewed|\
-                                decision|semester|first|for | per| technical|nomination| by | out|\(|\)|Research|Interest|Area|Field|Politics'
-        self.ascii_reg = r'[^\x00-\x7F]+'
+    def __init__(self, us_universities=None, programs=None):
+        """`us_universities` is `data/us/us_universities_top.json` and `programs` a `Programs`, loaded when not given"""
+        self.ad_reg = AD_REG
+        self.rej_reg = REJ_REG
+        self.pending_reg = PENDING_REG
+        self.useless_reg = USELESS_REG
+        self.ascii_reg = NON_ASCII_REG
         self.debug_id = None
 
         # Load Universities
-        with open(os.path.join(DATA_DIR, 'us/us_universities_top.json'), 'r') as f:
-            self.us_universities = json.load(f)
+        self.us_universities = read_us_universities() if us_universities is None else us_universities
 
         # Init a set of all university names
         self.all_uni_names = set(self.us_universities['top_100_names'] + self.us_universities['other_uni_names'])
@@ -266,8 +342,17 @@ class USBackground(Background):
         for uid in self.us_universities['other_uni_uid']:
             self.uname2uid[self.us_universities['other_uni_uid'][uid]].append(uid)
 
+        # Indexes that keep the precedence of the lists in `us_universities_top.json`
+        self.top_name_index = PatternIndex(self.us_universities['top_100_names'])
+        self.top_name_chars = [(uname, collections.Counter(uname)) for uname in self.us_universities['top_100_names']]
+        self.other_name_index = PatternIndex(self.us_universities['other_uni_names'])
+        self.top_uid_order = {uid: idx for idx, uid in enumerate(self.us_universities['top_100_uid'])}
+        self.top_uid_index = AhoCorasick((uid, uid) for uid in self.us_universities['top_100_uid'])
+        self.other_uid_order = {uid: idx for idx, uid in enumerate(self.us_universities['other_uni_uid'])}
+        self.other_uid_index = AhoCorasick((uid, uid) for uid in self.us_universities['other_uni_uid'])
+
         # Init Programs instance
-        self.programs = Programs()
+        self.programs = Programs() if programs is None else programs
 
     def normalize_university_name(self, words):
         if words.startswith('U '):
@@ -277,70 +362,65 @@ class USBackground(Background):
         words = words.replace('Univ ', 'University')
         words = words.replace('UC-', 'UC ')
         words = words.replace('University of California,', 'University of California ')
-        r = re.search(r'\w*State U\b', words)
+        r = STATE_UNIVERSITY_REG.search(words)
         if r:
             words = words[: r.start()] + 'State University' + words[r.end():]
 
-        r = re.search(r'\w*Univ.\b', words, flags=re.IGNORECASE)
+        r = UNIV_ABBR_REG.search(words)
         if r:
             words = words[: r.start()] + 'University' + words[r.end():]
 
         # Purify some random words:
-        r = r'no|yr|ta|ra|ms'
-        if len(words) == 2 and re.search(r, words, flags=re.IGNORECASE):
+        if len(words) == 2 and NOISE_WORD_REG.search(words):
             words = ''
         return words
 
     def search_single_university_name(self, ad_row):
-        for uname in self.us_universities['top_100_names']:
-            if re.search(uname, ad_row, flags=re.IGNORECASE):
-                return uname
-        ad_row = ' ' + ad_row + ' '
-        ad_row_upper = ad_row.upper()
-        for uid in self.us_universities['top_100_uid']:
-            uid_token = ' ' + uid + ' '
-            if uid_token in (ad_row_upper, ad_row):
-                return self.us_universities['top_100_uid'][uid]
+        uname = self.top_name_index.search_first(ad_row)
+        if uname:
+            return uname
+        # The whole row is a top university uid
+        uids = [uid for uid in (ad_row, ad_row.upper()) if uid in self.top_uid_order]
+        if uids:
+            return self.us_universities['top_100_uid'][min(uids, key=self.top_uid_order.get)]
         ad_row = ad_row.strip()
 
-        for uname in self.us_universities['other_uni_names']:
-            if re.search(uname, ad_row, flags=re.IGNORECASE):
-                return uname
+        uname = self.other_name_index.search_first(ad_row)
+        if uname:
+            return uname
 
         # Search for university fullnames with high LCS similarity
         # The fullname should be at least 10 characters
         if len(ad_row) >= 10:
             td_names = []
-            for uname in self.us_universities['top_100_names']:
+            row_chars = collections.Counter(ad_row)
+            for uname, uname_chars in self.top_name_chars:
+                # The LCS can't be longer than the characters both strings share, skip hopeless names
+                if sum((row_chars & uname_chars).values()) / min(len(ad_row), len(uname)) <= 0.75:
+                    continue
                 td = textdistance.lcsseq.similarity(uname, ad_row) / min(len(ad_row), len(uname))
                 if td > 0.75:
                     td_names.append((td, uname))
             if td_names:
                 return max(td_names)[1]
 
-        for uid in self.us_universities['other_uni_uid']:
-            if re.search(r'(?:^|(?<= ))(' + uid + ')(?:(?= )|$)', ad_row):
-                return self.us_universities['other_uni_uid'][uid]
+        # Other university uid as a space delimited token in the row
+        uids = set(self.other_uid_index.iter_delimited(ad_row))
+        if uids:
+            return self.us_universities['other_uni_uid'][min(uids, key=self.other_uid_order.get)]
 
         return None
 
     def search_all_university_names(self, article_title):
-        result = []
-        for uname in self.us_universities['top_100_names']:
-            if re.search(uname, article_title, flags=re.IGNORECASE):
-                result.append(uname)
+        result = self.top_name_index.search_all(article_title)
         article_title = ' ' + article_title + ' '
-        for uid in self.us_universities['top_100_uid']:
-            if ' ' + uid + ' ' in article_title:
-                result.append(self.us_universities['top_100_uid'][uid])
+        uids = set(self.top_uid_index.iter_delimited(article_title))
+        result.extend(self.us_universities['top_100_uid'][uid] for uid in self.us_universities['top_100_uid'] if uid in uids)
 
-        for uname in self.us_universities['other_uni_names']:
-            if re.search(uname, article_title, flags=re.IGNORECASE):
-                result.append(uname)
+        result.extend(self.other_name_index.search_all(article_title))
 
-        for uid in self.us_universities['other_uni_uid']:
-            if ' ' + uid + ' ' in article_title:
-                result.append(self.us_universities['other_uni_uid'][uid])
+        uids = set(self.other_uid_index.iter_delimited(article_title))
+        result.extend(self.us_universities['other_uni_uid'][uid] for uid in self.us_universities['other_uni_uid'] if uid in uids)
         article_title = article_title.strip()
 
         if 'Cornell Tech' in result and 'Cornell University' in result:
@@ -374,32 +454,32 @@ class USBackground(Background):
                 continue
             # Parse AD programs from title
             article_title = article['article_title'].replace('[錄取]', '')
-            article_title = re.sub(self.ascii_reg, ' ', article_title)
-            article_title = re.sub(self.useless_reg, ' ', article_title, flags=re.IGNORECASE)
-            ad_title = re.split(r'[:;/(),\[\]]', article_title)
+            article_title = self.ascii_reg.sub(' ', article_title)
+            article_title = self.useless_reg.sub(' ', article_title)
+            ad_title = TITLE_SPLIT_REG.split(article_title)
             ad_title = [r.strip() for r in ad_title if len(r.strip()) > 1]
 
             # Parse AD section from content
             content = article['content']
-            rows = copy.deepcopy(content.split('\n'))
+            rows = content.split('\n')
             ad_idx = None
             rej_idx = None
             pending_idx = None
 
             # Find the index for "ADMISSION", "REJECT" and "PENDING" rows
             for ridx, row in enumerate(rows):
-                if re.search(self.ad_reg, row, flags=re.IGNORECASE) and (
+                if self.ad_reg.search(row) and (
                         (rej_idx is None or ridx <= rej_idx) and (pending_idx is None or ridx <= pending_idx)):
                     ad_idx = ridx
-                if re.search(self.rej_reg, row, flags=re.IGNORECASE) and (rej_idx is None or (
+                if self.rej_reg.search(row) and (rej_idx is None or (
                         ad_idx is not None and rej_idx <= ad_idx and ridx <= ad_idx + 4)):
                     rej_idx = ridx
-                if re.search(self.pending_reg, row, flags=re.IGNORECASE) and (pending_idx is None or (
+                if self.pending_reg.search(row) and (pending_idx is None or (
                         ad_idx is not None and pending_idx <= ad_idx and ridx <= ad_idx + 4)):
                     pending_idx = ridx
 
             # Replace non ASCII characters with 'blank'
-            rows = [re.sub(self.ascii_reg, ' ', row) for row in rows]
+            rows = [self.ascii_reg.sub(' ', row) for row in rows]
 
             if article['article_id'] == self.debug_id:
                 print('parsed index', ad_idx, rej_idx, pending_idx)
@@ -412,23 +492,23 @@ class USBackground(Background):
                     row = rows[idx]
 
                     # Scrap "Admission:" from the row
-                    ad_match = re.search(self.ad_reg, row, flags=re.IGNORECASE)
+                    ad_match = self.ad_reg.search(row)
                     if ad_match:
                         row = row[:ad_match.start()] + row[ad_match.end():]
 
                     # Scrap "Reject:" or "Pending:" from the row, and break after this row
-                    end_match = re.search(end_reg, row, flags=re.IGNORECASE)
+                    end_match = end_reg.search(row)
                     if end_match:
                         row = row[:end_match.start()]
                         break_flag = True
 
                     # Remove date
-                    date_reg = re.findall(r'\d+\/\d+', row)
+                    date_reg = DATE_REG.findall(row)
                     for date in date_reg:
                         row = row.replace(date, ' ')
 
                     # Remove useless stuff, eg. w or w/o funding
-                    row = re.sub(self.useless_reg, ' ', row, flags=re.IGNORECASE)
+                    row = self.useless_reg.sub(' ', row)
 
                     # If there is only one comma, it is most likely the row only
                     # contains one university, e.g. 'MIT, EECS'
@@ -436,7 +516,7 @@ class USBackground(Background):
                         row = row.replace(',', ' ')
 
                     # Split programs! e.g. 'MIT / CMU -> ['MIT', 'CMU']
-                    row = re.split(r'[:;,/\[\]]', row)
+                    row = ROW_SPLIT_REG.split(row)
 
                     # Keep rows with length > 1
                     row = [r.strip() for r in row if len(r.strip()) > 1]
@@ -0,0 +1,69 @@
+import time
+import threading
+import collections
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries, the least recently used entry is evicted first. 0 disables the cache
+    ttl : float, optional
+        Seconds before an entry expires, by default None (never)
+    """
+    _missing = object()
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._missing)
+            if entry is not self._missing and (entry[1] is None or entry[1] > time.monotonic()):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not self._missing:
+                # Expired
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, fn):
+        """Return the cached value of `key`, or compute it with `fn(key)` and cache it (None included)"""
+        value = self.get(key, self._missing)
+        if value is self._missing:
+            value = fn(key)
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._data), 'maxsize': self.maxsize}
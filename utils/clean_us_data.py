@@ -1,8 +1,24 @@
+"""Build `data/us/us_universities_top.json` from the university lists of `data/us`
+
+Runs as a step of the Docker build. The build is skipped when the output exists and the input
+files and this script hash the same as in the last build, see `INPUT_FILES` and `STAMP_PATH`.
+
+Usage: python utils/clean_us_data.py [--force]
+"""
 import csv
 import json
+import argparse
+import hashlib
 import collections
 import os
 from config.settings import DATA_DIR
+from utils.json_stream import iter_json_array
+
+INPUT_FILES = ['us/university_avoid_list.json', 'us/us_universities_uids.csv', 'us/world_universities_and_domains.json',
+               'us/us_cs_top_list.txt']
+OUTPUT_PATH = os.path.join(DATA_DIR, 'us/us_universities_top.json')
+# Hash of the inputs of the last build
+STAMP_PATH = os.path.join(DATA_DIR, 'us/.us_universities_top.sha256')
 
 with open(os.path.join(DATA_DIR, 'us/university_avoid_list.json'), 'r') as f:
     avoid_list = set(json.load(f)['avoid'])
@@ -38,16 +54,11 @@ def load_universities_with_uids(us_universities_uids_path):
 
 
 def load_general_universities(world_universities_and_domains_path):
-    universities = []
-    with open(world_universities_and_domains_path, 'r') as f:
-        j = json.load(f)
-        for x in j:
-            if x['country'] == 'United States':
-                universities.append(x['name'])
-        return universities
+    # Read the universities one at a time, only the US names are kept
+    return [x['name'] for x in iter_json_array(world_universities_and_domains_path) if x['country'] == 'United States']
 
 
-def get_top_and_other_universities_fullname(id2uni, universities_top_list_path):
+def get_top_and_other_universities_fullname(id2uni, universities_top_list_path, universities):
     """Load a comprehensive list of world universities names from
      https://github.com/Hipo/university-domains-list/
     Return the top 100 CS ranking universities and others.
@@ -59,6 +70,8 @@ def get_top_and_other_universities_fullname(id2uni, universities_top_list_path):
         Dict of mapping uid -> university fullname
     universities_top_list_path : str
         Path of universities_top_list_path.json
+    universities : list
+        Names of all the US universities
 
     Returns
     -------
@@ -74,14 +87,15 @@ def get_top_and_other_universities_fullname(id2uni, universities_top_list_path):
             if len(top_u.split()) == 2 and top_u.split()[1] == 'University':
                 id2uni[top_u.split()[0]] = top_u
         other_universities = []
+        top_universities_set = set(top_universities)
         for u in universities:
-            if u not in top_universities and u not in avoid_list:
+            if u not in top_universities_set and u not in avoid_list:
                 # if u not in top_universities:
                 other_universities.append(u)
     return top_universities, other_universities
 
 
-if __name__ == "__main__":
+def build_us_universities():
     # Load US universities UID (abbreviation) mapping list
     universities, id2uni = load_universities_with_uids(os.path.join(DATA_DIR, 'us/us_universities_uids.csv'))
     id2uni = collections.OrderedDict(sorted(id2uni.items()))
@@ -91,7 +105,8 @@ if __name__ == "__main__":
     universities.extend(load_general_universities(os.path.join(DATA_DIR, 'us/world_universities_and_domains.json')))
 
     # Load top 100 and other universities
-    top_universities, other_universities = get_top_and_other_universities_fullname(id2uni, os.path.join(DATA_DIR, 'us/us_cs_top_list.txt'))
+    top_universities, other_universities = get_top_and_other_universities_fullname(id2uni, os.path.join(DATA_DIR, 'us/us_cs_top_list.txt'), universities)
+    top_universities_set = set(top_universities)
 
     # Dict for university name -> university id
     for k, v in id2uni.items():
@@ -110,14 +125,49 @@ if __name__ == "__main__":
                     top_uid2name[tmp] = uni
 
     # Build Other university uid -> Other university fullname
+    other_universities_set = set(other_universities)
+    prepended = []
     for uni in uni2id:
-        if uni not in top_universities:
+        if uni not in top_universities_set:
             for uid in uni2id[uni]:
                 other_uid2name[uid] = uni
-            if uni not in other_universities:
-                other_universities.insert(0, uni)
+            if uni not in other_universities_set:
+                prepended.append(uni)
+    # Each one was inserted at the front of the list
+    other_universities = prepended[::-1] + other_universities
+
+    # Drop the duplicates in first-seen order, the order of a set depends on PYTHONHASHSEED
+    return {'top_100_uid': top_uid2name, 'other_uni_uid': other_uid2name, 'top_100_names': top_universities,
+            'other_uni_names': list(dict.fromkeys(other_universities))}
+
+
+def inputs_checksum():
+    sha = hashlib.sha256()
+    for path in [os.path.join(DATA_DIR, name) for name in INPUT_FILES] + [os.path.abspath(__file__)]:
+        sha.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def main(force=False):
+    checksum = inputs_checksum()
+    if not force and os.path.exists(OUTPUT_PATH) and os.path.exists(STAMP_PATH):
+        with open(STAMP_PATH, 'r') as f:
+            if f.read().strip() == checksum:
+                print(f'{OUTPUT_PATH} is up to date, skip the build')
+                return
 
     # Dump to final result
-    with open(os.path.join(DATA_DIR, 'us/us_universities_top.json'), 'w') as target:
-        json.dump({'top_100_uid': top_uid2name, 'other_uni_uid': other_uid2name, 'top_100_names': top_universities,
-                   'other_uni_names': list(set(other_universities))}, target, indent=2, ensure_ascii=False)
+    result = build_us_universities()
+    with open(OUTPUT_PATH, 'w') as target:
+        json.dump(result, target, indent=2, ensure_ascii=False)
+    with open(STAMP_PATH, 'w') as f:
+        f.write(checksum + '\n')
+    print(f'Built {OUTPUT_PATH}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--force', action='store_true', help='Build even if the inputs did not change since the last build')
+    main(force=parser.parse_args().force)
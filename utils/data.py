@@ -1,34 +1,69 @@
 # -*- coding: utf-8 -*-
-from config.settings import DATA_DIR, OUTPUT_DIR, ARTICLE_TYPE
+from config.settings import DATA_DIR, OUTPUT_DIR, ARTICLE_TYPE, PARSE_WORKERS, PARSE_CHUNK_SIZE, STREAM_BATCH_SIZE
 import csv
-import json
 import gc
+import io
 import os
+import contextlib
+import multiprocessing
 import re
 import time
-import numpy as np
 import pandas as pd
 import pprint
-import copy
 import textdistance
 from datetime import datetime
-from utils.background import TWBackground, USBackground
-from utils.programs import Programs
-from api.database import create_tables_and_dump_data
+from utils.reference import get_reference_data
+from utils.parse_cache import ParseCache, PARSED_KEYS
+from utils.article_store import ArticleStore
+from utils.article_stream import iter_articles, ArticleWriter, peak_rss_mb
+from utils.metrics import Registry
+from api.backends import get_backend
 import dateutil.parser
 
 pp = pprint.PrettyPrinter()
 
+# Parsed fields of the admission articles, dumped to their own CSV columns
+ADDITIONAL_INFO = ['major_info', 'gpa_info', 'admission_info', 'university_info']
+# Fields of the admission articles dumped as they are, the first columns of the `articles` table
+GENERAL_KEYS = ['article_id', 'article_title', 'author', 'date', 'url', 'article_type']
+
+# Timings of the ingest stages, saved by ingest.py for the /metrics endpoint of the API
+INGEST_METRICS = Registry()
+INGEST_STAGE_SECONDS = INGEST_METRICS.histogram('ptt_ingest_stage_seconds', 'Time spent in each stage of the data ingest', ('stage',))
+INGEST_ARTICLES = INGEST_METRICS.counter('ptt_ingest_articles_total', 'Articles of each type seen by the data ingest', ('type',))
+
+# DataModel the pool workers parse, inherited through fork so the articles and the reference data are not pickled
+_worker_model = None
+
+
+def _parse_background_chunk(indices):
+    """University, major and GPA of the author of each article, same calls as the serial parse"""
+    tw_background = _worker_model.tw_background
+    return [tw_background.find_university_major_gpa(article['content'], aid=article['article_id'])
+            for article in _worker_model.all_articles[indices]]
+
+
+def _parse_admission_chunk(indices):
+    """Admission info of each article and the number of articles with an admission section"""
+    articles = _worker_model.all_articles[indices]
+    # Keep the per-chunk summaries out of the log, the main process prints the totals
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw_ad_results = _worker_model.us_background.parse_admission_section(articles)
+        result = _worker_model.us_background.find_university(raw_ad_results, articles=articles)
+    return result, sum(1 for ad in raw_ad_results if ad['admission'])
+
 
 class DataModel:
-    def __init__(self, all_articles=[]):
-        self.all_articles = np.array(all_articles)
+    def __init__(self, all_articles=[], workers=PARSE_WORKERS):
+        self.all_articles = ArticleStore(all_articles)
+        self.workers = workers
         self.cs_article_indices = []
         self.admission_article_indices = []
         self.ask_article_indices = []
-        self.tw_background = TWBackground()
-        self.us_background = USBackground()
-        self.programs = Programs()
+        reference = get_reference_data()
+        self.tw_background = reference.tw_background
+        self.us_background = reference.us_background
+        self.programs = reference.programs
 
         # Information of the author of the articles
         self.universities = []
@@ -36,83 +71,107 @@ class DataModel:
         self.gpas = []
 
     @classmethod
-    def from_processed_data(cls, ptt_data_path):
-        with open(ptt_data_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return DataModel(all_articles=data['articles'])
+    def from_processed_data(cls, ptt_data_path, workers=PARSE_WORKERS):
+        return DataModel(all_articles=iter_articles(ptt_data_path), workers=workers)
 
     def load_and_clean_ptt_data(self, ptt_data_path, save_path=None):
-        with open(ptt_data_path, 'r', encoding='utf-8') as f:
-            self.all_articles = json.load(f)
+        # Clean the articles while they are read, only the kept ones are saved and stored
+        self.all_articles = ArticleStore(self.iter_cleaned_articles(iter_articles(ptt_data_path), save_path=save_path))
 
-        article_id_set = set()
-        # Clean up the data, remove comments, messages, message_count, board  and ips
-        for article in self.all_articles['articles']:
-            if 'article_id' in article and article['article_id'] in article_id_set:
-                article['error'] = 'duplicate_id'
-
-            for key in ('ip', 'message_count', 'messages', 'board'):
-                if key in article:
-                    del article[key]
-            try:
-                article['date'] = dateutil.parser.parse(article['date']).strftime("%Y-%m-%d %H:%M:%S")
-            except (ValueError, KeyError) as e:
-                article['date'] = datetime(1970, 1, 1).strftime("%Y-%b-%d %H:%M:%S")
+    @staticmethod
+    def clean_article(article, article_id_set):
+        """Clean up an article, remove comments, messages, message_count, board and ips
 
-            if 'article_id' in article:
-                article_id_set.add(article['article_id'])
-
-        # Update all_articles
-        self.all_articles['articles'] = [article for article in self.all_articles['articles'] if 'error' not in article]
+        Articles whose id is already in `article_id_set` are marked as duplicates.
+        """
+        if 'article_id' in article and article['article_id'] in article_id_set:
+            article['error'] = 'duplicate_id'
 
-        # Save data
-        if save_path:
-            with open(save_path, 'w', encoding='utf-8') as f:
-                json.dump(self.all_articles, f, ensure_ascii=False)
+        for key in ('ip', 'message_count', 'messages', 'board'):
+            if key in article:
+                del article[key]
+        try:
+            article['date'] = dateutil.parser.parse(article['date']).strftime("%Y-%m-%d %H:%M:%S")
+        except (ValueError, KeyError) as e:
+            article['date'] = datetime(1970, 1, 1).strftime("%Y-%b-%d %H:%M:%S")
 
-        # We only need the articles array
-        self.all_articles = np.array(self.all_articles['articles'])
+        if 'article_id' in article:
+            article_id_set.add(article['article_id'])
 
     def classify_articles(self):
         self.cs_article_indices, self.admission_article_indices, self.ask_article_indices = [], [], []
         for idx, article in enumerate(self.all_articles):
-            if 'article_title' not in article or article['article_title'] is None:
-                continue
-            article_title = article['article_title']
-            if ARTICLE_TYPE.ADMISSION.value in article_title and 'Re: ' not in article_title:
+            article_type = self.classify_article(article)
+            if article_type == ARTICLE_TYPE.ADMISSION:
                 self.admission_article_indices.append(idx)
-                article['article_type'] = ARTICLE_TYPE.ADMISSION.name
-            elif ARTICLE_TYPE.ASK.value in article_title:
+            elif article_type == ARTICLE_TYPE.ASK:
                 self.ask_article_indices.append(idx)
-                article['article_type'] = ARTICLE_TYPE.ASK.name
-            else:
-                article['article_type'] = ARTICLE_TYPE.ALL.name
 
-    def parse_university_major_gpa(self):
-        indices = self.admission_article_indices
-        # Parse universities
+    @staticmethod
+    def classify_article(article):
+        """Set the `article_type` of an article from its title and return it, None for articles without title"""
+        if 'article_title' not in article or article['article_title'] is None:
+            return None
+        article_title = article['article_title']
+        if ARTICLE_TYPE.ADMISSION.value in article_title and 'Re: ' not in article_title:
+            article_type = ARTICLE_TYPE.ADMISSION
+        elif ARTICLE_TYPE.ASK.value in article_title:
+            article_type = ARTICLE_TYPE.ASK
+        else:
+            article_type = ARTICLE_TYPE.ALL
+        article['article_type'] = article_type.name
+        return article_type
+
+    def map_chunks(self, fn, indices):
+        """Run `fn` over chunks of `indices` on `self.workers` processes, return the results in chunk order
+
+        The workers are forked, which also keeps the hash seed, so iterating over sets gives
+        the same order as in this process and the results are identical to a serial run.
+        """
+        global _worker_model
+        chunks = [indices[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(indices), PARSE_CHUNK_SIZE)]
+        _worker_model = self
+        try:
+            with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+                return pool.map(fn, chunks, chunksize=1)
+        finally:
+            _worker_model = None
+
+    def parallel(self):
+        if self.workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            print('Parallel parsing needs the fork start method, parse serially')
+            self.workers = 1
+        return self.workers > 1
+
+    def parse_university_major_gpa(self, indices=None):
+        indices = self.admission_article_indices if indices is None else indices
+        self.universities, self.majors, self.gpas = [], [], []
+        if self.parallel():
+            for chunk in self.map_chunks(_parse_background_chunk, indices):
+                for university, major, gpa in chunk:
+                    self.universities.append(university)
+                    self.majors.append(major)
+                    self.gpas.append(gpa)
+        else:
+            self.parse_university_major_gpa_serially(indices)
+        self.save_university_major_gpa(indices)
+
+    def parse_university_major_gpa_serially(self, indices):
+        # Parse the university, major and GPA of each article from one split of its content
         for article in self.all_articles[indices]:
-            content = article['content']
-            university = self.tw_background.find_university(content, aid=article['article_id'])
+            university, major, gpa = self.tw_background.find_university_major_gpa(article['content'], aid=article['article_id'])
             self.universities.append(university)
-        # Parse majors
-        for idx, article in enumerate(self.all_articles[indices]):
-            content = article['content']
-            major = self.tw_background.find_major(content, self.universities[idx], aid=article['article_id'])
             self.majors.append(major)
-        # Parse GPA
-        for idx, article in enumerate(self.all_articles[indices]):
-            content = article['content']
-            gpa = self.tw_background.find_gpa(content, self.universities[idx], aid=article['article_id'])
             self.gpas.append(gpa)
 
+    def save_university_major_gpa(self, indices):
         def count_none_null(arr): return sum([1 for x in arr if x])
         uni_count, gpa_count, major_count = count_none_null(self.universities), count_none_null(self.gpas), count_none_null(self.majors)
         pp.pprint(f'Parsed {uni_count} universities, {major_count} majors, and {gpa_count} GPAs')
 
         # Save the parsed results to the articles
         # for idx, article in enumerate(self.all_articles[self.cs_article_indices]):
-        for idx, article in enumerate(self.all_articles[self.admission_article_indices]):
+        for idx, article in enumerate(self.all_articles[indices]):
             if self.universities[idx] is not None:
                 d = {}
                 d.update(self.universities[idx])
@@ -129,25 +188,59 @@ class DataModel:
             if self.gpas[idx] is not None:
                 article['gpa_info'] = self.gpas[idx]
 
-    def parse_admission_programs(self):
+    def parse_admission_programs(self, indices=None):
         print('Parsing admission programs for all CS admission articles...')
         # We only parse the admission articles
-        indices = self.admission_article_indices
-
-        # Parse the admission section
-        raw_ad_results = self.us_background.parse_admission_section(self.all_articles[indices])
+        indices = self.admission_article_indices if indices is None else indices
+
+        if self.parallel():
+            result, ad_count = [], 0
+            for chunk_result, chunk_ad_count in self.map_chunks(_parse_admission_chunk, indices):
+                result.extend(chunk_result)
+                ad_count += chunk_ad_count
+            print(f'Found {ad_count} articles with admission section')
+            print(f'Parsed {len(result)} admission articles')
+        else:
+            # Parse the admission section
+            raw_ad_results = self.us_background.parse_admission_section(self.all_articles[indices])
 
-        # Parse the university and program
-        result = self.us_background.find_university(raw_ad_results, articles=self.all_articles[indices])
+            # Parse the university and program
+            result = self.us_background.find_university(raw_ad_results, articles=self.all_articles[indices])
 
         # Save the parsed result to the articles
         for idx, article in enumerate(self.all_articles[indices]):
             article['admission_info'] = result[idx]
 
+    def parse_changed_admissions(self, cache):
+        """Parse the admission articles that are new or changed since they were put in `cache`
+
+        The other articles get their parsed fields from the cache, which is updated with the
+        new results. Returns the number of parsed articles.
+        """
+        # Add the parsed fields to the store in the order `parse_admission_programs` sets them
+        self.all_articles.reserve(PARSED_KEYS)
+        stale_indices = []
+        for idx in self.admission_article_indices:
+            article = self.all_articles[idx]
+            parsed = cache.get(article)
+            if parsed is None:
+                stale_indices.append(idx)
+            else:
+                article.update(parsed)
+        print(f'{len(self.admission_article_indices) - len(stale_indices)} admission articles unchanged, parse {len(stale_indices)}')
+
+        if stale_indices:
+            with INGEST_STAGE_SECONDS.time('parse_background'):
+                self.parse_university_major_gpa(stale_indices)
+            with INGEST_STAGE_SECONDS.time('parse_admissions'):
+                self.parse_admission_programs(stale_indices)
+            for article in self.all_articles[stale_indices]:
+                cache.set(article)
+        return len(stale_indices)
+
     def clean_up_articles(self):
         # Remove `content` for all articles
-        for article in self.all_articles:
-            article.pop('content', None)
+        self.all_articles.drop('content')
 
     def get_articles(self, type=ARTICLE_TYPE.ALL):
         if type == ARTICLE_TYPE.ALL:
@@ -162,42 +255,45 @@ class DataModel:
             raise Exception('Unknown Article Type')
 
     def save_classified_articles(self, verbose=True):
+        files = {'all': self.all_articles}
         if verbose:
-            with open(os.path.join(OUTPUT_DIR, 'cs_articles.json'), 'w', encoding='utf-8') as f:
-                json.dump({'articles': list(self.all_articles[self.cs_article_indices])}, f, ensure_ascii=False, indent=2)
-            with open(os.path.join(OUTPUT_DIR, 'admission_articles.json'), 'w', encoding='utf-8') as f:
-                json.dump({'articles': list(self.all_articles[self.admission_article_indices])}, f, ensure_ascii=False, indent=2)
-            with open(os.path.join(OUTPUT_DIR, 'ask_articles.json'), 'w', encoding='utf-8') as f:
-                json.dump({'articles': list(self.all_articles[self.ask_article_indices])}, f, ensure_ascii=False, indent=2)
-        with open(os.path.join(OUTPUT_DIR, 'all_articles.json'), 'w', encoding='utf-8') as f:
-            json.dump({'articles': list(self.all_articles)}, f, ensure_ascii=False, indent=2)
+            files.update({'cs': self.all_articles[self.cs_article_indices],
+                          'admission': self.all_articles[self.admission_article_indices],
+                          'ask': self.all_articles[self.ask_article_indices]})
+        for name, articles in files.items():
+            # Written one article at a time, so the board is not copied into a list of dicts first
+            with ArticleWriter(os.path.join(OUTPUT_DIR, f'{name}_articles.json'), indent=2) as writer:
+                for article in articles:
+                    writer.write(article.to_dict())
 
     def load_all_articles(self):
-        with open(os.path.join(OUTPUT_DIR, 'all_articles.json'), 'r', encoding='utf-8') as f:
-            self.all_articles = np.array(json.load(f)['articles'])
+        self.all_articles = ArticleStore(iter_articles(os.path.join(OUTPUT_DIR, 'all_articles.json')))
 
     def dump_articles_to_csv(self):
-        # Additional info
-        additional_info = ['major_info', 'gpa_info', 'admission_info', 'university_info']
+        with self.csv_dumper() as dump_article:
+            for article in self.all_articles[self.admission_article_indices]:
+                dump_article(article)
 
-        # Gather column names for general header
-        general_keys = [k for k in self.all_articles[self.admission_article_indices][-1].keys() if k not in additional_info]
+    @contextlib.contextmanager
+    def csv_dumper(self):
+        """Open the three CSV files loaded by the storage backends and yield a function that writes the rows of an article"""
+        general_keys = GENERAL_KEYS
         university_info_keys = [self.tw_background.universities.index.name] + \
             [k for k in self.tw_background.universities.columns.tolist() if k != 'ip']
         major_info_keys = [self.tw_background.majors.index.name] + self.tw_background.majors.columns.tolist()
         gpa_keys = ['max_gpa', 'min_gpa', 'mean_gpa', 'gpa_scale']
 
-        general_header = copy.deepcopy(general_keys)
-        general_header.extend(university_info_keys)
-        general_header.extend(major_info_keys)
-        general_header.extend(gpa_keys)
-        # print(general_header)
-
-        with open(os.path.join(OUTPUT_DIR, 'admission_articles.csv'), 'w', newline='', encoding='utf - 8') as csvfile:
-            writer = csv.writer(csvfile, delimiter='|')
-            writer.writerow(general_header)
-
-            for article in self.all_articles[self.admission_article_indices]:
+        with open(os.path.join(OUTPUT_DIR, 'admission_articles.csv'), 'w', newline='', encoding='utf - 8') as articles_file, \
+                open(os.path.join(OUTPUT_DIR, 'admission_universities.csv'), 'w', newline='', encoding='utf-8') as universities_file, \
+                open(os.path.join(OUTPUT_DIR, 'admission_uni_and_programs.csv'), 'w', newline='', encoding='utf-8') as programs_file:
+            article_writer = csv.writer(articles_file, delimiter='|')
+            university_writer = csv.writer(universities_file, delimiter='|')
+            university_writer.writerow(['article_id', 'university'])
+            program_writer = csv.writer(programs_file, delimiter='|')
+            program_writer.writerow(['article_id', 'university', 'program_level', 'program', 'program_type'])
+            article_writer.writerow(general_keys + university_info_keys + major_info_keys + gpa_keys)
+
+            def dump_article(article):
                 assert 'error' not in article, article
                 row = []
                 # General stuff
@@ -225,20 +321,11 @@ class DataModel:
                         row.append(article['gpa_info'][k])
                 else:
                     row.extend([''] * len(gpa_keys))
+                article_writer.writerow(row)
 
-                writer.writerow(row)
-
-        with open(os.path.join(OUTPUT_DIR, 'admission_universities.csv'), 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile, delimiter='|')
-            writer.writerow(['article_id', 'university'])
-            for article in self.all_articles[self.admission_article_indices]:
                 if 'admission_info' in article:
                     for uni in article['admission_info']['admission_universities']:
-                        writer.writerow([article['article_id'], uni])
-        with open(os.path.join(OUTPUT_DIR, 'admission_uni_and_programs.csv'), 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile, delimiter='|')
-            writer.writerow(['article_id', 'university', 'program_level', 'program', 'program_type'])
-            for article in self.all_articles[self.admission_article_indices]:
+                        university_writer.writerow([article['article_id'], uni])
                 uni_program_set = set()
                 if 'admission_info' in article:
                     for pair in article['admission_info']['program_uni_pairs']:
@@ -247,7 +334,7 @@ class DataModel:
                         k = university + '@' + program_name_norm if program_name_norm else university + '@'
                         if k not in uni_program_set:
                             uni_program_set.add(k)
-                            writer.writerow([
+                            program_writer.writerow([
                                 article['article_id'],
                                 university,
                                 program_level,
@@ -255,33 +342,160 @@ class DataModel:
                                 self.programs.program2type[program_name] if program_name else 'N/A'
                             ])
 
-    def run_data_pipeline(self, parse_admissions=False):
+            yield dump_article
+
+    def run_data_pipeline(self, parse_admissions=False, force_reload=False):
         """Run the whole data preprocess pipeline
 
         Parameters
         ----------
         parse_admissions : bool, optional
             Whether we parse the admissions programs, by default False
+        force_reload : bool, optional
+            Whether we re-parse every article and fully reload the storage backend, by default False.
+            Otherwise only the articles that changed since the last run are parsed and loaded
         """
-        self.classify_articles()
+        with INGEST_STAGE_SECONDS.time('classify'):
+            self.classify_articles()
         pp.pprint(f'CS articles: {len(self.cs_article_indices)}, Admission {len(self.admission_article_indices)}, Ask {len(self.ask_article_indices)}')
+        INGEST_ARTICLES.inc(ARTICLE_TYPE.ADMISSION.name, len(self.admission_article_indices))
+        INGEST_ARTICLES.inc(ARTICLE_TYPE.ASK.name, len(self.ask_article_indices))
         if parse_admissions:
-            self.parse_university_major_gpa()
-            self.parse_admission_programs()
+            # A fresh cache when forced, so every article is parsed again and the cache is rebuilt
+            cache = ParseCache() if force_reload else ParseCache.load()
+            self.parse_changed_admissions(cache)
+            cache.prune(article['article_id'] for article in self.all_articles[self.admission_article_indices])
+            cache.save()
             self.clean_up_articles()
-            self.save_classified_articles()
+            with INGEST_STAGE_SECONDS.time('save_articles'):
+                self.save_classified_articles()
         else:
-            self.load_all_articles()
-        self.dump_articles_to_csv()
+            with INGEST_STAGE_SECONDS.time('load_articles'):
+                self.load_all_articles()
+        with INGEST_STAGE_SECONDS.time('dump_csv'):
+            self.dump_articles_to_csv()
 
-        # Create Tables and Dump to postgres DB
-        create_tables_and_dump_data()
+        # Load the CSV files into the storage backend (create tables and dump to postgres DB by default)
+        with INGEST_STAGE_SECONDS.time('load_backend'):
+            get_backend().load(force=force_reload)
 
         # Release memory
         self.all_articles = None
         gc.collect()
         print('Data Model initialization finished!')
 
+    def stream_data_pipeline(self, ptt_data_path=None, clean=False, parse_admissions=False, force_reload=False):
+        """Run the data preprocess pipeline one article at a time, with the same output files as `run_data_pipeline`
+
+        The articles are streamed from the JSON file through the cleaning, classification, parsing
+        and dumping steps, so the memory does not grow with the number of articles. Only a batch of
+        `STREAM_BATCH_SIZE` admission articles (and the articles in between) is kept while it is parsed.
+
+        Parameters
+        ----------
+        ptt_data_path : str, optional
+            JSON file of the PTT articles to parse, needed if `parse_admissions`
+        clean : bool, optional
+            Whether we clean the raw articles first and save them back to `ptt_data_path`, by default False
+        parse_admissions : bool, optional
+            Whether we parse the admissions programs, by default False. Otherwise the parsed
+            articles are read from `output/all_articles.json`
+        force_reload : bool, optional
+            Whether we re-parse every article and fully reload the storage backend, by default False
+        """
+        print(f'Peak RSS before streaming the articles: {peak_rss_mb():.1f} MB')
+        if parse_admissions:
+            articles = iter_articles(ptt_data_path)
+            if clean:
+                articles = self.iter_cleaned_articles(articles, save_path=ptt_data_path)
+        else:
+            articles = iter_articles(os.path.join(OUTPUT_DIR, 'all_articles.json'))
+        counts = {article_type: 0 for article_type in ARTICLE_TYPE}
+        articles = self.iter_classified_articles(articles, counts)
+        if parse_admissions:
+            cache = ParseCache() if force_reload else ParseCache.load()
+            parsed_count = [0]
+            articles = self.iter_parsed_articles(articles, cache, parsed_count)
+
+        # The stages run interleaved on each article, only the parsing is also timed on its own
+        with INGEST_STAGE_SECONDS.time('stream_articles'), contextlib.ExitStack() as stack:
+            dump_article = stack.enter_context(self.csv_dumper())
+            if parse_admissions:
+                writers = {name: stack.enter_context(ArticleWriter(os.path.join(OUTPUT_DIR, f'{name}_articles.json'), indent=2))
+                           for name in ('cs', 'admission', 'ask', 'all')}
+            for article in articles:
+                article_type = article.get('article_type')
+                if parse_admissions:
+                    article.pop('content', None)
+                    if article_type == ARTICLE_TYPE.ADMISSION.name:
+                        writers['admission'].write(article)
+                    elif article_type == ARTICLE_TYPE.ASK.name:
+                        writers['ask'].write(article)
+                    writers['all'].write(article)
+                if article_type == ARTICLE_TYPE.ADMISSION.name:
+                    dump_article(article)
+        self.all_articles = None
+
+        pp.pprint(f'Admission {counts[ARTICLE_TYPE.ADMISSION]}, Ask {counts[ARTICLE_TYPE.ASK]}, Other {counts[ARTICLE_TYPE.ALL]}')
+        for article_type, count in counts.items():
+            if count:
+                INGEST_ARTICLES.inc(article_type.name, count)
+        if parse_admissions:
+            print(f'{counts[ARTICLE_TYPE.ADMISSION] - parsed_count[0]} admission articles unchanged, parsed {parsed_count[0]}')
+            cache.save()
+
+        # Load the CSV files into the storage backend (create tables and dump to postgres DB by default)
+        with INGEST_STAGE_SECONDS.time('load_backend'):
+            get_backend().load(force=force_reload)
+        gc.collect()
+        print(f'Peak RSS after streaming the articles: {peak_rss_mb():.1f} MB')
+        print('Data Model initialization finished!')
+
+    def iter_cleaned_articles(self, articles, save_path=None):
+        """Clean up the articles like `load_and_clean_ptt_data`, saving the kept ones to `save_path`"""
+        article_id_set = set()
+        with contextlib.ExitStack() as stack:
+            writer = stack.enter_context(ArticleWriter(save_path)) if save_path else None
+            for article in articles:
+                self.clean_article(article, article_id_set)
+                if 'error' in article:
+                    continue
+                if writer:
+                    writer.write(article)
+                yield article
+
+    def iter_classified_articles(self, articles, counts):
+        for article in articles:
+            article_type = self.classify_article(article)
+            if article_type is not None:
+                counts[article_type] += 1
+            yield article
+
+    def iter_parsed_articles(self, articles, cache, parsed_count):
+        """Yield the articles in order, parsing the admission articles `STREAM_BATCH_SIZE` at a time
+
+        Once all the articles went through, the cache entries of the removed articles are dropped.
+        """
+        admission_ids = set()
+        batch = []
+        for article in articles:
+            batch.append(article)
+            if article.get('article_type') == ARTICLE_TYPE.ADMISSION.name:
+                admission_ids.add(article['article_id'])
+                if len(admission_ids) % STREAM_BATCH_SIZE == 0:
+                    parsed_count[0] += self.parse_batch(batch, cache)
+                    yield from (article.to_dict() for article in self.all_articles)
+                    batch = []
+        parsed_count[0] += self.parse_batch(batch, cache)
+        yield from (article.to_dict() for article in self.all_articles)
+        cache.prune(admission_ids)
+
+    def parse_batch(self, articles, cache):
+        self.all_articles = ArticleStore(articles)
+        self.admission_article_indices = [idx for idx, article in enumerate(articles)
+                                          if article.get('article_type') == ARTICLE_TYPE.ADMISSION.name]
+        return self.parse_changed_admissions(cache)
+
     @ staticmethod
     def get_article_titles(articles):
         return [article['article_title'] for article in articles]
@@ -0,0 +1,44 @@
+"""Read the items of a JSON array one at a time
+
+Shared by the article stream of the ingest (`utils/article_stream.py`) and the university
+list build of the Docker image (`utils/clean_us_data.py`), so it only depends on the standard library.
+"""
+import re
+import json
+
+WHITESPACE_REG = re.compile(r'[\s,]*')
+
+
+def iter_json_array(path, chunk_size=1 << 16):
+    """Yield the items of a JSON file whose top level value is an array, like `article_stream.iter_articles`"""
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f'{path} does not start with an array')
+        yield from iter_array_items(f, buffer, 1, chunk_size)
+
+
+def iter_array_items(f, buffer, pos, chunk_size):
+    """Decode the items of the array that starts at `pos` of `buffer`, the rest of the array is read from `f`
+
+    Returns what was read of the file after the closing bracket of the array.
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+    while True:
+        pos = WHITESPACE_REG.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            return buffer[pos + 1:]
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # The next item is cut by the end of the buffer, read more of the file
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+        pos = end
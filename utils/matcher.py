@@ -0,0 +1,177 @@
+import re
+
+# Whitespace separated words, the same words as `str.split()` gives
+WORD_REG = re.compile(r'\S+')
+
+
+class AhoCorasick:
+    """Aho–Corasick automaton that finds every occurrence of a set of keywords in one pass over a text
+
+    Each keyword carries one or more values, usually a (kind, priority, target) tuple, so that
+    the caller can resolve overlapping matches with its own priority rules.
+    """
+
+    def __init__(self, keywords=()):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword, value in keywords:
+            self.add(keyword, value)
+        self.build()
+
+    def add(self, keyword, value):
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            node = nxt
+        self.output[node].append((len(keyword), value))
+
+    def build(self):
+        """Compute the failure links, call it again after adding keywords"""
+        queue = list(self.goto[0].values())
+        for node in queue:
+            self.fail[node] = 0
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[nxt] = self.goto[state].get(ch, 0)
+                # Keywords that end here through the failure link, e.g. 'EE' in 'NTUEE'
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter(self, text):
+        """Yield (start, end, value) for every keyword occurrence in `text`, ordered by end position"""
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for idx, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in output[node]:
+                yield idx + 1 - length, idx + 1, value
+
+    def find_all(self, text):
+        return list(self.iter(text))
+
+    def iter_delimited(self, text, sep=' '):
+        """Yield the values of the keywords that occur in `text` as whole `sep` delimited tokens"""
+        n = len(text)
+        for start, end, value in self.iter(text):
+            if (start == 0 or text[start - 1] == sep) and (end == n or text[end] == sep):
+                yield value
+
+
+# Characters outside ASCII that `re.IGNORECASE` matches against ASCII letters
+_IGNORECASE_FOLD = str.maketrans({'İ': 'i', 'ı': 'i', 'K': 'k', 'ſ': 's'})
+_REGEX_META = re.compile(r'[\^$*+?{}\[\]\\|()]')
+
+
+def fold_case(text):
+    """Lower case `text` so that it contains every ASCII literal a `re.IGNORECASE` pattern matches in it"""
+    return text.translate(_IGNORECASE_FOLD).lower()
+
+
+def required_literal(pattern):
+    """Longest ASCII literal that every match of `pattern` contains, None if there is no such literal
+
+    Only patterns without regex syntax other than '.' are analyzed, e.g. 'Washington University in St. Louis'
+    """
+    if _REGEX_META.search(pattern):
+        return None
+    literal = max(pattern.split('.'), key=len)
+    return literal if literal and literal.isascii() else None
+
+
+class PatternIndex:
+    """Ordered list of regex patterns, searched case insensitively
+
+    An Aho–Corasick automaton over a required literal of each pattern selects the candidate patterns
+    in one pass over the text, and only those are run, in their original order. Patterns without
+    a usable literal are always candidates. Each pattern is compiled the first time it is a candidate.
+    """
+
+    def __init__(self, patterns, flags=re.IGNORECASE):
+        self.patterns = list(patterns)
+        self.flags = flags
+        self.compiled = [None] * len(self.patterns)
+        keywords, self.always = [], []
+        for idx, pattern in enumerate(self.patterns):
+            literal = required_literal(pattern)
+            if literal:
+                keywords.append((literal.lower(), idx))
+            else:
+                self.always.append(idx)
+        self.automaton = AhoCorasick(keywords)
+
+    def candidates(self, text):
+        found = set(self.always)
+        found.update(idx for _, _, idx in self.automaton.iter(fold_case(text)))
+        return sorted(found)
+
+    def compiled_pattern(self, idx):
+        compiled = self.compiled[idx]
+        if compiled is None:
+            compiled = self.compiled[idx] = re.compile(self.patterns[idx], self.flags)
+        return compiled
+
+    def __getstate__(self):
+        # Unpickling compiles every pattern again, leave them to be compiled on use
+        state = self.__dict__.copy()
+        state['compiled'] = [None] * len(self.patterns)
+        return state
+
+    def search_first(self, text):
+        """First pattern in order that matches `text`, None if none does"""
+        for idx in self.candidates(text):
+            if self.compiled_pattern(idx).search(text):
+                return self.patterns[idx]
+        return None
+
+    def search_all(self, text):
+        """Every pattern that matches `text`, in order"""
+        return [self.patterns[idx] for idx in self.candidates(text) if self.compiled_pattern(idx).search(text)]
+
+
+class TokenIndex:
+    """Phrases found as whole tokens of a ' ' separated text, like `' ' + phrase + ' ' in text`
+
+    The phrases are indexed on their first token, so a search only compares the phrases that
+    start with one of the tokens of the text. Each phrase has a priority, the lowest priority
+    match wins, which keeps the first match of a scan over an ordered list of phrases.
+    """
+
+    def __init__(self, phrases=()):
+        self.index = {}
+        for priority, (phrase, value) in enumerate(phrases):
+            self.add(phrase, value, priority)
+
+    def add(self, phrase, value, priority):
+        tokens = phrase.split(' ')
+        self.index.setdefault(tokens[0], []).append((priority, tokens, value))
+
+    def search_first(self, text, skip=()):
+        """Value of the matching phrase with the lowest priority, None if no phrase matches
+
+        Phrases in `skip` are ignored.
+        """
+        tokens = text.split(' ')
+        # A phrase needs a separator on both sides, so it can neither start at the first token nor end at the last
+        last = len(tokens) - 1
+        best = None
+        for start in range(1, last):
+            for priority, phrase_tokens, value in self.index.get(tokens[start], ()):
+                end = start + len(phrase_tokens)
+                if end <= last and (best is None or priority < best[0]) and tokens[start:end] == phrase_tokens \
+                        and ' '.join(phrase_tokens) not in skip:
+                    best = (priority, value)
+        return best[1] if best is not None else None
@@ -0,0 +1,168 @@
+"""Latency histograms and counters, rendered in the Prometheus text format
+
+A `Registry` holds the metrics of one process. Observing a value is a bisect and a few additions
+under a lock, so the spans can stay on in production:
+
+    STAGE_SECONDS = registry.histogram('ptt_stage_seconds', 'Time spent in each stage', ('stage',))
+    with STAGE_SECONDS.time('parse_request'):
+        ...
+
+Values known elsewhere, like the cache statistics, are read when the registry is rendered
+through the functions added with `Registry.add_collector`.
+"""
+import math
+import time
+import bisect
+import threading
+
+# Upper bounds in seconds, from the cached API responses to the full ingest stages
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def as_labels(labels):
+    return labels if isinstance(labels, tuple) else (labels,)
+
+
+class Counter:
+    """Monotonic count per label values"""
+    type = 'counter'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        labels = as_labels(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(as_labels(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{format_labels(self.label_names, labels)} {format_value(value)}'
+
+
+class Timer:
+    """Observe the seconds spent in a `with` block, also when it raises"""
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class Histogram:
+    """Count of the observations per bucket, with their sum, per label values"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [count of each bucket (not cumulative) and of +Inf, sum of the observations]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        labels = as_labels(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[idx] += 1
+            counts[-1] += value
+
+    def time(self, labels=()):
+        return Timer(self, as_labels(labels))
+
+    def count(self, labels=()):
+        counts = self._values.get(as_labels(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def total(self, labels=()):
+        counts = self._values.get(as_labels(labels))
+        return counts[-1] if counts else 0.0
+
+    def label_values(self):
+        return list(self._values)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{format_labels(self.label_names, labels, [("le", format_value(bound))])} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.label_names, labels)} {format_value(counts[-1])}'
+            yield f'{self.name}_count{format_labels(self.label_names, labels)} {cumulative}'
+
+
+class Registry:
+    """The metrics of a process and the collectors of the values read at render time"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, label_names=()):
+        return self.register(Counter(name, documentation, label_names))
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """Add `fn()`, which returns (name, type, documentation, [(labels dict, value)]) tuples when rendering"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        for collector in self.collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                lines.extend(f'{name}{format_labels(labels, labels.values())} {format_value(value)}' for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
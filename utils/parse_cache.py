@@ -0,0 +1,80 @@
+import os
+import pickle
+import hashlib
+from config.settings import DATA_DIR, PARSE_CACHE_PATH
+from utils.reference import REFERENCE_FILES
+
+# Bump when the parsers change in a way that changes their results
+PARSER_VERSION = 1
+# Bump when the layout of the entries changes
+CACHE_VERSION = 2
+
+# Fields that `parse_university_major_gpa` and `parse_admission_programs` add to an article
+PARSED_KEYS = ('university_info', 'major_info', 'gpa_info', 'admission_info')
+
+
+def reference_checksum(data_dir=DATA_DIR):
+    sha = hashlib.sha256(str(PARSER_VERSION).encode('utf-8'))
+    for name in REFERENCE_FILES:
+        sha.update(name.encode('utf-8'))
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+def article_checksum(article):
+    sha = hashlib.sha256(article['article_title'].encode('utf-8'))
+    sha.update(b'\0')
+    sha.update(article['content'].encode('utf-8'))
+    return sha.digest()
+
+
+class ParseCache:
+    """Parsed fields of the admission articles, keyed on `article_id`
+
+    An entry is only used while the title and content of its article hash the same, and the
+    whole cache is dropped when the reference data files or `PARSER_VERSION` change. The parsed
+    fields are kept pickled, which takes a fraction of the memory of the dicts for a large board.
+    """
+
+    def __init__(self, path=PARSE_CACHE_PATH, reference=None):
+        self.path = path
+        self.reference = reference if reference is not None else reference_checksum()
+        self.entries = {}
+
+    @classmethod
+    def load(cls, path=PARSE_CACHE_PATH):
+        cache = cls(path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('version') == CACHE_VERSION and snapshot.get('reference') == cache.reference:
+                cache.entries = snapshot['entries']
+            else:
+                print('Reference data, parsers or cache layout changed, drop the parse cache')
+        return cache
+
+    def save(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump({'version': CACHE_VERSION, 'reference': self.reference, 'entries': self.entries}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, article):
+        """Cached parsed fields of `article`, None if it is new or changed"""
+        entry = self.entries.get(article['article_id'])
+        if entry is None or entry[0] != article_checksum(article):
+            return None
+        return pickle.loads(entry[1])
+
+    def set(self, article):
+        parsed = {k: article[k] for k in PARSED_KEYS if k in article}
+        self.entries[article['article_id']] = (article_checksum(article), pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def prune(self, article_ids):
+        """Drop the entries of the articles that are not in `article_ids` anymore"""
+        article_ids = set(article_ids)
+        for article_id in [k for k in self.entries if k not in article_ids]:
+            del self.entries[article_id]
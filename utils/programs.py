@@ -2,13 +2,26 @@ import os
 import json
 import pandas as pd
 from config.settings import DATA_DIR
+from utils.matcher import TokenIndex
+
+# Program levels `search_program` returns, None when the level is not found
+PROGRAM_LEVELS = (None, 'MS', 'PhD')
+
+
+def read_programs():
+    with open(os.path.join(DATA_DIR, 'us/programs.json'), 'r') as f:
+        return json.load(f)
+
+
+def read_majors():
+    return pd.read_csv(os.path.join(DATA_DIR, 'tw/majors.csv'), sep=',', index_col='major_id', na_values=None)
 
 
 class Programs:
-    def __init__(self):
+    def __init__(self, programs_dict=None, majors=None):
+        """`programs_dict` is `data/us/programs.json` and `majors` the table of `data/tw/majors.csv`, read when not given"""
         # Load Programs
-        with open(os.path.join(DATA_DIR, 'us/programs.json'), 'r') as f:
-            self.programs_dict = json.load(f)
+        self.programs_dict = read_programs() if programs_dict is None else programs_dict
         self.levels = self.programs_dict['levels']
         self.programs = self.programs_dict['programs']
         self.masters = self.programs_dict['masters']
@@ -20,7 +33,8 @@ class Programs:
                 self.program2type[p] = t
         assert len(set(self.programs) - set(self.program2type.keys())) == 0
 
-        self.majors = pd.read_csv(os.path.join(DATA_DIR, 'tw/majors.csv'), sep=',', index_col='major_id', na_values=None)
+        # A copy, the column added below must not show up in the majors of `TWBackground`
+        self.majors = read_majors() if majors is None else majors.copy()
         self.majors['major_name_upper'] = self.majors['major_name'].str.upper()
 
         for _, row in self.majors.iterrows():
@@ -29,6 +43,20 @@ class Programs:
             if row.name not in self.program2type:
                 self.program2type[row.name] = row['major_type']
 
+        # Token indexes that keep the order of the lists, the first level/program/major found wins
+        self.level_index = TokenIndex((level, level) for level in self.levels)
+        self.program_index = TokenIndex((program, program) for program in self.programs)
+        self.major_name_index = TokenIndex()
+        self.major_id_index = TokenIndex()
+        for priority, (mid, mrow) in enumerate(self.majors.iterrows()):
+            self.major_name_index.add(mrow['major_name_upper'], mrow['major_name'], priority)
+            self.major_name_index.add(mrow['major_cabbr'], mrow['major_name'], priority)
+            self.major_id_index.add(mid, mrow['major_name'], priority)
+
+        # Normalized name of every known program at each level
+        self.normalized_program_names = {(level, name): self.build_program_name(level, name)
+                                         for name in self.program2type for level in PROGRAM_LEVELS}
+
     def search_program(self, row, aid=None):
         # Append prefix and suffix for better matching
         row = ' ' + row + ' '
@@ -40,34 +68,19 @@ class Programs:
         if ' MS ' in row and ' PhD ' in row:
             program_level = 'MS'
         else:
-            for level in self.levels:
-                if ' ' + level + ' ' in row:
-                    program_level = level
-                    break
-
-        for program in self.programs:
-            if ' ' + program + ' ' in row:
-                program_name = program
-                break
+            program_level = self.level_index.search_first(row)
+
+        program_name = self.program_index.search_first(row)
         # 2) If we still can't find the program name, search for
         # non-CS program names
         row_upper = row.upper()
         if not program_name:
-            for _, mrow in self.majors.iterrows():
-                if ' ' + mrow['major_name_upper'] + ' ' in row_upper or \
-                        ' ' + mrow['major_cabbr'] + ' ' in row_upper:
-                    program_name = mrow['major_name']
-                    break
+            program_name = self.major_name_index.search_first(row_upper)
 
         # 3) Still no luck, find from the major ids
         if not program_name:
-            for _, mrow in self.majors.iterrows():
-                if ' ' + mrow.name + ' ' in row_upper:
-                    # Texas A&M corner case
-                    if mrow.name == 'AM' and 'TEXAS AM' in row_upper:
-                        continue
-                    program_name = mrow['major_name']
-                    break
+            # Texas A&M corner case
+            program_name = self.major_id_index.search_first(row_upper, skip=('AM',) if 'TEXAS AM' in row_upper else ())
 
         if program_level is not None:
             row = row.replace(' ' + program_level + ' ', ' ')
@@ -88,6 +101,11 @@ class Programs:
         return (program_level, program_name), row.strip()
 
     def normalize_program_name(self, program_level, program_name):
+        """Normalize program name with given program level, see `build_program_name`"""
+        normalized = self.normalized_program_names.get((program_level, program_name))
+        return normalized if normalized is not None else self.build_program_name(program_level, program_name)
+
+    def build_program_name(self, program_level, program_name):
         """Normalize program name with given program level
 
         Sadly this part of code is just ugly... Someone have to do the
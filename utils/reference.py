@@ -0,0 +1,70 @@
+"""Reference data of the parsers, loaded once per process
+
+`TWBackground`, `Programs` and `USBackground` used to read the files of `data/` on their own,
+`majors.csv` was parsed three times per process and the JSON files once per instance.
+`ReferenceData` reads each file once, builds the three parsers on the shared tables and can be
+saved as one snapshot, so a process that finds an up-to-date snapshot skips the CSV parsing
+and the building of the lookup dicts and indexes.
+"""
+import os
+import pickle
+import hashlib
+from config.settings import DATA_DIR, REFERENCE_SNAPSHOT_PATH
+from utils.background import TWBackground, USBackground, read_tw_universities, read_us_universities
+from utils.programs import Programs, read_programs, read_majors
+
+# Bump when the pickled classes change in a way that breaks older snapshots
+SNAPSHOT_VERSION = 1
+
+# Reference data the parsers match the articles against
+REFERENCE_FILES = ['tw/tw_universities.csv', 'tw/majors.csv', 'us/programs.json', 'us/us_universities_top.json']
+
+
+def files_checksum(data_dir=DATA_DIR):
+    sha = hashlib.sha256()
+    for name in REFERENCE_FILES:
+        sha.update(name.encode('utf-8'))
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+class ReferenceData:
+    """The parsers built on one read of the reference data files"""
+
+    def __init__(self):
+        self.checksum = files_checksum()
+        majors = read_majors()
+        self.tw_background = TWBackground(read_tw_universities(), majors)
+        self.programs = Programs(read_programs(), majors)
+        self.us_background = USBackground(read_us_universities(), self.programs)
+
+    def save(self, path=REFERENCE_SNAPSHOT_PATH):
+        with open(path, 'wb') as f:
+            pickle.dump({'version': SNAPSHOT_VERSION, 'reference': self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=REFERENCE_SNAPSHOT_PATH):
+        """Load the snapshot at `path`, or read the files if the snapshot is missing or out of date"""
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('version') != SNAPSHOT_VERSION:
+                print(f'Ignore reference data snapshot {path} with version {snapshot.get("version")}')
+            elif snapshot['reference'].checksum != files_checksum():
+                print(f'Reference data files changed since the snapshot {path}, read them again')
+            else:
+                return snapshot['reference']
+        return cls()
+
+
+# ReferenceData of this process, see `get_reference_data`
+_reference_data = None
+
+
+def get_reference_data():
+    """The `ReferenceData` shared by everything in this process, loaded on the first call"""
+    global _reference_data
+    if _reference_data is None:
+        _reference_data = ReferenceData.load()
+    return _reference_data